@@ -0,0 +1,8 @@
+"""Benchmarks and load tests for the API"""
+
+from os import environ
+
+# benchmarks never reach the real Spotify API, but the app still needs credentials
+# to build its OAuth manager at startup
+environ.setdefault("CLIENT_ID", "benchmark")
+environ.setdefault("CLIENT_SECRET", "benchmark")
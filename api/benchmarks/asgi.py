@@ -0,0 +1,87 @@
+"""Drives an ASGI app in-process, without a server or an HTTP client library"""
+
+from asyncio import Event
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp
+
+
+class Reply(NamedTuple):
+    """The parts of a response the benchmarks look at"""
+
+    status: int
+    body: bytes
+    first_byte: float
+    """The `perf_counter` time at which the first non-empty body chunk was sent"""
+
+
+async def call(
+    app: ASGIApp,
+    path: str,
+    query: str = "",
+    headers: Sequence[Tuple[str, str]] = (),
+) -> Reply:
+    """
+    Sends a single GET request to `app`
+
+    Params
+    ------
+    app: ASGIApp
+        the application to call
+    path: str
+        the request path
+    query: str
+        the URL-encoded query string, without the leading `?`
+    headers: Sequence[Tuple[str, str]]
+        the request headers
+
+    Returns
+    -------
+    reply: Reply
+        the status, body and time to first byte of the response
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+    }
+    status = 500
+    body: List[bytes] = []
+    first_byte: Optional[float] = None
+    requested = False
+    finished = Event()
+
+    async def receive() -> Dict:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict) -> None:
+        nonlocal status, first_byte
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            return
+        if message["type"] != "http.response.body":
+            return
+        if message.get("body"):
+            if first_byte is None:
+                first_byte = perf_counter()
+            body.append(message["body"])
+        if not message.get("more_body", False):
+            finished.set()
+
+    await app(scope, receive, send)
+    return Reply(status, b"".join(body), first_byte or perf_counter())
@@ -0,0 +1,61 @@
+"""
+Benchmark of the MongoDB round trips made when caching top artists
+
+Compares upserting each artist with its own `update_one`, as the client used to,
+against the single unordered `bulk_write` made by `Client.get_artists_from_spotify`.
+MongoDB is replaced by an in-process fake that counts round trips and sleeps for a
+fixed latency on each one.
+
+Usage
+-----
+python -m benchmarks.bulk_upsert --limit 50 --latency 0.001
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Dict, List
+
+from benchmarks.fake_mongo import RecordingMongoClient
+from benchmarks.fake_spotify import fake_artist
+from dependencies.spotify import Client
+from models.artist import ArtistQuery
+
+
+def per_document_upsert(client: Client) -> List[Dict]:
+    """Caches each top artist with its own round trip, as the client used to"""
+    top_artists = client.client.current_user_top_artists(
+        limit=client.query.limit, time_range=client.query.time_range
+    )
+    for artist in top_artists["items"]:
+        client.artists_collection.update_one({"id": artist["id"]}, {"$set": artist}, upsert=True)
+    return top_artists["items"]
+
+
+def main():
+    """Runs both variants and prints their round trips and wall time"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.001)
+    args = parser.parse_args()
+
+    spotify = SimpleNamespace(
+        current_user_top_artists=lambda limit, time_range, offset=0: {
+            "items": [fake_artist(i) for i in range(offset, offset + limit)]
+        }
+    )
+
+    for name, fetch in [
+        ("update_one per artist", per_document_upsert),
+        ("bulk_write", Client.get_artists_from_spotify),
+    ]:
+        mongo = RecordingMongoClient(args.latency)
+        client = Client(ArtistQuery(limit=args.limit), spotify, mongo)
+        start = perf_counter()
+        fetch(client)
+        elapsed = perf_counter() - start
+        print(f"{name:<22} {mongo.database.round_trips:>4} round trips " f"{elapsed * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
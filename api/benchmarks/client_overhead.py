@@ -0,0 +1,71 @@
+"""
+Benchmark of the per-request cost of building a `Client`
+
+Compares constructing the Spotify, OAuth and MongoDB clients on every request, as
+the routes used to, against borrowing them from a shared `ClientRegistry`. No
+request is sent; this only measures construction and teardown.
+
+Usage
+-----
+python -m benchmarks.client_overhead --iterations 200
+"""
+
+from argparse import ArgumentParser
+from os import getenv
+from time import perf_counter
+from typing import Callable
+
+from pymongo import MongoClient
+from spotipy import Spotify
+from spotipy.oauth2 import SpotifyOAuth
+
+from dependencies.registry import ClientRegistry
+from dependencies.spotify import Client, settings
+from models.common import Query
+
+
+def per_request_client(query: Query) -> Client:
+    """Builds every upstream client from scratch, as each request used to"""
+    spotify = Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=settings["client_id"],
+            client_secret=settings["client_secret"],
+            redirect_uri="http://localhost:8080",
+            scope=settings["scopes"],
+        )
+    )
+    return Client(query, spotify, MongoClient(getenv("CONNECTIONSTRING")))
+
+
+def time_per_call(build: Callable[[Query], Client], iterations: int, owned: bool) -> float:
+    """
+    Retrieves the mean wall time, in microseconds, of building one client
+
+    When `owned` is set the client's MongoDB pool belongs to the request and is
+    closed afterwards, as it would have been garbage collected
+    """
+    start = perf_counter()
+    for _ in range(iterations):
+        client = build(Query())
+        if owned:
+            client.db_client.close()
+    return (perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    """Runs both variants and prints the mean cost per request"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    registry = ClientRegistry.from_env()
+    before = time_per_call(per_request_client, args.iterations, owned=True)
+    after = time_per_call(registry.client, args.iterations, owned=False)
+    print(f"per-request clients: {before:10.1f} us/request")
+    print(f"shared registry:     {after:10.1f} us/request")
+    print(f"speedup:             {before / after:10.1f}x")
+    registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of polling an unchanged collection
+
+Compares serializing the collection on every poll, as before ETags, against
+sending the body kept from the first poll, and against answering a poll that
+holds the current ETag with a `304 Not Modified`. The collection is the same
+object on every request, as it is when served from the response cache, and the
+app is driven in-process through the ASGI interface.
+
+Usage
+-----
+python -m benchmarks.conditional_get --items 50 --repeat 2000
+"""
+
+from argparse import ArgumentParser
+from asyncio import run
+from time import perf_counter
+from typing import Sequence, Tuple
+
+from fastapi import FastAPI, Request, Response
+
+from models.collection import Collection
+from models.song import Song
+from routes.responses import collection_response, dumps, render_collection
+
+from .asgi import Reply, call
+from .fake_spotify import fake_track
+
+
+def build_app(collection: Collection) -> FastAPI:
+    """Builds an app serving `collection` with and without ETags"""
+    app = FastAPI()
+
+    @app.get("/serialized", response_model=Collection[Song])
+    async def serialized() -> Response:
+        return Response(dumps(collection), media_type="application/json")
+
+    @app.get("/tagged", response_model=Collection[Song])
+    async def tagged(request: Request) -> Response:
+        return collection_response(request, collection)
+
+    return app
+
+
+async def measure(
+    app: FastAPI, path: str, headers: Sequence[Tuple[str, str]], repeat: int
+) -> Tuple[Reply, float]:
+    """Returns the last reply and the mean time per request, in seconds"""
+    reply = await call(app, path, headers=headers)
+    start = perf_counter()
+    for _ in range(repeat):
+        reply = await call(app, path, headers=headers)
+    return reply, (perf_counter() - start) / repeat
+
+
+async def bench(items: int, repeat: int):
+    """Times each kind of poll and prints the time and bytes per request"""
+    collection = Collection.from_list([Song.from_dict(fake_track(index)) for index in range(items)])
+    app = build_app(collection)
+    _, etag = render_collection(collection)
+
+    print(f"{items} songs")
+    print(f"{'poll':<14} {'status':>6} {'bytes':>7} {'total':>10}")
+    for name, path, headers in [
+        ("serialized", "/serialized", ()),
+        ("kept body", "/tagged", ()),
+        ("not modified", "/tagged", (("If-None-Match", etag),)),
+    ]:
+        reply, total = await measure(app, path, headers, repeat)
+        print(f"{name:<14} {reply.status:>6} {len(reply.body):>7} " f"{total * 1_000_000:8.1f}µs")
+
+
+def main():
+    """Parses the benchmark arguments and runs it"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    run(bench(args.items, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""An in-process stand-in for MongoDB that records every database round trip"""
+
+from collections import Counter
+from operator import ge, gt, le, lt
+from time import sleep
+from typing import Any, Dict, List, Optional, Union
+
+from pymongo import UpdateMany, UpdateOne
+
+MISSING = object()
+"""Stands for a field a document does not have"""
+
+COMPARISONS = {"$gt": gt, "$gte": ge, "$lt": lt, "$lte": le}
+
+
+def lookup(document: Dict, key: str) -> Any:
+    """Retrieves a possibly dotted field, or `MISSING`"""
+    for part in key.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return MISSING
+        document = document[part]
+    return document
+
+
+def assign(document: Dict, key: str, value: Any) -> None:
+    """Sets a possibly dotted field, creating the documents along its path"""
+    *parents, field = key.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[field] = value
+
+
+def remove(document: Dict, key: str) -> None:
+    """Removes a possibly dotted field, if the document has it"""
+    *parents, field = key.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(field, None)
+
+
+def satisfies(value: Any, condition: Any) -> bool:
+    """Checks a field value against an equality, `$in`, `$nin` or comparison
+    condition"""
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$in":
+            if value not in operand:
+                return False
+        elif operator == "$nin":
+            if value in operand:
+                return False
+        elif value is MISSING or not COMPARISONS[operator](value, operand):
+            return False
+    return True
+
+
+def matches(document: Dict, flt: Dict) -> bool:
+    """Checks a document against a filter of field conditions"""
+    return all(satisfies(lookup(document, key), condition) for key, condition in flt.items())
+
+
+def apply(document: Dict, update: Dict) -> None:
+    """Applies the `$set` and `$unset` operators of an update to a document"""
+    for key, value in update.get("$set", {}).items():
+        assign(document, key, value)
+    for key in update.get("$unset", {}):
+        remove(document, key)
+
+
+class RecordingCollection:
+    """
+    A dict-backed collection that counts one round trip per call and optionally
+    sleeps to simulate network latency
+    """
+
+    def __init__(self, name: str, latency: float = 0.0) -> None:
+        self.name = name
+        self.latency = latency
+        self.documents: List[Dict] = []
+        self.round_trips: Counter = Counter()
+
+    def _round_trip(self, operation: str) -> None:
+        self.round_trips[operation] += 1
+        if self.latency:
+            sleep(self.latency)
+
+    def _update(self, flt: Dict, update: Dict, upsert: bool, many: bool) -> None:
+        matched = False
+        for document in self.documents:
+            if matches(document, flt):
+                apply(document, update)
+                matched = True
+                if not many:
+                    return
+        if upsert and not matched:
+            document = {key: value for key, value in flt.items() if not isinstance(value, dict)}
+            apply(document, update)
+            self.documents.append(document)
+
+    def find_one(self, flt: Dict, *_: Any, **__: Any) -> Optional[Dict]:
+        """Retrieves the first matching document"""
+        self._round_trip("find_one")
+        return next((doc for doc in self.documents if matches(doc, flt)), None)
+
+    def find(self, flt: Dict, *_: Any, **__: Any) -> List[Dict]:
+        """Retrieves every matching document"""
+        self._round_trip("find")
+        return [doc for doc in self.documents if matches(doc, flt)]
+
+    def insert_one(self, document: Dict) -> None:
+        """Inserts a single document"""
+        self._round_trip("insert_one")
+        self.documents.append(document)
+
+    def update_one(self, flt: Dict, update: Dict, upsert: bool = False) -> None:
+        """Updates, or with `upsert` inserts, a single document"""
+        self._round_trip("update_one")
+        self._update(flt, update, upsert, many=False)
+
+    def bulk_write(
+        self, requests: List[Union[UpdateOne, UpdateMany]], ordered: bool = True
+    ) -> None:
+        """Applies a batch of `UpdateOne`s and `UpdateMany`s in one round trip"""
+        del ordered
+        self._round_trip("bulk_write")
+        for request in requests:
+            # pylint: disable=protected-access
+            self._update(
+                request._filter,
+                request._doc,
+                bool(request._upsert),
+                many=isinstance(request, UpdateMany),
+            )
+
+
+class RecordingDatabase:
+    """A database of `RecordingCollection`s created on first access"""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.collections: Dict[str, RecordingCollection] = {}
+
+    def get_collection(self, name: str) -> RecordingCollection:
+        """Retrieves, creating if needed, a collection by name"""
+        return self.collections.setdefault(name, RecordingCollection(name, self.latency))
+
+    @property
+    def round_trips(self) -> int:
+        """The total number of round trips made across every collection"""
+        return sum(sum(collection.round_trips.values()) for collection in self.collections.values())
+
+
+class RecordingMongoClient:
+    """Stands in for `MongoClient` with a single `RecordingDatabase`"""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.database = RecordingDatabase(latency)
+
+    def get_database(self, name: str) -> RecordingDatabase:
+        """Retrieves the database regardless of name"""
+        del name
+        return self.database
+
+    def close(self) -> None:
+        """Nothing to release"""
@@ -0,0 +1,110 @@
+"""A local stand-in for the Spotify web API used by the benchmarks"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Thread
+from time import sleep
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+from spotipy import Spotify
+
+
+def fake_artist(index: int) -> Dict:
+    """Builds a Spotify artist object"""
+    return {
+        "id": f"artist{index}",
+        "name": f"Artist {index}",
+        "popularity": index % 100,
+        "followers": {"total": index * 1000},
+        "genres": ["hip hop", "rap", f"genre {index % 7}"],
+        "type": "artist",
+    }
+
+
+def fake_track(index: int) -> Dict:
+    """Builds a Spotify track object"""
+    return {
+        "id": f"track{index}",
+        "name": f"Track {index}",
+        "artists": [{"id": f"artist{index}", "name": f"Artist {index}"}],
+        "popularity": index % 100,
+        "album": {"name": f"Album {index}", "release_date": "2021-01-01"},
+        "available_markets": ["US", "CA", "GB"],
+        "type": "track",
+    }
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    """Answers the subset of the Spotify web API used by `dependencies.spotify`"""
+
+    latency: float = 0.05
+    """Seconds to sleep before answering each request"""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handles a GET request after sleeping for the configured latency"""
+        sleep(self.latency)
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        limit = int(params.get("limit", ["20"])[0])
+        offset = int(params.get("offset", ["0"])[0])
+        parts = url.path.strip("/").split("/")[1:]
+
+        match parts:
+            case ["me", "top", "artists"]:
+                body = {"items": [fake_artist(i) for i in range(offset, offset + limit)]}
+            case ["me", "top", "tracks"]:
+                body = {"items": [fake_track(i) for i in range(offset, offset + limit)]}
+            case ["artists"]:
+                ids = params["ids"][0].split(",")
+                body = {"artists": [fake_artist(int(i.removeprefix("artist"))) for i in ids]}
+            case ["tracks"]:
+                ids = params["ids"][0].split(",")
+                body = {"tracks": [fake_track(int(i.removeprefix("track"))) for i in ids]}
+            case ["artists", artist_id]:
+                body = fake_artist(int(artist_id.removeprefix("artist") or 0))
+            case ["tracks", track_id]:
+                body = fake_track(int(track_id.removeprefix("track") or 0))
+            case ["recommendations"]:
+                body = {"tracks": [fake_track(i) for i in range(limit)]}
+            case _:
+                self.send_error(404)
+                return
+
+        payload = dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Silences per-request logging"""
+
+
+def serve_fake_spotify(latency: float) -> ThreadingHTTPServer:
+    """
+    Starts a fake Spotify server on an ephemeral port in a background thread
+
+    Params
+    ------
+    latency: float
+        seconds to sleep before answering each request
+
+    Returns
+    -------
+    server: ThreadingHTTPServer
+        the running server; call `shutdown` to stop it
+    """
+    handler = type("Handler", (FakeSpotifyHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_spotify_client(server: ThreadingHTTPServer) -> Spotify:
+    """Builds a spotipy client whose requests go to the fake server"""
+    client = Spotify(auth="fake-token", retries=0)
+    client.prefix = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    return client
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of aggregating detailed genre counts into broad genre bins
+
+Compares the previous approach, which scanned every genre once per bin with
+`filter_dict`, against `GenreMatcher`, with both a cold and a warm memo table.
+
+Usage
+-----
+python -m benchmarks.genre_bins --genres 5000 --repeat 20
+"""
+
+from argparse import ArgumentParser
+from itertools import product
+from operator import contains
+from timeit import timeit
+from typing import Dict
+
+from routes.genres import GenreMatcher, load_genre_bins
+
+GENRE_BINS = load_genre_bins()
+
+PREFIXES = ["", "alternative ", "underground ", "experimental ", "dark ", "chill "]
+PLACES = ["", "uk ", "chicago ", "atlanta ", "swedish ", "k-", "latin ", "bedroom "]
+STYLES = ["hip hop", "rap", "pop", "indie rock", "metal", "soul", "folk", "trap"]
+SUFFIXES = ["", " fusion", " revival", " nova", " core"]
+
+
+def make_genre_counts(total: int) -> Dict[str, int]:
+    """Builds `total` distinct genre names, each with a small count"""
+    names = (
+        f"{prefix}{place}{style}{suffix}{index if index else ''}"
+        for index in range(total)
+        for prefix, place, style, suffix in product(PREFIXES, PLACES, STYLES, SUFFIXES)
+    )
+    return {name: len(name) % 7 + 1 for name, _ in zip(names, range(total))}
+
+
+def scan_per_bin(genre_detail: Dict[str, int]) -> Dict[str, int]:
+    """Aggregates by scanning every genre once per bin, as the route used to"""
+    return {
+        key: sum(value for name, value in genre_detail.items() if contains(name, key))
+        for key in GENRE_BINS
+    }
+
+
+def main():
+    """Times each approach and prints the mean time per aggregation"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--genres", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    genre_detail = make_genre_counts(args.genres)
+    matcher = GenreMatcher(GENRE_BINS)
+    assert scan_per_bin(genre_detail) == matcher.aggregate(genre_detail)
+
+    timings = {
+        "scan per bin": timeit(lambda: scan_per_bin(genre_detail), number=args.repeat),
+        "matcher (cold)": timeit(
+            lambda: GenreMatcher(GENRE_BINS).aggregate(genre_detail), number=args.repeat
+        ),
+        "matcher (warm)": timeit(lambda: matcher.aggregate(genre_detail), number=args.repeat),
+    }
+
+    print(f"{len(genre_detail)} distinct genres, {len(GENRE_BINS)} bins")
+    for name, seconds in timings.items():
+        print(f"{name:<15} {seconds / args.repeat * 1000:8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+End-to-end load harness for the API routes
+
+The FastAPI app is driven in-process through the ASGI interface, with every route
+backed by a fake `SpotifyClient` that sleeps for a fixed latency on each upstream
+call. No network, Spotify account or MongoDB instance is needed, and the data is
+deterministic, so runs on the same machine are comparable. The top-list response
+cache is disabled unless `--response-cache` is given, so that every request
+reaches the fake client.
+
+Requests/sec and p50/p95/p99 latencies are reported for each route at each
+concurrency level. Results can be written as JSON and compared against a stored
+baseline; the run fails when any metric regresses by more than the tolerance.
+
+Usage
+-----
+python -m benchmarks.harness --latency 0.02 --concurrency 1 8 32 --output run.json
+python -m benchmarks.harness --baseline benchmarks/baselines/harness.json
+"""
+
+from argparse import ArgumentParser
+from asyncio import gather, run
+from sys import exit as sys_exit
+from time import perf_counter, sleep
+from typing import Dict, List, Optional, Tuple
+
+from dependencies.cache import StaleWhileRevalidateCache
+from dependencies.registry import get_registry
+from dependencies.spotify import DEFAULT_LIMIT, SpotifyClient
+from main import app
+from models.common import Query
+from routes.genres import count_genres
+
+from .asgi import call
+from .fake_spotify import fake_artist, fake_track
+from .report import (
+    Results,
+    compare,
+    load_cases,
+    print_comparison,
+    summarize,
+    write_results,
+)
+
+ROUTES: Dict[str, Tuple[str, str]] = {
+    "artists": ("/artists", "limit=50"),
+    "artist": ("/artists/artist1", ""),
+    "songs": ("/songs", "limit=50"),
+    "genres": ("/genres", "limit=50&aggregate=true"),
+    "recs": ("/recs", "seed_genres=rap&limit=50"),
+}
+"""The path and query string requested for each benchmarked route"""
+
+
+class LatencyClient(SpotifyClient):
+    """A `SpotifyClient` serving fake data after a fixed upstream latency"""
+
+    def __init__(self, query: Optional[Query], latency: float) -> None:
+        self.query = query
+        self.latency = latency
+
+    def __items(self) -> range:
+        sleep(self.latency)
+        return range((self.query and self.query.limit) or DEFAULT_LIMIT)
+
+    def get_artists_from_spotify(self) -> List[Dict]:
+        return [fake_artist(index) for index in self.__items()]
+
+    def get_artist_from_spotify(self, artist_id: str) -> Dict:
+        sleep(self.latency)
+        return fake_artist(int(artist_id.removeprefix("artist")))
+
+    def get_several_artists_from_spotify(self, artist_ids: List[str]) -> List[Dict]:
+        return [self.get_artist_from_spotify(artist_id) for artist_id in artist_ids]
+
+    def get_song_from_spotify(self, song_id: str) -> Dict:
+        sleep(self.latency)
+        return fake_track(int(song_id.removeprefix("track")))
+
+    def get_several_songs_from_spotify(self, song_ids: List[str]) -> List[Dict]:
+        return [self.get_song_from_spotify(song_id) for song_id in song_ids]
+
+    def get_songs_from_spotify(self) -> List[Dict]:
+        return [fake_track(index) for index in self.__items()]
+
+    def get_genres_from_spotify(self) -> List[str]:
+        sleep(self.latency)
+        return [genre for index in range(50) for genre in fake_artist(index)["genres"]]
+
+    def get_genre_counts_from_cache(self) -> Dict[str, int]:
+        return count_genres(self.get_genres_from_spotify())
+
+    def get_recommendations_from_spotify(self) -> List[Dict]:
+        return [fake_track(index) for index in self.__items()]
+
+
+class LatencyRegistry:
+    """Stands in for `ClientRegistry`, handing out `LatencyClient`s"""
+
+    def __init__(self, latency: float, response_cache: bool) -> None:
+        self.latency = latency
+        self.response_cache = (
+            StaleWhileRevalidateCache(256, 300, 86400)
+            if response_cache
+            else StaleWhileRevalidateCache(0, 0, 0)
+        )
+
+    def client(self, item_query: Query, user: Optional[str] = None) -> LatencyClient:
+        """Creates a fake client for the current request, whichever its user"""
+        return LatencyClient(item_query, self.latency)
+
+
+async def run_level(route: str, total: int, concurrency: int) -> Dict[str, float]:
+    """
+    Sends `total` requests to `route` from `concurrency` concurrent workers
+
+    Returns
+    -------
+    result: Dict[str, float]
+        requests/sec, latency percentiles in milliseconds, and the error count
+    """
+    path, query = ROUTES[route]
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = perf_counter()
+            reply = await call(app, path, query)
+            latencies.append(perf_counter() - start)
+            errors += reply.status >= 400
+
+    start = perf_counter()
+    await gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    return {**summarize(latencies, elapsed), "errors": errors}
+
+
+async def bench(args) -> Results:
+    """Runs each route at each concurrency level and prints one line per run"""
+    results: Results = {}
+    for route in args.routes:
+        await run_level(route, args.warmup, 1)
+        for concurrency in args.concurrency:
+            name = f"{route} c={concurrency}"
+            results[name] = await run_level(route, args.requests, concurrency)
+            print(
+                "{name:<16} {rps:8.1f} req/s  p50 {p50_ms:7.1f}ms  "
+                "p95 {p95_ms:7.1f}ms  p99 {p99_ms:7.1f}ms  errors {errors}".format(
+                    name=name, **results[name]
+                )
+            )
+
+    return results
+
+
+def main():
+    """Runs the harness, then writes and compares the results when asked to"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--response-cache", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    registry = LatencyRegistry(args.latency, args.response_cache)
+    app.dependency_overrides[get_registry] = lambda: registry
+    print(f"upstream latency {args.latency * 1000:.0f}ms")
+    results = run(bench(args))
+
+    if args.output:
+        parameters = {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ["output", "baseline", "tolerance"]
+        }
+        write_results(args.output, "harness", parameters, results)
+
+    if args.baseline:
+        print(f"\ncompared to {args.baseline}")
+        comparisons = compare(
+            results, load_cases(args.baseline), ["rps", "p50_ms", "p95_ms", "p99_ms"]
+        )
+        if print_comparison(comparisons, args.tolerance):
+            sys_exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Load test showing that request throughput scales with concurrency
+
+The API is served by uvicorn in-process and the `/songs` route is pointed at a
+local fake Spotify server that answers after a fixed latency. If upstream calls
+blocked the event loop, requests/sec would stay flat at `1 / latency` no matter
+how many clients were sending requests. Every request asks for the same top
+list, so the response and page caches, the spotify rate limit and the coalescing
+of identical concurrent calls are all disabled; each request then makes its own
+call to the fake server, and the upstream calls of each level are printed to
+show it.
+
+Usage
+-----
+python -m benchmarks.load_test --latency 0.05 --requests 200 --concurrency 1 4 16
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, Hashable
+
+from pymongo import MongoClient
+from requests import Session
+from uvicorn import Config, Server
+
+from benchmarks.fake_spotify import fake_spotify_client, serve_fake_spotify
+from benchmarks.report import percentile
+from dependencies.cache import StaleWhileRevalidateCache, TTLCache
+from dependencies.registry import ClientRegistry, get_registry
+from dependencies.scheduler import Scheduler
+from dependencies.singleflight import SingleFlight
+from main import app
+
+
+class Uncoalesced(SingleFlight):
+    """A flight that runs every call, however many identical calls are in flight"""
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        self.calls += 1
+        return func()
+
+
+def start_api(port: int) -> Server:
+    """Serves the API with uvicorn in a background thread"""
+    server = Server(Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        sleep(0.01)
+    return server
+
+
+def run_level(url: str, total: int, concurrency: int) -> Dict[str, float]:
+    """
+    Sends `total` requests to `url` from `concurrency` concurrent workers
+
+    Returns
+    -------
+    result: Dict[str, float]
+        requests/sec and latency percentiles in milliseconds
+    """
+    sessions = [Session() for _ in range(concurrency)]
+
+    def send(index: int) -> float:
+        start = perf_counter()
+        sessions[index % concurrency].get(url).raise_for_status()
+        return perf_counter() - start
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(send, range(total)))
+    elapsed = perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    """Runs the load test and prints one line per concurrency level"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = serve_fake_spotify(args.latency)
+    registry = ClientRegistry(
+        fake_spotify_client(fake),
+        MongoClient(connect=False),
+        response_cache=StaleWhileRevalidateCache(0, 0, 0),
+        page_cache=TTLCache(0, 0),
+        scheduler=Scheduler(0, 0),
+        flight=Uncoalesced(),
+    )
+    app.dependency_overrides[get_registry] = lambda: registry
+
+    api = start_api(args.port)
+    url = f"http://127.0.0.1:{args.port}/songs?limit=50"
+    print(f"upstream latency {args.latency * 1000:.0f}ms")
+    for level in args.concurrency:
+        calls = registry.flight.calls
+        result = run_level(url, args.requests, level)
+        print(
+            "concurrency {concurrency:>3}: {rps:8.1f} req/s  "
+            "p50 {p50_ms:7.1f}ms  p99 {p99_ms:7.1f}ms".format(**result)
+            + f"  {registry.flight.calls - calls} upstream calls"
+        )
+
+    api.should_exit = True
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
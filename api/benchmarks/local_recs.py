@@ -0,0 +1,89 @@
+"""
+Benchmark of local recommendations over a synthetic catalog
+
+Times a seed-track query answered by scanning every track with a single
+matrix-vector product, and by the cluster index probing a few clusters, and
+reports the share of the exact top-k the index finds. Building the index is timed
+against loading it back from disk, which is what happens on every restart after
+the first.
+
+Usage
+-----
+python -m benchmarks.local_recs --tracks 200000 --queries 200
+"""
+
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import numpy as np
+
+from dependencies.recommender import (
+    FEATURES,
+    ClusterIndex,
+    LocalRecommender,
+    TrackCatalog,
+    catalog_fingerprint,
+)
+
+
+def build_catalog(tracks: int) -> TrackCatalog:
+    """Builds a catalog of `tracks` tracks with random audio features"""
+    ids = [f"track{index}" for index in range(tracks)]
+    return TrackCatalog(
+        ids=ids,
+        names=ids,
+        artist_ids=[f"artist{index % 1000}" for index in range(tracks)],
+        artist_names=[f"Artist {index % 1000}" for index in range(tracks)],
+        features=np.random.default_rng(0).random((tracks, len(FEATURES))),
+    )
+
+
+def time_queries(recommender: LocalRecommender, seeds, limit: int):
+    """Returns the results for each seed and the mean time per query, in seconds"""
+    start = perf_counter()
+    results = [{item["id"] for item in recommender.recommend([seed], [], limit)} for seed in seeds]
+    return results, (perf_counter() - start) / len(seeds)
+
+
+def main():
+    """Times exact and indexed queries and the index build and load"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--tracks", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--probes", type=int, default=8)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.tracks)
+    seeds = [f"track{index}" for index in range(0, args.tracks, args.tracks // 200)]
+    seeds = seeds[: args.queries]
+    exact = LocalRecommender(catalog)
+
+    with TemporaryDirectory() as directory:
+        path = join(directory, "index.npz")
+        start = perf_counter()
+        index = ClusterIndex.build(exact.vectors, catalog_fingerprint(catalog))
+        built = perf_counter() - start
+        index.save(path)
+        start = perf_counter()
+        ClusterIndex.load(path, catalog_fingerprint(catalog))
+        loaded = perf_counter() - start
+
+    indexed = LocalRecommender(catalog, index, probes=args.probes)
+    expected, exact_time = time_queries(exact, seeds, args.limit)
+    found, indexed_time = time_queries(indexed, seeds, args.limit)
+    recall = np.mean([len(want & got) / len(want) for want, got in zip(expected, found)])
+
+    print(f"{args.tracks} tracks, top {args.limit}")
+    print(f"exact scan     {exact_time * 1000:8.2f}ms per query")
+    print(
+        f"cluster index  {indexed_time * 1000:8.2f}ms per query  "
+        f"recall {recall:.1%} ({args.probes} of {len(index.centroids)} clusters)"
+    )
+    print(f"index build    {built:8.2f}s   load from disk {loaded * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
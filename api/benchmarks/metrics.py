@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of recording metrics on the hot path
+
+Compares `Metrics`, which records into a shard owned by the calling thread, against
+a single table of series guarded by a lock, with every thread recording one
+histogram observation and one counter increment per simulated call.
+
+Usage
+-----
+python -m benchmarks.metrics --calls 200000 --threads 1 8
+"""
+
+from argparse import ArgumentParser
+from bisect import bisect_left
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+from dependencies.metrics import (
+    DEFAULT_BUCKETS,
+    SPOTIFY_ERRORS,
+    SPOTIFY_REQUEST_DURATION,
+    Metrics,
+)
+
+
+class LockedMetrics:
+    """Records every series in one table, taking a lock on each update"""
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple, float] = {}
+        self.histograms: Dict[Tuple, List[float]] = {}
+        self.lock = Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Adds to a counter"""
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Records a value in a histogram"""
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [0.0] * (len(DEFAULT_BUCKETS) + 3))
+            histogram[bisect_left(DEFAULT_BUCKETS, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+
+def measure(metrics, threads: int, calls: int) -> float:
+    """Returns the mean time to record one call, in seconds"""
+
+    def record(calls: int) -> None:
+        for index in range(calls):
+            metrics.observe(SPOTIFY_REQUEST_DURATION, index % 100 / 1000, method="x")
+            metrics.inc(SPOTIFY_ERRORS, method="x")
+
+    workers = [Thread(target=record, args=(calls // threads,)) for _ in range(threads)]
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (perf_counter() - start) / calls
+
+
+def main():
+    """Times each implementation and prints the mean time per recorded call"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    implementations: Dict[str, Callable] = {"locked": LockedMetrics, "sharded": Metrics}
+    for threads in args.threads:
+        for name, build in implementations.items():
+            seconds = measure(build(), threads, args.calls)
+            print(f"{threads:>3} threads {name:<8} {seconds * 1_000_000_000:8.1f}ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks of the model builders and genre counting used by every route
+
+Each case is timed over several repeats and the median and best time per call are
+reported. Results can be written as JSON and compared against a stored baseline;
+the run fails when the best time of a case is slower than the baseline by more
+than the tolerance. The best time is compared because it is the least sensitive to
+noise from the rest of the machine.
+
+Usage
+-----
+python -m benchmarks.models --output results.json
+python -m benchmarks.models --baseline benchmarks/baselines/models.json
+"""
+
+from argparse import ArgumentParser
+from statistics import median
+from sys import exit as sys_exit
+from timeit import Timer
+from typing import Callable, Dict
+
+from models.artist import Artist
+from models.collection import Collection
+from models.genre import Genre
+from models.rec import Rec
+from models.song import Song
+from routes.genres import count_genres, get_genre_aggregate
+
+from .fake_spotify import fake_artist, fake_track
+from .report import Results, compare, load_cases, print_comparison, write_results
+
+
+def build_cases(items: int) -> Dict[str, Callable[[], object]]:
+    """Builds the benchmark cases over `items` artists and songs"""
+    artists = [fake_artist(index) for index in range(items)]
+    tracks = [fake_track(index) for index in range(items)]
+    genres = [genre for artist in artists for genre in artist["genres"]]
+    genre_detail = count_genres(genres)
+    artist_models = [Artist.from_dict(artist) for artist in artists]
+
+    return {
+        "count_genres": lambda: count_genres(genres),
+        "get_genre_aggregate": lambda: get_genre_aggregate(genre_detail),
+        "Collection.from_list": lambda: Collection.from_list(artist_models),
+        "Artist.from_dict": lambda: [Artist.from_dict(item) for item in artists],
+        "Song.from_dict": lambda: [Song.from_dict(item) for item in tracks],
+        "Rec.from_dict": lambda: [Rec.from_dict(item) for item in tracks],
+        "Genre.from_tuple": lambda: [Genre.from_tuple(item) for item in genre_detail.items()],
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Times `func` over `repeat` runs, each long enough to be measured reliably
+
+    Returns
+    -------
+    timing: Dict[str, float]
+        the median and best time per call, in microseconds
+    """
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    per_call = [total / number * 1_000_000 for total in timer.repeat(repeat, number)]
+    return {"median_us": median(per_call), "best_us": min(per_call)}
+
+
+def main():
+    """Runs every case, then writes and compares the results when asked to"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results: Results = {}
+    for name, func in build_cases(args.items).items():
+        results[name] = measure(func, args.repeat)
+        print(
+            f"{name:<24} {results[name]['median_us']:10.2f}µs "
+            f"(best {results[name]['best_us']:.2f}µs)"
+        )
+
+    if args.output:
+        write_results(args.output, "models", {"items": args.items, "repeat": args.repeat}, results)
+
+    if args.baseline:
+        print(f"\ncompared to {args.baseline}")
+        comparisons = compare(results, load_cases(args.baseline), ["best_us"])
+        if print_comparison(comparisons, args.tolerance):
+            sys_exit(1)
+
+
+if __name__ == "__main__":
+    main()
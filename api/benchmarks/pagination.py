@@ -0,0 +1,95 @@
+"""
+Benchmark of reading top lists longer than one spotify page
+
+Times reading a top list of `--limit` songs from a fake spotify endpoint that
+answers each page after a fixed latency, first one page after another, then
+through `Client`, which fetches every page after the first concurrently. Then
+reads a run of overlapping limits through a shared page cache and counts the
+spotify calls they make.
+
+Usage
+-----
+python -m benchmarks.pagination --limit 200 --latency 0.05
+"""
+
+from argparse import ArgumentParser
+from threading import Lock
+from time import perf_counter, sleep
+from unittest.mock import MagicMock
+
+from dependencies.cache import TTLCache
+from dependencies.spotify import MAX_ITEMS_PER_PAGE, Client
+from models.song import SongQuery
+
+from .fake_spotify import fake_track
+
+
+class FakeTopTracks:
+    """A top-tracks endpoint that answers each page after a fixed latency"""
+
+    def __init__(self, total: int, latency: float) -> None:
+        self.total = total
+        self.latency = latency
+        self.calls = 0
+        self.lock = Lock()
+
+    def __call__(self, limit: int, offset: int = 0, time_range: str = "") -> dict:
+        sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+        end = min(offset + limit, self.total)
+        return {
+            "items": [fake_track(index) for index in range(offset, end)],
+            "total": self.total,
+        }
+
+
+def sequential(top_tracks: FakeTopTracks, limit: int) -> list:
+    """Reads the top list one page after another"""
+    items: list = []
+    for offset in range(0, limit, MAX_ITEMS_PER_PAGE):
+        page = top_tracks(limit=MAX_ITEMS_PER_PAGE, offset=offset)["items"]
+        items.extend(page)
+        if len(page) < MAX_ITEMS_PER_PAGE:
+            break
+    return items[:limit]
+
+
+def client(top_tracks: FakeTopTracks, limit: int, page_cache=None) -> Client:
+    """Builds a `Client` reading top tracks from `top_tracks`"""
+    spotify = MagicMock()
+    spotify.current_user_top_tracks.side_effect = top_tracks
+    return Client(SongQuery(limit=limit), spotify, MagicMock(), page_cache=page_cache)
+
+
+def main():
+    """Times sequential and concurrent pagination and counts reused pages"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    top_tracks = FakeTopTracks(args.limit, args.latency)
+    start = perf_counter()
+    expected = sequential(top_tracks, args.limit)
+    sequential_time = perf_counter() - start
+
+    start = perf_counter()
+    songs = client(top_tracks, args.limit).get_songs_from_spotify()
+    concurrent_time = perf_counter() - start
+    assert songs == expected
+
+    print(f"{args.limit} songs, {args.latency * 1000:.0f}ms per page")
+    print(f"{'sequential':<12} {sequential_time * 1000:8.1f}ms")
+    print(f"{'concurrent':<12} {concurrent_time * 1000:8.1f}ms")
+
+    limits = [60, 90, 20, 120, args.limit]
+    for name, page_cache in [("uncached", None), ("page cache", TTLCache(64, 60))]:
+        top_tracks = FakeTopTracks(args.limit, 0)
+        for limit in limits:
+            client(top_tracks, limit, page_cache).get_songs_from_spotify()
+        print(f"{name:<12} {top_tracks.calls:8d} calls for limits {limits}")
+
+
+if __name__ == "__main__":
+    main()
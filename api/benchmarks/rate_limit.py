@@ -0,0 +1,108 @@
+"""
+Benchmark of a burst of spotify calls against spotify's rate limit
+
+A fake spotify call answers after a fixed latency, or with a 429 and a
+`Retry-After` once more calls arrive than its own token bucket allows. A burst of
+calls is sent from many threads at once, first the way calls used to be made,
+each firing immediately and sleeping out its own `Retry-After` inside the request,
+then through the `Scheduler`, budgeted at spotify's rate.
+
+Usage
+-----
+python -m benchmarks.rate_limit --calls 200 --threads 16 --limit 50
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from time import perf_counter, sleep
+from typing import Callable, Dict
+
+from spotipy.exceptions import SpotifyException
+
+from dependencies.metrics import Metrics
+from dependencies.scheduler import Scheduler, TokenBucket, parse_retry_after
+
+from .report import summarize
+
+
+class RateLimitedSpotify:
+    """A spotify endpoint enforcing a rate limit with 429s"""
+
+    def __init__(self, limit: float, latency: float, retry_after: float) -> None:
+        self.bucket = TokenBucket(limit, limit)
+        self.latency = latency
+        self.retry_after = retry_after
+        self.rejected = 0
+        self.lock = Lock()
+
+    def call(self) -> Dict:
+        """Answers after the latency, or rejects the call once the limit is spent"""
+        with self.lock:
+            allowed = self.bucket.delay() <= 0
+            if allowed:
+                self.bucket.take()
+            else:
+                self.rejected += 1
+
+        sleep(self.latency)
+        if not allowed:
+            raise SpotifyException(
+                429, -1, "rate limited", headers={"Retry-After": str(self.retry_after)}
+            )
+        return {}
+
+
+def retry_in_request(spotify: RateLimitedSpotify) -> Dict:
+    """Retries a call after sleeping out its own `Retry-After`, as spotipy did"""
+    while True:
+        try:
+            return spotify.call()
+        except SpotifyException as ex:
+            sleep(parse_retry_after(ex.headers))
+
+
+def burst(send: Callable[[], Dict], calls: int, threads: int) -> Dict[str, float]:
+    """Sends `calls` calls from `threads` threads at once and summarizes them"""
+
+    def timed(_) -> float:
+        start = perf_counter()
+        send()
+        return perf_counter() - start
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(timed, range(calls)))
+    return summarize(latencies, perf_counter() - start)
+
+
+def main():
+    """Sends the burst both ways and prints the latency and number of 429s"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--limit", type=float, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=float, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls, spotify allows {args.limit:g}/s")
+    for name in ["immediate", "scheduled"]:
+        spotify = RateLimitedSpotify(args.limit, args.latency, args.retry_after)
+        scheduler = Scheduler(args.limit, args.limit, 10, Metrics())
+        send = (
+            partial(retry_in_request, spotify)
+            if name == "immediate"
+            else partial(scheduler.run, spotify.call)
+        )
+
+        result = burst(send, args.calls, args.threads)
+        print(
+            f"{name:<10} {result['rps']:7.1f} calls/s  p50 {result['p50_ms']:7.1f}ms  "
+            f"p99 {result['p99_ms']:7.1f}ms  429s {spotify.rejected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
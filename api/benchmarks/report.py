@@ -0,0 +1,174 @@
+"""Summarizes benchmark results and compares them against a stored baseline"""
+
+from json import dump, load
+from os import cpu_count
+from platform import platform, python_implementation, python_version
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+Results = Dict[str, Dict[str, float]]
+"""Metrics keyed by case name, then by metric name"""
+
+
+class Comparison(NamedTuple):
+    """A metric of one case, measured now and in the baseline"""
+
+    case: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+    """The relative change, where a positive value is always a regression"""
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Retrieves the nearest-rank percentile from a list of samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Summarizes the latencies of requests sent over `elapsed` seconds
+
+    Params
+    ------
+    latencies: List[float]
+        the latency of each request, in seconds
+    elapsed: float
+        the wall-clock time taken to send every request, in seconds
+
+    Returns
+    -------
+    summary: Dict[str, float]
+        requests/sec and the p50, p95 and p99 latencies in milliseconds
+    """
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def environment() -> Dict[str, object]:
+    """Describes the machine the benchmark ran on, so results can be matched up"""
+    return {
+        "python": f"{python_implementation()} {python_version()}",
+        "platform": platform(),
+        "cpus": cpu_count(),
+    }
+
+
+def write_results(path: str, benchmark: str, parameters: Dict, cases: Results):
+    """
+    Writes results as JSON, alongside the parameters and the environment that
+    produced them
+
+    Params
+    ------
+    path: str
+        the file to write
+    benchmark: str
+        the name of the benchmark
+    parameters: Dict
+        the arguments the benchmark was run with
+    cases: Results
+        the measured metrics of each case
+    """
+    with open(path, "w", encoding="utf-8") as handler:
+        dump(
+            {
+                "benchmark": benchmark,
+                "environment": environment(),
+                "parameters": parameters,
+                "cases": cases,
+            },
+            handler,
+            indent=2,
+        )
+        handler.write("\n")
+
+
+def load_cases(path: str) -> Results:
+    """Reads the measured metrics of each case from a results file"""
+    with open(path, encoding="utf-8") as handler:
+        return load(handler)["cases"]
+
+
+def compare(
+    cases: Results, baseline: Results, metrics: Optional[Sequence[str]] = None
+) -> List[Comparison]:
+    """
+    Compares the metrics measured both now and in the baseline
+
+    Requests/sec is better when higher; every other metric is a time and is better
+    when lower
+
+    Params
+    ------
+    cases: Results
+        the metrics measured now
+    baseline: Results
+        the metrics of the baseline
+    metrics: Optional[Sequence[str]]
+        the names of the metrics to compare; defaults to every metric
+
+    Returns
+    -------
+    comparisons: List[Comparison]
+        one comparison per metric found in both
+    """
+    comparisons = []
+    for case, measured in cases.items():
+        for metric, current in measured.items():
+            if metrics is not None and metric not in metrics:
+                continue
+
+            previous = baseline.get(case, {}).get(metric)
+            if not previous:
+                continue
+
+            change = (current - previous) / previous
+            comparisons.append(
+                Comparison(
+                    case,
+                    metric,
+                    previous,
+                    current,
+                    -change if metric == "rps" else change,
+                )
+            )
+
+    return comparisons
+
+
+def print_comparison(comparisons: List[Comparison], tolerance: float) -> bool:
+    """
+    Prints each comparison and flags those that regressed by more than `tolerance`
+
+    Params
+    ------
+    comparisons: List[Comparison]
+        the comparisons to print
+    tolerance: float
+        the relative regression allowed, e.g. 0.1 for 10%
+
+    Returns
+    -------
+    regressed: bool
+        True if any metric regressed by more than `tolerance`
+    """
+    regressed = False
+    for comparison in comparisons:
+        flag = ""
+        if comparison.change > tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        print(
+            f"{comparison.case:<32} {comparison.metric:<8} "
+            f"{comparison.baseline:10.2f} -> {comparison.current:10.2f} "
+            f"{abs(comparison.change):7.1%} "
+            f"{'worse' if comparison.change > 0 else 'better'}{flag}"
+        )
+
+    return regressed
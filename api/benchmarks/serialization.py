@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of serializing a `Collection` response
+
+Compares returning the model through FastAPI's `response_model`, which validates
+and encodes the already validated model a second time, against returning a
+`ModelResponse`, which serializes it directly, and against streaming it as
+NDJSON, for which the time to the first body chunk matters most. All routes are
+driven in-process through the ASGI interface, so no network or upstream calls are
+measured.
+
+The JSON, MessagePack and Arrow encodings of the collection are then compared by
+size, by the time to encode them and by the time a client takes to decode them.
+
+Usage
+-----
+python -m benchmarks.serialization --items 50 --repeat 2000
+"""
+
+from argparse import ArgumentParser
+from asyncio import run
+from json import loads
+from time import perf_counter
+from typing import Any, Callable, Tuple
+
+from fastapi import FastAPI
+
+from models.collection import Collection
+from models.song import Song
+from routes.responses import (
+    ModelResponse,
+    NDJSONResponse,
+    dumps,
+    dumps_arrow,
+    dumps_msgpack,
+    orjson_dumps,
+)
+
+from .asgi import call
+from .fake_spotify import fake_track
+
+
+def build_app(collection: Collection) -> FastAPI:
+    """Builds an app serving `collection` through each response path"""
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=Collection[Song])
+    async def response_model() -> Collection[Song]:
+        return collection
+
+    @app.get("/model-response", response_model=Collection[Song])
+    async def model_response() -> ModelResponse:
+        return ModelResponse(collection)
+
+    @app.get("/ndjson", response_model=Collection[Song])
+    async def ndjson() -> NDJSONResponse:
+        return NDJSONResponse(collection)
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, repeat: int) -> Tuple[float, float]:
+    """Returns the mean time to the first body chunk and per request, in seconds"""
+    await call(app, path)
+    to_first_byte = 0.0
+    start = perf_counter()
+    for _ in range(repeat):
+        sent_at = perf_counter()
+        to_first_byte += (await call(app, path)).first_byte - sent_at
+    return to_first_byte / repeat, (perf_counter() - start) / repeat
+
+
+def mean_time(func: Callable[[], Any], repeat: int) -> float:
+    """Returns the mean time of a call to `func`, in seconds"""
+    func()
+    start = perf_counter()
+    for _ in range(repeat):
+        func()
+    return (perf_counter() - start) / repeat
+
+
+def compare_formats(collection: Collection, repeat: int):
+    """Times encoding the collection in each format and decoding it again"""
+    # pylint: disable=import-outside-toplevel
+    from msgpack import unpackb
+    from pyarrow.ipc import open_stream
+
+    formats = [
+        ("json", lambda: dumps(collection), loads),
+        ("msgpack", lambda: dumps_msgpack(collection), unpackb),
+        ("arrow", lambda: dumps_arrow(collection), lambda b: open_stream(b).read_all()),
+    ]
+    print(f"\n{'format':<16} {'bytes':>10} {'encode':>10} {'decode':>10}")
+    for name, encode, decode in formats:
+        body = encode()
+        encode_time = mean_time(encode, repeat)
+        decode_time = mean_time(lambda: decode(body), repeat)
+        print(
+            f"{name:<16} {len(body):>10} {encode_time * 1_000_000:8.1f}µs "
+            f"{decode_time * 1_000_000:8.1f}µs"
+        )
+
+
+async def bench(items: int, repeat: int):
+    """Times each response path and prints the mean time per request"""
+    collection = Collection.from_list([Song.from_dict(fake_track(index)) for index in range(items)])
+    app = build_app(collection)
+
+    expected = await call(app, "/response-model")
+    assert expected.body == (await call(app, "/model-response")).body
+
+    print(f"{items} songs, orjson {'enabled' if orjson_dumps else 'not installed'}")
+    print(f"{'route':<16} {'first byte':>10} {'total':>10}")
+    for path in ["/response-model", "/model-response", "/ndjson"]:
+        first_byte, total = await measure(app, path, repeat)
+        print(f"{path:<16} {first_byte * 1_000_000:8.1f}µs {total * 1_000_000:8.1f}µs")
+
+    compare_formats(collection, repeat)
+
+
+def main():
+    """Parses the benchmark arguments and runs it"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    run(bench(args.items, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
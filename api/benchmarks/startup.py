@@ -0,0 +1,115 @@
+"""
+Benchmark of the API's cold start
+
+Each run starts a fresh interpreter, the way a new uvicorn or gunicorn worker
+does, and times importing the app and then running its startup handlers. MongoDB
+is never contacted during startup, so no instance is needed. The modules loaded
+by the import alone are checked against those that should only be loaded at
+startup or on first use.
+
+Results can be written as JSON and compared against a stored baseline; the run
+fails when the best import or startup time regresses by more than the tolerance.
+
+Usage
+-----
+python -m benchmarks.startup --runs 10 --output startup.json
+python -m benchmarks.startup --baseline benchmarks/baselines/startup.json
+"""
+
+from argparse import ArgumentParser
+from json import loads
+from os import environ
+from os.path import dirname
+from statistics import median
+from subprocess import run
+from sys import executable
+from sys import exit as sys_exit
+from typing import Dict, List
+
+from .report import Results, compare, load_cases, print_comparison, write_results
+
+DEFERRED_MODULES = (
+    "msgpack",
+    "numpy",
+    "opentelemetry.sdk.trace",
+    "pyarrow",
+    "pymongo",
+    "spotipy",
+    "uvicorn",
+    "yaml",
+)
+"""Modules that must not be loaded by importing the app"""
+
+CHILD = f"""
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+
+start_up = time.perf_counter()
+asyncio.run(main.app.router.startup())
+started = time.perf_counter()
+asyncio.run(main.app.router.shutdown())
+
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (started - start_up) * 1000,
+    "loaded": loaded,
+}}))
+"""
+"""Times a single cold start; run in a fresh interpreter"""
+
+
+def cold_start() -> Dict:
+    """Runs `CHILD` in a fresh interpreter from the API directory"""
+    process = run(
+        [executable, "-c", CHILD],
+        cwd=dirname(dirname(__file__)),
+        env={**environ, "TRACE_EXPORTER": "none"},
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return loads(process.stdout.splitlines()[-1])
+
+
+def summarize_runs(times: List[float]) -> Dict[str, float]:
+    """Summarizes the times of every run, in milliseconds"""
+    return {"median_ms": median(times), "best_ms": min(times)}
+
+
+def main():
+    """Times cold starts, then writes and compares the results when asked to"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    runs = [cold_start() for _ in range(args.runs)]
+    results: Results = {
+        "import": summarize_runs([result["import_ms"] for result in runs]),
+        "startup": summarize_runs([result["startup_ms"] for result in runs]),
+    }
+    for name, result in results.items():
+        print(f"{name:<8} {result['median_ms']:8.1f}ms (best {result['best_ms']:.1f}ms)")
+
+    loaded = sorted({name for result in runs for name in result["loaded"]})
+    if loaded:
+        print(f"loaded by the import: {', '.join(loaded)}")
+
+    if args.output:
+        write_results(args.output, "startup", {"runs": args.runs}, results)
+
+    if args.baseline:
+        print(f"\ncompared to {args.baseline}")
+        comparisons = compare(results, load_cases(args.baseline), ["best_ms"])
+        if print_comparison(comparisons, args.tolerance) or loaded:
+            sys_exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of looking up the spotify access token
+
+Times the token lookup made before every spotify call, first through
+`SpotifyOAuth`, which reads and validates the token cache file each time, then
+through the `TokenManager`, which keeps the token in memory. Then expires the
+token under a burst of concurrent calls and counts the refreshes each makes, with
+a fake refresh that takes a fixed latency.
+
+Usage
+-----
+python -m benchmarks.tokens --calls 10000 --threads 16
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Lock
+from time import perf_counter, sleep, time
+from typing import Dict
+
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyOAuth
+
+from dependencies.tokens import TokenManager
+
+
+class FakeOAuth(SpotifyOAuth):
+    """A `SpotifyOAuth` whose refresh answers after a fixed latency"""
+
+    def __init__(self, cache_path: str, latency: float) -> None:
+        super().__init__(
+            client_id="client",
+            client_secret="secret",
+            redirect_uri="http://localhost:8080",
+            cache_handler=CacheFileHandler(cache_path=cache_path),
+        )
+        self.latency = latency
+        self.refreshes = 0
+        self.lock = Lock()
+
+    def refresh_access_token(self, refresh_token: str) -> Dict:
+        sleep(self.latency)
+        with self.lock:
+            self.refreshes += 1
+        token = token_info(time() + 3600)
+        self.cache_handler.save_token_to_cache(token)
+        return token
+
+
+def token_info(expires_at: float) -> Dict:
+    """Builds token info that expires at `expires_at`"""
+    return {
+        "access_token": "access",
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "refresh_token": "refresh",
+        "scope": None,
+        "expires_at": int(expires_at),
+    }
+
+
+def time_lookups(auth_manager, calls: int) -> float:
+    """Returns the mean time of a token lookup, in seconds"""
+    auth_manager.get_access_token(as_dict=False)
+    start = perf_counter()
+    for _ in range(calls):
+        auth_manager.get_access_token(as_dict=False)
+    return (perf_counter() - start) / calls
+
+
+def burst(auth_manager, calls: int, threads: int) -> float:
+    """Looks the token up from `threads` threads at once and returns the wall time"""
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: auth_manager.get_access_token(as_dict=False), range(calls)))
+    return perf_counter() - start
+
+
+def main():
+    """Times token lookups both ways and counts the refreshes of an expired token"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--calls", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        cache_path = join(directory, ".cache")
+        print(f"{args.calls} lookups, {args.threads} concurrent after expiry")
+        for name in ["spotipy", "manager"]:
+            oauth = FakeOAuth(cache_path, args.latency)
+            auth_manager = oauth if name == "spotipy" else TokenManager(oauth)
+            oauth.cache_handler.save_token_to_cache(token_info(time() + 3600))
+            lookup = time_lookups(auth_manager, args.calls)
+
+            oauth.cache_handler.save_token_to_cache(token_info(time() - 1))
+            if name == "manager":
+                auth_manager.close()
+                auth_manager = TokenManager(oauth)
+            elapsed = burst(auth_manager, args.threads, args.threads)
+            if name == "manager":
+                auth_manager.close()
+
+            print(
+                f"{name:<8} {lookup * 1e6:8.2f}µs per lookup  "
+                f"expired burst {elapsed * 1000:7.1f}ms  refreshes {oauth.refreshes}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the tracing cost of a single request
+
+Each simulated request opens a route span with three upstream child spans, the
+shape of a cache-miss artist lookup. The previous setup, which pretty-printed
+every span through a `ConsoleSpanExporter`, is compared against each exporter of
+the tracing pipeline. Console output is written to `os.devnull` so the terminal
+does not skew the timings; the time to flush queued spans is included.
+
+Usage
+-----
+python -m benchmarks.tracing --requests 5000
+"""
+
+from argparse import ArgumentParser
+from os import devnull
+from time import perf_counter
+from typing import Callable, Dict
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+from dependencies.tracing import build_tracing
+
+
+def console_provider(out) -> TracerProvider:
+    """Builds the provider each route module used to install"""
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter(out=out)))
+    return provider
+
+
+def measure(provider: TracerProvider, requests: int) -> float:
+    """Returns the mean time spent tracing one request, in seconds"""
+    tracer = provider.get_tracer(__name__)
+    start = perf_counter()
+    for _ in range(requests):
+        with tracer.start_as_current_span("Retrieving an artist"):
+            for name in ["mongodb find_one", "spotify artist", "mongodb insert_one"]:
+                with tracer.start_as_current_span(name):
+                    pass
+    provider.force_flush()
+    elapsed = perf_counter() - start
+    provider.shutdown()
+    return elapsed / requests
+
+
+def main():
+    """Times each tracing setup and prints the mean time per request"""
+    parser = ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    with open(devnull, "w", encoding="utf-8") as out:
+        setups: Dict[str, Callable[[], TracerProvider]] = {
+            "console (previous)": lambda: console_provider(out),
+            "none": lambda: build_tracing("none").provider,
+            "memory": lambda: build_tracing("memory", 1.0).provider,
+            "memory, 10% sampled": lambda: build_tracing("memory", 0.1).provider,
+        }
+        timings = {name: measure(build(), args.requests) for name, build in setups.items()}
+
+    for name, seconds in timings.items():
+        print(f"{name:<20} {seconds * 1_000_000:8.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Defines the in-process caches used by the API"""
+
+from asyncio import Task, create_task
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from .scheduler import Priority, call_priority
+
+T = TypeVar("T")  # pylint: disable=invalid-name
+
+logger = getLogger(__name__)
+
+
+class TTLCache(Generic[T]):
+    """
+    A bounded, thread-safe mapping with least-recently-used eviction and a fixed
+    time-to-live for every entry
+
+    A cache with a `maxsize` of 0 stores nothing, so it can stand in wherever the
+    in-process tier is disabled
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.__entries: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """
+        Retrieves a live entry and marks it as the most recently used
+
+        Params
+        ------
+        key: Hashable
+            the key of the entry
+
+        Returns
+        -------
+        value: Optional[T]
+            the cached value, or None if it is missing or has expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self.__entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Optional[T]:
+        """
+        Retrieves a live entry without counting the lookup or marking it as used
+
+        Params
+        ------
+        key: Hashable
+            the key of the entry
+
+        Returns
+        -------
+        value: Optional[T]
+            the cached value, or None if it is missing or has expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, value: T) -> None:
+        """
+        Stores an entry, evicting the least recently used entries beyond `maxsize`
+
+        Params
+        ------
+        key: Hashable
+            the key of the entry
+        value: T
+            the value to cache
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self.__lock:
+            self.__entries[key] = (self.clock() + self.ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the cache counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the hit, miss, eviction and expiration counts and the current size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self),
+        }
+
+
+class ResponseEntry(NamedTuple):
+    """A cached response and the times at which it goes stale and expires"""
+
+    value: object
+    stale_at: float
+    expires_at: float
+
+
+class ResponseLoader(NamedTuple):
+    """The key of a cacheable response and how to compute it"""
+
+    key: Hashable
+    load: Callable[[], Awaitable[object]]
+
+
+class StaleWhileRevalidateCache:
+    """
+    A bounded cache of computed responses that serves stale entries while a single
+    background task refreshes them
+
+    Entries are fresh for `fresh_for` seconds and may be served stale for up to
+    `max_stale` seconds after that. Only a request that finds no usable entry waits
+    on the loader. Spotify calls made by a background refresh are scheduled behind
+    those of interactive requests. The cache is used from the event loop only, so
+    it needs no lock
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        fresh_for: float,
+        max_stale: float,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.__entries: OrderedDict[Hashable, ResponseEntry] = OrderedDict()
+        self.__refreshing: Dict[Hashable, Task] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """
+        Retrieves the response for `key`, loading it only when nothing usable is
+        cached and scheduling a background refresh when the entry is stale
+
+        Params
+        ------
+        key: Hashable
+            identifies the response, e.g. the endpoint and its query params
+        load: Callable[[], Awaitable[T]]
+            computes a fresh response
+
+        Returns
+        -------
+        value: T
+            the cached or freshly loaded response
+        """
+        now = self.clock()
+        entry = self.__entries.get(key)
+        if entry is not None and now < entry.expires_at:
+            self.__entries.move_to_end(key)
+            if now < entry.stale_at:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self.refresh(key, load)
+            return entry.value  # type: ignore
+
+        self.misses += 1
+        value = await load()
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: object) -> None:
+        """
+        Stores a freshly computed response, evicting the least recently used
+        entries beyond `maxsize`
+
+        Params
+        ------
+        key: Hashable
+            identifies the response
+        value: object
+            the response to cache
+        """
+        now = self.clock()
+        stale_at = now + self.fresh_for
+        self.__entries[key] = ResponseEntry(value, stale_at, stale_at + self.max_stale)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+
+    def refresh(self, key: Hashable, load: Callable[[], Awaitable[object]]) -> None:
+        """
+        Starts a background refresh of `key` unless one is already running
+
+        Params
+        ------
+        key: Hashable
+            identifies the response
+        load: Callable[[], Awaitable[object]]
+            computes a fresh response
+        """
+        if key in self.__refreshing:
+            return
+
+        self.refreshes += 1
+        self.__refreshing[key] = create_task(self.__refresh(key, load))
+
+    async def __refresh(self, key: Hashable, load: Callable[[], Awaitable[object]]):
+        call_priority.set(Priority.BACKGROUND)
+        try:
+            self.set(key, await load())
+        except Exception:  # pylint: disable=broad-except
+            self.refresh_errors += 1
+            logger.exception("Failed to refresh cached response %s", key)
+        finally:
+            del self.__refreshing[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the cache counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the fresh hit, stale hit, miss, refresh and refresh error counts and
+            the current size
+        """
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "size": len(self),
+        }
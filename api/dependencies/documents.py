@@ -0,0 +1,177 @@
+"""Defines the documents the API caches in MongoDB and the indexes they are read by"""
+
+from datetime import datetime, timezone
+from hashlib import blake2b
+from logging import getLogger
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+
+logger = getLogger(__name__)
+
+DATABASE = "datafy"
+ARTISTS = "artists"
+SONGS = "songs"
+TOKENS = "tokens"
+
+ARTIST_FIELDS = ("id", "name", "popularity", "followers.total", "genres")
+"""The fields of a spotify artist read by `Artist.from_dict`"""
+
+SONG_FIELDS = (
+    "id",
+    "name",
+    "artists.name",
+    "popularity",
+    "album.name",
+    "album.release_date",
+)
+"""The fields of a spotify track read by `Song.from_dict`"""
+
+DUPLICATE_KEY = 11000
+
+INDEXED_FIELDS = (
+    (ARTISTS, "id", False),
+    (SONGS, "id", False),
+    (TOKENS, "user_id", False),
+    (TOKENS, "api_key", True),
+)
+"""The collections looked up by a unique field, that field, and whether documents
+may leave it out"""
+
+
+def projection(fields: Sequence[str]) -> Dict[str, int]:
+    """
+    Builds the MongoDB projection that returns only `fields`
+
+    Params
+    ------
+    fields: Sequence[str]
+        the dotted paths of the fields to return
+
+    Returns
+    -------
+    projection: Dict[str, int]
+        the projection, which also leaves out `_id`
+    """
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+
+ARTIST_PROJECTION = projection(ARTIST_FIELDS)
+SONG_PROJECTION = projection(SONG_FIELDS)
+
+
+def compact(document: Dict, fields: Sequence[str]) -> Dict:
+    """
+    Keeps only `fields` of a spotify object, the same way a MongoDB projection does,
+    so that fetched and cached documents have the same shape
+
+    Params
+    ------
+    document: Dict
+        the spotify object
+    fields: Sequence[str]
+        the dotted paths of the fields to keep; paths into arrays of objects keep
+        the field of every element
+
+    Returns
+    -------
+    compact: Dict
+        the document with every other field left out
+    """
+    tree: Dict[str, Any] = {}
+    for field in fields:
+        *parents, leaf = field.split(".")
+        node = tree
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = None
+    return pick(document, tree)
+
+
+def pick(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keeps the branches of `tree` found in `value`, descending into arrays"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [pick(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: pick(value[key], branch) for key, branch in tree.items() if key in value}
+
+
+def rank_key(time_range: str, user: Optional[str] = None) -> str:
+    """
+    Builds the path under which a cached artist records its rank in a user's top
+    artists
+
+    Params
+    ------
+    time_range: str
+        the time range of the top list
+    user: Optional[str]
+        the user the top list belongs to, or None for the API's own identity
+
+    Returns
+    -------
+    path: str
+        `top_ranks.<time_range>`, or `user_ranks.<user hash>.<time_range>` for a
+        user, hashed since user IDs may hold characters field names cannot
+    """
+    if user is None:
+        return f"top_ranks.{time_range}"
+    digest = blake2b(user.encode(), digest_size=8).hexdigest()
+    return f"user_ranks.{digest}.{time_range}"
+
+
+def stored(document: Dict) -> Dict:
+    """
+    Stamps a compact document with the time it was fetched from spotify
+
+    Params
+    ------
+    document: Dict
+        the compact document
+
+    Returns
+    -------
+    stored: Dict
+        a copy of the document with a `fetched_at` timestamp
+    """
+    return {**document, "fetched_at": datetime.now(timezone.utc)}
+
+
+def ensure_indexes(mongo: "MongoClient") -> None:
+    """
+    Creates the unique indexes that artist, song, token and API key lookups rely
+    on. The API key index is sparse, so users who hold no key are left out of it
+
+    Creating an index that already exists does nothing. If a collection holds
+    duplicate keys from before the index existed, a non-unique index is created
+    instead so that lookups are still indexed. Errors are logged rather than raised
+    so that the API can start without MongoDB
+
+    Params
+    ------
+    mongo: MongoClient
+        the MongoDB client
+    """
+    # pylint: disable=import-outside-toplevel
+    from pymongo import ASCENDING
+    from pymongo.errors import OperationFailure, PyMongoError
+
+    database = mongo.get_database(DATABASE)
+    for name, field, sparse in INDEXED_FIELDS:
+        collection = database.get_collection(name)
+        try:
+            try:
+                collection.create_index(
+                    [(field, ASCENDING)], unique=True, sparse=sparse, name=field
+                )
+            except OperationFailure as ex:
+                if ex.code != DUPLICATE_KEY:
+                    raise
+                logger.warning("Duplicate %ss in %s; creating a non-unique index", field, name)
+                collection.create_index([(field, ASCENDING)], sparse=sparse, name=field)
+        except PyMongoError as ex:
+            logger.warning("Could not create the %s index on %s: %s", field, name, ex)
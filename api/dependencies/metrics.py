@@ -0,0 +1,261 @@
+"""Defines the runtime metrics exposed on the `/metrics` route"""
+
+from bisect import bisect_left
+from threading import Lock, local
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The upper bounds, in seconds, of the latency histogram buckets"""
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+"""The media type of the Prometheus text exposition format, less its charset"""
+
+HTTP_REQUEST_DURATION = "datafy_http_request_duration_seconds"
+HTTP_REQUESTS_IN_FLIGHT = "datafy_http_requests_in_flight"
+SPOTIFY_REQUEST_DURATION = "datafy_spotify_request_duration_seconds"
+SPOTIFY_ERRORS = "datafy_spotify_errors_total"
+MONGO_CACHE_LOOKUPS = "datafy_mongo_cache_lookups_total"
+SPOTIFY_QUEUE_DEPTH = "datafy_spotify_queue_depth"
+SPOTIFY_QUEUE_WAIT = "datafy_spotify_queue_wait_seconds"
+SPOTIFY_THROTTLED = "datafy_spotify_throttled_total"
+CACHE_EVENTS = "datafy_cache_events_total"
+CACHE_ENTRIES = "datafy_cache_entries"
+SINGLE_FLIGHT_CALLS = "datafy_single_flight_calls_total"
+SINGLE_FLIGHT_COLLAPSED = "datafy_single_flight_collapsed_total"
+
+DESCRIPTIONS: Dict[str, Tuple[str, str]] = {
+    HTTP_REQUEST_DURATION: ("histogram", "Latency of API requests by route"),
+    HTTP_REQUESTS_IN_FLIGHT: ("gauge", "API requests currently being served"),
+    SPOTIFY_REQUEST_DURATION: ("histogram", "Latency of spotify calls by method"),
+    SPOTIFY_ERRORS: ("counter", "Spotify calls that raised, by method"),
+    MONGO_CACHE_LOOKUPS: ("counter", "MongoDB cache lookups by entity and result"),
+    SPOTIFY_QUEUE_DEPTH: ("gauge", "Spotify calls waiting for rate-limit budget"),
+    SPOTIFY_QUEUE_WAIT: ("histogram", "Time spotify calls waited for budget"),
+    SPOTIFY_THROTTLED: ("counter", "Spotify calls rejected with a 429, by budget"),
+    CACHE_EVENTS: ("counter", "In-process cache lookups and removals by event"),
+    CACHE_ENTRIES: ("gauge", "Entries held by each in-process cache"),
+    SINGLE_FLIGHT_CALLS: ("counter", "Upstream calls made by call coalescing"),
+    SINGLE_FLIGHT_COLLAPSED: ("counter", "Calls that shared an identical call"),
+}
+
+
+class Shard:
+    """The series recorded by a single thread"""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms in the Prometheus data model
+
+    Every thread records into its own shard, so recording takes no lock and never
+    contends with other threads. The shards are only merged when the metrics are
+    rendered at scrape time
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.__local = local()
+        self.__shards: List[Shard] = []
+        self.__lock = Lock()
+
+    def __shard(self) -> Shard:
+        try:
+            return self.__local.shard
+        except AttributeError:
+            shard = self.__local.shard = Shard()
+            with self.__lock:
+                self.__shards.append(shard)
+            return shard
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter, or to a gauge when `amount` may be negative
+
+        Params
+        ------
+        name: str
+            the name of the series
+        amount: float
+            the amount to add
+        labels: str
+            the labels of the series
+        """
+        counters = self.__shard().counters
+        key = (name, tuple(labels.items()))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records a value in a histogram
+
+        Params
+        ------
+        name: str
+            the name of the series
+        value: float
+            the observed value, e.g. a latency in seconds
+        labels: str
+            the labels of the series
+        """
+        histograms = self.__shard().histograms
+        key = (name, tuple(labels.items()))
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0.0] * (len(self.buckets) + 3)
+
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def collect(
+        self,
+    ) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+        """
+        Merges the series recorded by every thread
+
+        Returns
+        -------
+        counters: Dict[Tuple[str, Labels], float]
+            the value of each counter and gauge, keyed by name and labels
+        histograms: Dict[Tuple[str, Labels], List[float]]
+            the per-bucket counts followed by the sum and the count of each
+            histogram, keyed by name and labels
+        """
+        with self.__lock:
+            shards = list(self.__shards)
+
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        for shard in shards:
+            for key, value in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, values in shard.histograms.copy().items():
+                merged = histograms.setdefault(key, [0.0] * len(values))
+                for index, value in enumerate(list(values)):
+                    merged[index] += value
+
+        return counters, histograms
+
+    def render(self, series: Optional[Dict[Tuple[str, Labels], float]] = None) -> str:
+        """
+        Renders every series in the Prometheus text exposition format
+
+        Params
+        ------
+        series: Optional[Dict[Tuple[str, Labels], float]]
+            counters and gauges read from their owners at scrape time, keyed by
+            name and labels, rendered alongside the recorded ones
+
+        Returns
+        -------
+        exposition: str
+            the series, grouped by metric name
+        """
+        counters, histograms = self.collect()
+        counters.update(series or {})
+        lines: List[str] = []
+        for name, (kind, description) in DESCRIPTIONS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (series, labels), values in sorted(histograms.items()):
+                    if series == name:
+                        lines.extend(self.__render_histogram(name, labels, values))
+            else:
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def __render_histogram(self, name: str, labels: Labels, values: List[float]) -> List[str]:
+        lines = []
+        cumulative = 0.0
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, values):
+            cumulative += count
+            bucket_labels = format_labels(labels + (("le", bound),))
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative:g}")
+        lines.append(f"{name}_sum{format_labels(labels)} {values[-2]:g}")
+        lines.append(f"{name}_count{format_labels(labels)} {values[-1]:g}")
+        return lines
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Formats labels as a Prometheus label set
+
+    Params
+    ------
+    labels: Labels
+        the label names and values
+
+    Returns
+    -------
+    label_set: str
+        the escaped label set, or an empty string when there are no labels
+    """
+    if not labels:
+        return ""
+
+    pairs = (f'{key}="{escape_label(value)}"' for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+def escape_label(value: str) -> str:
+    """Escapes a label value for the text exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+METRICS = Metrics()
+"""The process-wide metrics"""
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of each request by route, and the number
+    of requests in flight
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Optional[Metrics] = None) -> None:
+        self.app = app
+        self.metrics = METRICS if metrics is None else metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.inc(HTTP_REQUESTS_IN_FLIGHT)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe(
+                HTTP_REQUEST_DURATION,
+                perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+            self.metrics.inc(HTTP_REQUESTS_IN_FLIGHT, -1)
@@ -0,0 +1,401 @@
+"""Defines the local recommendation engine over the audio features of stored tracks"""
+
+from hashlib import blake2b
+from os import getenv
+from os.path import exists
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for local recommendations
+    np = None
+
+recs_settings = {
+    "database_url": getenv("RECS_DATABASE_URL", "postgresql://localhost:5432/datafy"),
+    "index_path": getenv("RECS_INDEX_PATH", "recs_index.npz"),
+    "ann_min_tracks": int(getenv("RECS_ANN_MIN_TRACKS", "50000")),
+    "ann_probes": int(getenv("RECS_ANN_PROBES", "8")),
+}
+
+FEATURES = (
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "loudness",
+    "speechiness",
+    "tempo",
+    "valence",
+)
+"""The audio features of the `track` table that tracks are compared on"""
+
+CATALOG_QUERY = f"""
+SELECT track.id, track.name, track.artist_id, COALESCE(artist.name, ''),
+       {", ".join(f"track.{feature}" for feature in FEATURES)}
+FROM track LEFT JOIN artist ON artist.id = track.artist_id
+WHERE {" AND ".join(f"track.{feature} IS NOT NULL" for feature in FEATURES)}
+ORDER BY track.id
+"""
+"""Selects every track whose audio features are all known"""
+
+
+class TrackCatalog(NamedTuple):
+    """The tracks that can be recommended, with one row of features per track"""
+
+    ids: List[str]
+    names: List[str]
+    artist_ids: List[str]
+    artist_names: List[str]
+    features: "np.ndarray"
+    """A `(tracks, len(FEATURES))` matrix of raw audio features"""
+
+
+def load_catalog(database_url: Optional[str] = None) -> TrackCatalog:
+    """
+    Loads the audio features of every stored track from PostgreSQL
+
+    Params
+    ------
+    database_url: Optional[str]
+        the PostgreSQL connection string; defaults to `RECS_DATABASE_URL`
+
+    Returns
+    -------
+    catalog: TrackCatalog
+        the tracks ordered by ID, with their features as a matrix
+
+    Raises
+    ------
+    ImportError
+        if numpy or psycopg2 is not installed
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from psycopg2 import connect
+    except ImportError as ex:
+        raise ImportError("local recommendations require psycopg2") from ex
+    if np is None:
+        raise ImportError("local recommendations require numpy")
+
+    connection = connect(database_url or recs_settings["database_url"])
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(CATALOG_QUERY)
+            rows = cursor.fetchall()
+    finally:
+        connection.close()
+
+    return TrackCatalog(
+        ids=[row[0] for row in rows],
+        names=[row[1] for row in rows],
+        artist_ids=[row[2] for row in rows],
+        artist_names=[row[3] for row in rows],
+        features=np.array([row[4:] for row in rows], dtype=np.float64).reshape(
+            len(rows), len(FEATURES)
+        ),
+    )
+
+
+def normalize(features: "np.ndarray") -> "np.ndarray":
+    """
+    Scales each feature to zero mean and unit variance, then each track to unit
+    length, so that a dot product between two rows is their cosine similarity
+
+    Params
+    ------
+    features: np.ndarray
+        a `(tracks, features)` matrix of raw audio features
+
+    Returns
+    -------
+    vectors: np.ndarray
+        the normalized `float32` matrix
+    """
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    vectors = ((features - features.mean(axis=0)) / scale).astype(np.float32)
+    return unit(vectors)
+
+
+def unit(vectors: "np.ndarray") -> "np.ndarray":
+    """Scales each row to unit length, leaving rows of zeros as they are"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def catalog_fingerprint(catalog: TrackCatalog) -> str:
+    """
+    Hashes the tracks and features of a catalog, so that an index saved for one
+    catalog is never loaded for another
+
+    Params
+    ------
+    catalog: TrackCatalog
+        the catalog to hash
+
+    Returns
+    -------
+    fingerprint: str
+        a hex digest of the catalog
+    """
+    digest = blake2b(digest_size=16)
+    digest.update("\n".join(catalog.ids).encode())
+    digest.update(np.ascontiguousarray(catalog.features).tobytes())
+    return digest.hexdigest()
+
+
+class ClusterIndex:
+    """
+    An approximate nearest-neighbour index that groups tracks into clusters
+
+    Tracks are clustered with spherical k-means. A query is only compared with the
+    tracks of the `probes` clusters whose centroids are most similar to it, rather
+    than with the whole catalog
+    """
+
+    def __init__(
+        self, centroids: "np.ndarray", assignments: "np.ndarray", fingerprint: str
+    ) -> None:
+        self.centroids = centroids
+        self.assignments = assignments
+        self.fingerprint = fingerprint
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.clusters = [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    @classmethod
+    def build(
+        cls,
+        vectors: "np.ndarray",
+        fingerprint: str,
+        clusters: Optional[int] = None,
+        iterations: int = 10,
+    ):
+        """
+        Clusters normalized track vectors
+
+        Params
+        ------
+        vectors: np.ndarray
+            the normalized track vectors
+        fingerprint: str
+            the fingerprint of the catalog the vectors come from
+        clusters: Optional[int]
+            the number of clusters; defaults to the square root of the track count
+        iterations: int
+            the number of k-means iterations
+
+        Returns
+        -------
+        index: ClusterIndex
+            the index over `vectors`
+        """
+        clusters = clusters or max(1, int(np.sqrt(len(vectors))))
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+        assignments = np.zeros(len(vectors), dtype=np.int32)
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            filled = np.bincount(assignments, minlength=clusters) > 0
+            centroids[filled] = unit(sums[filled])
+        return cls(centroids, assignments, fingerprint)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str):
+        """
+        Loads an index saved by `save`
+
+        Params
+        ------
+        path: str
+            the `.npz` file the index was saved to
+        fingerprint: str
+            the fingerprint of the current catalog
+
+        Returns
+        -------
+        index: Optional[ClusterIndex]
+            the saved index, or None if there is none or it belongs to another
+            catalog
+        """
+        if not exists(path):
+            return None
+
+        with np.load(path) as saved:
+            if str(saved["fingerprint"]) != fingerprint:
+                return None
+            return cls(saved["centroids"], saved["assignments"], fingerprint)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index, so that it is only rebuilt when the catalog changes
+
+        Params
+        ------
+        path: str
+            the `.npz` file to write
+        """
+        with open(path, "wb") as handler:
+            np.savez(
+                handler,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                fingerprint=np.array(self.fingerprint),
+            )
+
+    def candidates(self, query: "np.ndarray", probes: int) -> "np.ndarray":
+        """
+        Retrieves the tracks of the clusters closest to `query`
+
+        Params
+        ------
+        query: np.ndarray
+            a normalized query vector
+        probes: int
+            the number of clusters to search
+
+        Returns
+        -------
+        positions: np.ndarray
+            the positions in the catalog of the candidate tracks
+        """
+        probes = min(probes, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return np.concatenate([self.clusters[cluster] for cluster in closest])
+
+
+class LocalRecommender:
+    """
+    Recommends the stored tracks whose audio features are most similar to those of
+    the seed tracks and artists
+
+    Features are normalized once into a matrix of unit vectors, so each query is
+    scored against every track, or every track of the probed clusters when the
+    catalog is large enough to be indexed, with a single matrix-vector product
+    """
+
+    def __init__(
+        self,
+        catalog: TrackCatalog,
+        index: Optional[ClusterIndex] = None,
+        probes: Optional[int] = None,
+    ) -> None:
+        if np is None:
+            raise ImportError("local recommendations require numpy")
+
+        self.catalog = catalog
+        self.vectors = normalize(catalog.features)
+        self.index = index
+        self.probes = recs_settings["ann_probes"] if probes is None else probes
+        self.positions = {track_id: pos for pos, track_id in enumerate(catalog.ids)}
+        self.artist_positions: Dict[str, List[int]] = {}
+        for pos, artist_id in enumerate(catalog.artist_ids):
+            self.artist_positions.setdefault(artist_id, []).append(pos)
+
+    @classmethod
+    def from_catalog(
+        cls,
+        catalog: TrackCatalog,
+        index_path: Optional[str] = None,
+        ann_min_tracks: Optional[int] = None,
+    ):
+        """
+        Creates a recommender, indexing the catalog when it is large
+
+        An index saved for the same catalog is loaded from `index_path`; otherwise
+        a new one is built and saved there
+
+        Params
+        ------
+        catalog: TrackCatalog
+            the tracks that can be recommended
+        index_path: Optional[str]
+            where the index is saved; defaults to `RECS_INDEX_PATH`
+        ann_min_tracks: Optional[int]
+            the smallest catalog that is indexed; defaults to `RECS_ANN_MIN_TRACKS`
+
+        Returns
+        -------
+        recommender: LocalRecommender
+            a recommender over `catalog`
+        """
+        index_path = index_path or recs_settings["index_path"]
+        if ann_min_tracks is None:
+            ann_min_tracks = recs_settings["ann_min_tracks"]
+
+        recommender = cls(catalog)
+        if len(catalog.ids) >= ann_min_tracks:
+            fingerprint = catalog_fingerprint(catalog)
+            index = ClusterIndex.load(index_path, fingerprint)
+            if index is None:
+                index = ClusterIndex.build(recommender.vectors, fingerprint)
+                index.save(index_path)
+            recommender.index = index
+        return recommender
+
+    def __len__(self) -> int:
+        return len(self.catalog.ids)
+
+    def recommend(
+        self, seed_tracks: Sequence[str], seed_artists: Sequence[str], limit: int
+    ) -> List[Dict]:
+        """
+        Finds the `limit` tracks most similar to the seeds, excluding the seeds
+
+        Params
+        ------
+        seed_tracks: Sequence[str]
+            the IDs of the seed tracks
+        seed_artists: Sequence[str]
+            the IDs of the seed artists, whose stored tracks are all used as seeds
+        limit: int
+            the maximum number of recommendations
+
+        Returns
+        -------
+        recommendations: List[Dict]
+            the recommended tracks, most similar first, shaped like the tracks
+            spotify recommends
+
+        Raises
+        ------
+        ValueError
+            if none of the seeds are in the catalog, or there is nothing else in it
+        """
+        seeds = [self.positions[seed] for seed in seed_tracks if seed in self.positions]
+        for seed in seed_artists:
+            seeds.extend(self.artist_positions.get(seed, []))
+        if not seeds:
+            raise ValueError("none of the seeds are in the local catalog")
+
+        query = unit(self.vectors[seeds].mean(axis=0))
+        positions = (
+            np.arange(len(self))
+            if self.index is None
+            else self.index.candidates(query, self.probes)
+        )
+        positions = positions[~np.isin(positions, seeds)]
+        if len(positions) == 0:
+            raise ValueError("the local catalog has no tracks besides the seeds")
+
+        scores = self.vectors[positions] @ query
+        top = min(limit, len(positions))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        return [
+            {
+                "id": self.catalog.ids[pos],
+                "name": self.catalog.names[pos],
+                "artists": [
+                    {
+                        "id": self.catalog.artist_ids[pos],
+                        "name": self.catalog.artist_names[pos],
+                    }
+                ],
+            }
+            for pos in positions[best]
+        ]
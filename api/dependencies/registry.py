@@ -0,0 +1,364 @@
+"""Defines the process-wide registry of upstream clients shared by every request"""
+
+from os import getenv
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from models.common import Query
+
+from .cache import StaleWhileRevalidateCache, TTLCache
+from .metrics import (
+    CACHE_ENTRIES,
+    CACHE_EVENTS,
+    SINGLE_FLIGHT_CALLS,
+    SINGLE_FLIGHT_COLLAPSED,
+    Labels,
+)
+from .scheduler import Scheduler
+from .singleflight import SingleFlight
+from .spotify import Client, settings
+from .tokens import TokenManager
+from .users import UserPool
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+    from requests import Session
+    from spotipy import Spotify
+
+    from .recommender import LocalRecommender
+
+pool_settings = {
+    "spotify_pool_size": int(getenv("SPOTIFY_POOL_SIZE", str(settings["max_workers"]))),
+    "mongo_max_pool_size": int(getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "mongo_min_pool_size": int(getenv("MONGO_MIN_POOL_SIZE", "0")),
+}
+
+cache_settings = {
+    "entity_cache_size": int(getenv("ENTITY_CACHE_SIZE", "10000")),
+    "artist_cache_ttl": float(getenv("ARTIST_CACHE_TTL", "3600")),
+    "song_cache_ttl": float(getenv("SONG_CACHE_TTL", "86400")),
+    "page_cache_size": int(getenv("PAGE_CACHE_SIZE", "128")),
+    "page_cache_ttl": float(getenv("PAGE_CACHE_TTL", "60")),
+    "response_cache_size": int(getenv("RESPONSE_CACHE_SIZE", "256")),
+    "response_fresh_for": float(getenv("RESPONSE_FRESH_FOR", "300")),
+    "response_max_stale": float(getenv("RESPONSE_MAX_STALE", "86400")),
+    "recs_catalog_ttl": float(getenv("RECS_CATALOG_TTL", "3600")),
+}
+
+rate_limit_settings = {
+    "spotify_rate_limit": float(getenv("SPOTIFY_RATE_LIMIT", "10")),
+    "spotify_burst": float(getenv("SPOTIFY_BURST", "30")),
+    "spotify_max_throttle_retries": int(getenv("SPOTIFY_MAX_THROTTLE_RETRIES", "3")),
+}
+
+
+def build_session(pool_size: int, session: Optional["Session"] = None) -> "Session":
+    """
+    Builds an HTTP session whose connection pool can hold `pool_size` connections
+
+    The retry policy mirrors the one spotipy builds for its own sessions, except
+    that 429s are not retried inside the request; they are left to the `Scheduler`,
+    which backs off every queued call for the `Retry-After` instead
+
+    Params
+    ------
+    pool_size: int
+        the maximum number of keep-alive connections kept per host
+    session: Optional[Session]
+        the session to mount the pool on; defaults to a new session
+
+    Returns
+    -------
+    session: Session
+        a requests session with a sized connection pool mounted for http and https
+    """
+    # pylint: disable=import-outside-toplevel
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = Session() if session is None else session
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=3,
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def load_recommender() -> "LocalRecommender":
+    """
+    Loads a local recommender over the stored tracks, importing numpy only once
+    local recommendations are first requested
+
+    Returns
+    -------
+    recommender: LocalRecommender
+        a recommender over the track catalog
+    """
+    # pylint: disable=import-outside-toplevel
+    from .recommender import LocalRecommender, load_catalog
+
+    return LocalRecommender.from_catalog(load_catalog())
+
+
+class ClientRegistry:
+    """
+    Holds the Spotify and MongoDB clients for the lifetime of the application
+
+    Both clients own connection pools, so they are created once at startup and
+    shared by every request instead of being rebuilt per request. The registry
+    also owns the in-process artist and song caches that sit in front of MongoDB
+    and the cache of top-list responses, coalesces identical upstream calls made
+    by concurrent requests, and schedules spotify calls within its rate limit. The
+    local recommender is loaded on first use and reloaded once `RECS_CATALOG_TTL`
+    has passed.
+
+    Requests made for a user go through that user's client from the `UserPool`;
+    every other request uses the API's own spotify identity
+    """
+
+    def __init__(
+        self,
+        spotify: "Spotify",
+        mongo: "MongoClient",
+        artist_cache: Optional[TTLCache[Dict]] = None,
+        song_cache: Optional[TTLCache[Dict]] = None,
+        page_cache: Optional[TTLCache[Dict]] = None,
+        response_cache: Optional[StaleWhileRevalidateCache] = None,
+        flight: Optional[SingleFlight] = None,
+        scheduler: Optional[Scheduler] = None,
+        recommender_loader: Optional[Callable[[], "LocalRecommender"]] = None,
+        users: Optional[UserPool] = None,
+    ) -> None:
+        self.spotify = spotify
+        self.mongo = mongo
+        self.users = users
+        if artist_cache is None:
+            artist_cache = TTLCache(
+                cache_settings["entity_cache_size"], cache_settings["artist_cache_ttl"]
+            )
+        if song_cache is None:
+            song_cache = TTLCache(
+                cache_settings["entity_cache_size"], cache_settings["song_cache_ttl"]
+            )
+        if page_cache is None:
+            page_cache = TTLCache(
+                cache_settings["page_cache_size"], cache_settings["page_cache_ttl"]
+            )
+        if response_cache is None:
+            response_cache = StaleWhileRevalidateCache(
+                cache_settings["response_cache_size"],
+                cache_settings["response_fresh_for"],
+                cache_settings["response_max_stale"],
+            )
+        self.artist_cache = artist_cache
+        self.song_cache = song_cache
+        self.page_cache = page_cache
+        self.response_cache = response_cache
+        self.flight = SingleFlight() if flight is None else flight
+        if scheduler is None:
+            scheduler = Scheduler(
+                rate_limit_settings["spotify_rate_limit"],
+                rate_limit_settings["spotify_burst"],
+                rate_limit_settings["spotify_max_throttle_retries"],
+            )
+        self.scheduler = scheduler
+        self.recommender_loader = (
+            load_recommender if recommender_loader is None else recommender_loader
+        )
+        self.recommender_cache: TTLCache["LocalRecommender"] = TTLCache(
+            1, cache_settings["recs_catalog_ttl"]
+        )
+
+    @classmethod
+    def from_env(cls, connection_string: Optional[str] = None):
+        """
+        Creates a `ClientRegistry` from the environment
+
+        Params
+        ------
+        connection_string: Optional[str]
+            the MongoDB connection string; defaults to `CONNECTIONSTRING`
+
+        Returns
+        -------
+        registry: ClientRegistry
+            a registry with freshly created, pooled clients
+        """
+        # pylint: disable=import-outside-toplevel
+        from pymongo import MongoClient
+        from spotipy import Spotify
+        from spotipy.oauth2 import SpotifyOAuth
+
+        from .documents import DATABASE, TOKENS
+        from .user_clients import SharedSession
+
+        spotify = Spotify(
+            auth_manager=TokenManager(
+                SpotifyOAuth(
+                    client_id=settings["client_id"],
+                    client_secret=settings["client_secret"],
+                    redirect_uri="http://localhost:8080",
+                    scope=settings["scopes"],
+                )
+            ),
+            requests_session=build_session(pool_settings["spotify_pool_size"]),
+        )
+        mongo = MongoClient(
+            connection_string or getenv("CONNECTIONSTRING"),
+            maxPoolSize=pool_settings["mongo_max_pool_size"],
+            minPoolSize=pool_settings["mongo_min_pool_size"],
+            connect=False,
+        )
+        users = UserPool(
+            mongo.get_database(DATABASE).get_collection(TOKENS),
+            build_session(pool_settings["spotify_pool_size"], SharedSession()),
+        )
+        return cls(spotify, mongo, users=users)
+
+    def client(self, item_query: Query, user: Optional[str] = None) -> Client:
+        """
+        Creates a request-scoped `Client` backed by the shared clients
+
+        Params
+        ------
+        item_query: Query
+            the query for the current request
+        user: Optional[str]
+            the user the request is made for, or None for the API's own identity
+
+        Returns
+        -------
+        client: Client
+            a client that reuses the registry's connection pools
+
+        Raises
+        ------
+        HTTPException(401)
+            if a user is given but the registry serves no users
+        """
+        spotify = self.spotify
+        if user is not None:
+            if self.users is None:
+                raise HTTPException(401, "Unknown user")
+            spotify = self.users.spotify(user)
+
+        return Client(
+            item_query,
+            spotify,
+            self.mongo,
+            self.artist_cache,
+            self.song_cache,
+            self.flight,
+            scheduler=self.scheduler,
+            user=user,
+            page_cache=self.page_cache,
+        )
+
+    def local_recommender(self) -> "LocalRecommender":
+        """
+        Retrieves the local recommender, loading the track catalog if it has not
+        been loaded yet or has expired
+
+        Concurrent requests that find no recommender share a single load
+
+        Returns
+        -------
+        recommender: LocalRecommender
+            a recommender over the stored tracks
+        """
+        recommender = self.recommender_cache.get("local")
+        if recommender is None:
+            recommender = self.flight.do(("local_recommender",), self.recommender_loader)
+            self.recommender_cache.set("local", recommender)
+        return recommender
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Retrieves the counters of the in-process caches, call coalescing and the
+        spotify scheduler
+
+        Returns
+        -------
+        stats: Dict[str, Dict[str, int]]
+            a mapping of component name to its counters
+        """
+        return {
+            "artist_cache": self.artist_cache.stats(),
+            "song_cache": self.song_cache.stats(),
+            "page_cache": self.page_cache.stats(),
+            "response_cache": self.response_cache.stats(),
+            "single_flight": self.flight.stats(),
+            "scheduler": self.scheduler.stats(),
+            **(
+                {"tokens": self.spotify.auth_manager.stats()}
+                if isinstance(self.spotify.auth_manager, TokenManager)
+                else {}
+            ),
+            **({} if self.users is None else {"users": self.users.stats()}),
+        }
+
+    def series(self) -> Dict[Tuple[str, Labels], float]:
+        """
+        Retrieves the counters of the in-process caches and call coalescing as
+        metric series, read each time `/metrics` is scraped
+
+        Returns
+        -------
+        series: Dict[Tuple[str, Labels], float]
+            the value of each series, keyed by name and labels
+        """
+        series: Dict[Tuple[str, Labels], float] = {}
+        for name, cache in [
+            ("artist", self.artist_cache),
+            ("song", self.song_cache),
+            ("page", self.page_cache),
+            ("response", self.response_cache),
+        ]:
+            counters = cache.stats()
+            series[(CACHE_ENTRIES, (("cache", name),))] = counters.pop("size")
+            for event, value in counters.items():
+                series[(CACHE_EVENTS, (("cache", name), ("event", event)))] = value
+
+        flight = self.flight.stats()
+        series[(SINGLE_FLIGHT_CALLS, ())] = flight["calls"]
+        series[(SINGLE_FLIGHT_COLLAPSED, ())] = flight["collapsed"]
+        return series
+
+    def close(self) -> None:
+        """Closes the connection pools held by the registry and stops refreshing
+        the access tokens"""
+        if isinstance(self.spotify.auth_manager, TokenManager):
+            self.spotify.auth_manager.close()
+        if self.users is not None:
+            self.users.close()
+        self.mongo.close()
+
+
+def get_registry(request: Request) -> ClientRegistry:
+    """
+    FastAPI dependency that retrieves the registry created at application startup
+
+    Params
+    ------
+    request: Request
+        the incoming request
+
+    Returns
+    -------
+    registry: ClientRegistry
+        the application's client registry
+    """
+    return request.app.state.registry
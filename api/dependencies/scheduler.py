@@ -0,0 +1,349 @@
+"""Defines the rate-limit-aware scheduler every spotify call goes through"""
+
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition
+from time import monotonic, time
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, TypeVar
+
+from .metrics import (
+    METRICS,
+    SPOTIFY_QUEUE_DEPTH,
+    SPOTIFY_QUEUE_WAIT,
+    SPOTIFY_THROTTLED,
+    Metrics,
+)
+
+T = TypeVar("T")  # pylint: disable=invalid-name
+
+DEFAULT_BUDGET = "app"
+"""The budget shared by calls made with the application's own credentials"""
+
+USER_BUDGET_PREFIX = "user:"
+"""The prefix of the budget of calls made with a user's own token"""
+
+MIN_PRUNE_BUDGETS = 64
+"""The number of budgets held before idle ones are first pruned"""
+
+DEFAULT_RETRY_AFTER = 1.0
+"""Seconds to back off when spotify sends a 429 without a usable `Retry-After`"""
+
+
+class Priority(IntEnum):
+    """The order in which queued spotify calls are let through, lowest first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+call_priority: ContextVar[Priority] = ContextVar("call_priority", default=Priority.INTERACTIVE)
+"""The priority of spotify calls made from the current context"""
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> float:
+    """
+    Reads the number of seconds to wait from a `Retry-After` header
+
+    Params
+    ------
+    headers: Optional[Mapping[str, str]]
+        the headers of a 429 response
+
+    Returns
+    -------
+    seconds: float
+        the delay in seconds, or `DEFAULT_RETRY_AFTER` if it is missing or invalid
+    """
+    headers = headers or {}
+    value = headers.get("Retry-After", headers.get("retry-after"))
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def user_budget(user: Optional[str]) -> str:
+    """
+    Names the budget that the calls made for a user are charged to
+
+    Params
+    ------
+    user: Optional[str]
+        the spotify user ID, or None for the API's own identity
+
+    Returns
+    -------
+    budget: str
+        `DEFAULT_BUDGET`, or a budget of the user's own
+    """
+    return DEFAULT_BUDGET if user is None else f"{USER_BUDGET_PREFIX}{user}"
+
+
+class TokenBucket:
+    """
+    A budget of `burst` calls refilled at `rate` calls per second
+
+    A bucket with a `rate` of 0 never runs out, but can still be paused
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = monotonic) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def delay(self) -> float:
+        """
+        Refills the bucket and retrieves how long until a call may be made
+
+        Returns
+        -------
+        delay: float
+            the seconds until a token is available, or 0 if one is available now
+        """
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate <= 0:
+            return 0.0
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self) -> bool:
+        """
+        Checks whether the bucket is full and not paused, and so would behave the
+        same as a new bucket
+
+        Returns
+        -------
+        idle: bool
+            whether the bucket can be dropped and created again when next needed
+        """
+        now = self.clock()
+        if now < self.paused_until:
+            return False
+        return self.rate <= 0 or self.tokens + (now - self.updated) * self.rate >= self.burst
+
+    def take(self) -> None:
+        """Spends one token"""
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops handing out tokens for `seconds`, and empties the bucket so that calls
+        resume at `rate` rather than in a burst
+
+        Params
+        ------
+        seconds: float
+            how long to pause for
+        """
+        now = self.clock()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = max(self.updated, self.paused_until)
+
+
+class Scheduler:
+    """
+    Lets spotify calls through at the rate allowed by a token bucket per budget
+
+    Calls that find their budget spent wait in a priority queue, so interactive
+    lookups go ahead of background refreshes and bursts are smoothed out instead
+    of being sent at once. When spotify answers with a 429 the budget is paused
+    for its `Retry-After`, so every queued call backs off together, and the call
+    is retried once the pause is over
+
+    A budget is held for each user with recent calls. Whenever the number held
+    doubles, budgets with no queued calls and a full, unpaused bucket are dropped,
+    since a new bucket would behave the same, so the held budgets stay bounded by
+    the users active at once
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_retries: int = 3,
+        metrics: Optional[Metrics] = None,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.metrics = METRICS if metrics is None else metrics
+        self.clock = clock
+        self.throttled = 0
+        self.__buckets: Dict[str, TokenBucket] = {}
+        self.__queues: Dict[str, List[Tuple[int, int]]] = {}
+        self.__prune_at = MIN_PRUNE_BUDGETS
+        self.__tickets = count()
+        self.__condition = Condition()
+
+    def __bucket(self, budget: str) -> TokenBucket:
+        bucket = self.__buckets.get(budget)
+        if bucket is None:
+            if len(self.__buckets) >= self.__prune_at:
+                self.__prune()
+            bucket = self.__buckets[budget] = TokenBucket(self.rate, self.burst, self.clock)
+        return bucket
+
+    def __prune(self) -> None:
+        """Drops the budgets with no queued calls whose buckets are idle"""
+        for budget, bucket in list(self.__buckets.items()):
+            if not self.__queues.get(budget) and bucket.idle():
+                del self.__buckets[budget]
+                self.__queues.pop(budget, None)
+        self.__prune_at = max(MIN_PRUNE_BUDGETS, 2 * len(self.__buckets))
+
+    def acquire(self, budget: str, priority: Priority) -> float:
+        """
+        Waits until the call is at the head of its budget's queue and the budget
+        has a token to spend
+
+        Params
+        ------
+        budget: str
+            the budget the call is charged to
+        priority: Priority
+            the priority of the call
+
+        Returns
+        -------
+        waited: float
+            the seconds spent waiting
+        """
+        ticket = (int(priority), next(self.__tickets))
+        start = monotonic()
+        depth_labels = {"priority": priority.name.lower()}
+        with self.__condition:
+            bucket = self.__bucket(budget)
+            queue = self.__queues.setdefault(budget, [])
+            heappush(queue, ticket)
+            self.metrics.inc(SPOTIFY_QUEUE_DEPTH, **depth_labels)
+            try:
+                while True:
+                    if queue[0] != ticket:
+                        self.__condition.wait()
+                        continue
+
+                    delay = bucket.delay()
+                    if delay <= 0:
+                        bucket.take()
+                        heappop(queue)
+                        if not queue:
+                            del self.__queues[budget]
+                        self.__condition.notify_all()
+                        return monotonic() - start
+
+                    self.__condition.wait(delay)
+            except BaseException:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    heapify(queue)
+                    if not queue:
+                        self.__queues.pop(budget, None)
+                    self.__condition.notify_all()
+                raise
+            finally:
+                self.metrics.inc(SPOTIFY_QUEUE_DEPTH, -1, **depth_labels)
+
+    def pause(self, budget: str, seconds: float) -> None:
+        """
+        Pauses a budget, e.g. for the `Retry-After` of a 429
+
+        Params
+        ------
+        budget: str
+            the budget to pause
+        seconds: float
+            how long to pause for
+        """
+        with self.__condition:
+            self.__bucket(budget).pause(seconds)
+            self.__condition.notify_all()
+
+    def run(
+        self,
+        func: Callable[[], T],
+        budget: str = DEFAULT_BUDGET,
+        priority: Optional[Priority] = None,
+    ) -> T:
+        """
+        Runs a spotify call once its budget allows, retrying it after the
+        `Retry-After` of a 429
+
+        Params
+        ------
+        func: Callable[[], T]
+            makes the spotify call
+        budget: str
+            the budget the call is charged to
+        priority: Optional[Priority]
+            the priority of the call; defaults to `call_priority`
+
+        Returns
+        -------
+        result: T
+            the result of `func`
+
+        Raises
+        ------
+        SpotifyException
+            if the call fails for any reason other than a 429, or is still
+            rejected after `max_retries` retries
+        """
+        # pylint: disable=import-outside-toplevel
+        from spotipy.exceptions import SpotifyException
+
+        priority = call_priority.get() if priority is None else priority
+        labels = {"priority": priority.name.lower()}
+        retries = 0
+        while True:
+            self.metrics.observe(SPOTIFY_QUEUE_WAIT, self.acquire(budget, priority), **labels)
+            try:
+                return func()
+            except SpotifyException as ex:
+                if ex.http_status != 429:
+                    raise
+
+                self.throttled += 1
+                # user budgets share a label, to keep user IDs out of the series
+                self.metrics.inc(SPOTIFY_THROTTLED, budget=budget.split(":", maxsplit=1)[0])
+                self.pause(budget, parse_retry_after(ex.headers))
+                if retries == self.max_retries:
+                    raise
+                retries += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the scheduler counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the number of budgets held, of queued calls and of calls rejected
+            with a 429
+        """
+        with self.__condition:
+            budgets = len(self.__buckets)
+            queued = sum(len(queue) for queue in self.__queues.values())
+        return {"budgets": budgets, "queued": queued, "throttled": self.throttled}
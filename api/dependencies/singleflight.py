@@ -0,0 +1,76 @@
+"""Defines request coalescing for identical concurrent upstream calls"""
+
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")  # pylint: disable=invalid-name
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into a single execution
+
+    The first caller for a key runs the call; every caller that arrives while it is
+    in flight waits for and receives the same result, or the same exception. Once
+    the call finishes the key is released, so later callers start a new call
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.collapsed = 0
+        self.__in_flight: Dict[Hashable, Future] = {}
+        self.__lock = Lock()
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        """
+        Runs `func` unless a call with the same key is already in flight, in which
+        case its result is awaited instead
+
+        Params
+        ------
+        key: Hashable
+            the normalized upstream call, e.g. `("artist", artist_id)`
+        func: Callable[[], T]
+            makes the upstream call
+
+        Returns
+        -------
+        result: T
+            the result of the single execution for `key`
+        """
+        with self.__lock:
+            future = self.__in_flight.get(key)
+            leader = future is None
+            if future is None:
+                future = self.__in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the coalescing counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the number of upstream calls made and the number of calls collapsed
+            into one already in flight
+        """
+        return {"calls": self.calls, "collapsed": self.collapsed}
@@ -1,23 +1,63 @@
 """Defines the base Spotify service with configurations"""
 
 from abc import abstractmethod
-from logging import INFO, basicConfig, getLogger
+from asyncio import get_running_loop
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import copy_context
+from functools import lru_cache
+from logging import getLogger
 from os import getenv
-from typing import Any, Dict, List
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from dotenv import load_dotenv
 from fastapi import HTTPException
 from models.common import Query
 from models.rec import RecQuery
-from pymongo import MongoClient
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyOAuth
 
-load_dotenv()
+from .cache import TTLCache
+from .documents import (
+    ARTIST_FIELDS,
+    ARTIST_PROJECTION,
+    ARTISTS,
+    DATABASE,
+    SONG_FIELDS,
+    SONG_PROJECTION,
+    SONGS,
+    compact,
+    projection,
+    rank_key,
+    stored,
+)
+from .metrics import (
+    METRICS,
+    MONGO_CACHE_LOOKUPS,
+    SPOTIFY_ERRORS,
+    SPOTIFY_REQUEST_DURATION,
+    Metrics,
+)
+from .scheduler import Priority, Scheduler, call_priority, user_budget
+from .singleflight import SingleFlight
+from .tracing import mongo_span, spotify_span
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+    from pymongo.collection import Collection
+    from spotipy import Spotify
 
-basicConfig(level=INFO)
 logger = getLogger(__name__)
 
+T = TypeVar("T")  # pylint: disable=invalid-name
+
 settings = {
     "scopes": "  ".join(
         [
@@ -26,16 +66,22 @@ settings = {
     ),
     "client_id": getenv("CLIENT_ID"),
     "client_secret": getenv("CLIENT_SECRET"),
+    "max_workers": int(getenv("SPOTIFY_MAX_WORKERS", "16")),
+    "background_workers": int(getenv("SPOTIFY_BACKGROUND_WORKERS", "4")),
+    "genre_artists": int(getenv("GENRE_ARTISTS", "50")),
 }
 
-CLIENT = Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=settings["client_id"],
-        client_secret=settings["client_secret"],
-        redirect_uri="http://localhost:8080",
-        scope=settings["scopes"],
-    )
-)
+DEFAULT_LIMIT = 20
+"""The number of items spotify returns when no limit is given"""
+
+DEFAULT_TIME_RANGE = "medium_term"
+"""The time range spotify uses when none is given"""
+
+MAX_IDS_PER_REQUEST = 50
+"""The most IDs spotify accepts on its several-artists and several-tracks endpoints"""
+
+MAX_ITEMS_PER_PAGE = 50
+"""The most items spotify returns in one page of a top list"""
 
 
 class SpotifyClient:
@@ -59,10 +105,18 @@ class SpotifyClient:
     def get_artist_from_spotify(self, artist_id: str) -> Dict[str, Any]:
         """Should retrieve a single artist"""
 
+    @abstractmethod
+    def get_several_artists_from_spotify(self, artist_ids: List[str]) -> List[Dict]:
+        """Should retrieve several artists by ID, in the requested order"""
+
     @abstractmethod
     def get_song_from_spotify(self, song_id: str) -> Dict:
         """Should retrieve a single song"""
 
+    @abstractmethod
+    def get_several_songs_from_spotify(self, song_ids: List[str]) -> List[Dict]:
+        """Should retrieve several songs by ID, in the requested order"""
+
     @abstractmethod
     def get_songs_from_spotify(self) -> List[Dict]:
         """Should retrieve a list of songs"""
@@ -71,28 +125,93 @@ class SpotifyClient:
     def get_genres_from_spotify(self) -> List[str]:
         """Should retrieve a list of genres"""
 
+    @abstractmethod
+    def get_genre_counts_from_cache(self) -> Dict[str, int]:
+        """Should count the genres of the cached top artists"""
+
     @abstractmethod
     def get_recommendations_from_spotify(self) -> List[Dict]:
         """Should retrieve a list of recommendations"""
 
+    def get_cached_artists(self, artist_ids: List[str]) -> Optional[List[Dict]]:
+        """Retrieves artists without blocking, if all of them are held in memory"""
+        return None
+
+    def get_cached_songs(self, song_ids: List[str]) -> Optional[List[Dict]]:
+        """Retrieves songs without blocking, if all of them are held in memory"""
+        return None
+
 
 class Client(SpotifyClient):
     """Concrete implementation of a Spotify client"""
 
-    def __init__(self, item_query: Query) -> None:
-        self.client = Spotify(
-            auth_manager=SpotifyOAuth(
-                client_id=settings["client_id"],
-                client_secret=settings["client_secret"],
-                redirect_uri="http://localhost:8080",
-                scope=settings["scopes"],
-            )
-        )
-        self.db_client = MongoClient(getenv("CONNECTIONSTRING"))
-        self.__database = self.db_client.get_database("datafy")
-        self.artists_collection = self.__database.get_collection("artists")
-        self.songs_collection = self.__database.get_collection("songs")
+    def __init__(
+        self,
+        item_query: Query,
+        client: "Spotify",
+        db_client: "MongoClient",
+        artist_cache: Optional[TTLCache[Dict]] = None,
+        song_cache: Optional[TTLCache[Dict]] = None,
+        flight: Optional[SingleFlight] = None,
+        metrics: Optional[Metrics] = None,
+        scheduler: Optional[Scheduler] = None,
+        user: Optional[str] = None,
+        page_cache: Optional[TTLCache[Dict]] = None,
+    ) -> None:
+        self.client = client
+        self.db_client = db_client
+        self.__database = self.db_client.get_database(DATABASE)
+        self.artists_collection = self.__database.get_collection(ARTISTS)
+        self.songs_collection = self.__database.get_collection(SONGS)
+        self.artist_cache = TTLCache(0, 0) if artist_cache is None else artist_cache
+        self.song_cache = TTLCache(0, 0) if song_cache is None else song_cache
+        self.flight = SingleFlight() if flight is None else flight
+        self.metrics = METRICS if metrics is None else metrics
+        self.scheduler = Scheduler(0, 0) if scheduler is None else scheduler
+        self.page_cache = TTLCache(0, 0) if page_cache is None else page_cache
         self.query = item_query
+        self.user = user
+
+    def __user_key(self, *key: Any) -> Tuple[Any, ...]:
+        """Scopes the key of a call about the current user to that user, so that
+        calls made for different users are never shared"""
+        return key if self.user is None else (("user", self.user), *key)
+
+    def __spotify(self, operation: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Calls a spotipy method inside a client span once the scheduler lets it
+        through, recording the latency of each attempt and whether it raised
+
+        Params
+        ------
+        operation: str
+            the name of the spotipy method, e.g. `artists`
+        args: Any
+            positional arguments passed to the method
+        kwargs: Any
+            keyword arguments passed to the method
+
+        Returns
+        -------
+        result: Any
+            the response of the spotify api
+        """
+        method = getattr(self.client, operation)
+
+        def call() -> Any:
+            start = perf_counter()
+            try:
+                with spotify_span(operation):
+                    return method(*args, **kwargs)
+            except Exception:
+                self.metrics.inc(SPOTIFY_ERRORS, method=operation)
+                raise
+            finally:
+                self.metrics.observe(
+                    SPOTIFY_REQUEST_DURATION, perf_counter() - start, method=operation
+                )
+
+        return self.scheduler.run(call, user_budget(self.user))
 
     def get_artists_from_spotify(self) -> List:
         """
@@ -108,20 +227,198 @@ class Client(SpotifyClient):
         HTTPException(404)
             if no top artists are found for the current user
         """
-        top_artists = self.client.current_user_top_artists(
-            limit=self.query.limit,
-            time_range=self.query.time_range,
-        )
+        top_artists = self.__top_artists(self.query.limit, self.query.time_range)
 
         if not top_artists:
             raise HTTPException(404, "Top artists not found")
 
-        for artist in top_artists["items"]:
-            self.artists_collection.update_one(
-                {"id": artist["id"]}, {"$set": artist}, upsert=True
+        return top_artists
+
+    def __top_artists(self, limit: Optional[int], time_range: Optional[str]) -> List[Dict]:
+        """
+        Retrieves the current users top artists from spotify and caches them in
+        MongoDB
+
+        Artists are cached as compact documents holding only the fields the API
+        reads. Each cached artist records its rank for the current user under
+        `rank_key`, and artists that have dropped out of the ranks of a fetched
+        page lose theirs, so the cache can answer questions about the top list
+        without spotify
+
+        Params
+        ------
+        limit: Optional[int]
+            the number of artists to retrieve
+        time_range: Optional[str]
+            the time range to retrieve artists for
+
+        Returns
+        -------
+        top_artists: List[Dict]
+            the spotify artist objects, in rank order
+        """
+        time_range = time_range or DEFAULT_TIME_RANGE
+
+        def store(offset: int, artists: List[Dict]) -> None:
+            # pylint: disable=import-outside-toplevel
+            from pymongo import UpdateMany, UpdateOne
+
+            ranks = rank_key(time_range, self.user)
+            ids = [artist["id"] for artist in artists]
+            # a short page is the end of the list, so every later rank is stale
+            dropped = {"$gte": offset}
+            if len(artists) == MAX_ITEMS_PER_PAGE:
+                dropped["$lt"] = offset + MAX_ITEMS_PER_PAGE
+            requests = [
+                UpdateOne(
+                    {"id": artist["id"]},
+                    {
+                        "$set": {
+                            **stored(compact(artist, ARTIST_FIELDS)),
+                            ranks: offset + rank,
+                        }
+                    },
+                    upsert=True,
+                )
+                for rank, artist in enumerate(artists)
+            ] + [UpdateMany({ranks: dropped, "id": {"$nin": ids}}, {"$unset": {ranks: ""}})]
+            with mongo_span("bulk_write", self.artists_collection.name):
+                self.artists_collection.bulk_write(requests, ordered=False)
+
+        return self.__top_items(
+            "current_user_top_artists", limit or DEFAULT_LIMIT, time_range, store
+        )
+
+    def __top_items(
+        self,
+        operation: str,
+        limit: int,
+        time_range: str,
+        store: Optional[Callable[[int, List[Dict]], None]] = None,
+    ) -> List[Dict]:
+        """
+        Retrieves the first `limit` items of one of the current users top lists
+
+        Spotify returns at most `MAX_ITEMS_PER_PAGE` items per call, so the list is
+        read in pages at fixed offsets. The first page also gives the length of
+        the list; every further page it takes to reach `limit` is then fetched
+        concurrently, and the pages are merged in rank order. Pages are cached and
+        shared on their own, so requests for different limits reuse the pages
+        they have in common
+
+        Params
+        ------
+        operation: str
+            the spotipy method reading the top list, e.g.
+            `current_user_top_artists`
+        limit: int
+            the number of items to retrieve
+        time_range: str
+            the time range to retrieve items for
+        store: Optional[Callable[[int, List[Dict]], None]]
+            called with the offset and items of every page fetched from spotify
+
+        Returns
+        -------
+        items: List[Dict]
+            the spotify objects of the top list, in rank order
+        """
+        first = self.__top_page(operation, 0, time_range, store)
+        items = list(first["items"])
+        if len(items) < MAX_ITEMS_PER_PAGE or limit <= MAX_ITEMS_PER_PAGE:
+            return items[:limit]
+
+        end = min(limit, first.get("total", limit))
+        executor = get_page_executor(call_priority.get())
+        pending = [
+            executor.submit(
+                copy_context().run,
+                self.__top_page,
+                operation,
+                offset,
+                time_range,
+                store,
             )
+            for offset in range(MAX_ITEMS_PER_PAGE, end, MAX_ITEMS_PER_PAGE)
+        ]
+        for future in pending:
+            page = future.result()["items"]
+            items.extend(page)
+            if len(page) < MAX_ITEMS_PER_PAGE:
+                break
+        return items[:limit]
+
+    def __top_page(
+        self,
+        operation: str,
+        offset: int,
+        time_range: str,
+        store: Optional[Callable[[int, List[Dict]], None]],
+    ) -> Dict:
+        """Retrieves a page of a top list, sharing the call with any identical one
+        already in flight and keeping the page in the page cache"""
+        key = self.__user_key(operation, time_range, offset)
+        cached = self.page_cache.get(key)
+        if cached is not None:
+            return cached
+
+        def fetch() -> Dict:
+            page = self.__spotify(
+                operation,
+                limit=MAX_ITEMS_PER_PAGE,
+                offset=offset,
+                time_range=time_range,
+            ) or {"items": []}
+            if page["items"] and store is not None:
+                store(offset, page["items"])
+            self.page_cache.set(key, page)
+            return page
+
+        return self.flight.do(key, fetch)
+
+    def get_cached_artists(self, artist_ids: List[str]) -> Optional[List[Dict]]:
+        """
+        Retrieves artists from the in-process cache alone, without blocking
 
-        return top_artists["items"]
+        Params
+        ------
+        artist_ids: List[str]
+            the spotify IDs of the artists
+
+        Returns
+        -------
+        artists: Optional[List[Dict]]
+            the artist objects in the requested order, or None unless every
+            artist is held in memory
+        """
+        return self.__get_cached(artist_ids, self.artist_cache)
+
+    def get_cached_songs(self, song_ids: List[str]) -> Optional[List[Dict]]:
+        """
+        Retrieves songs from the in-process cache alone, without blocking
+
+        Params
+        ------
+        song_ids: List[str]
+            the spotify IDs of the songs
+
+        Returns
+        -------
+        songs: Optional[List[Dict]]
+            the song objects in the requested order, or None unless every song is
+            held in memory
+        """
+        return self.__get_cached(song_ids, self.song_cache)
+
+    @staticmethod
+    def __get_cached(ids: List[str], cache: TTLCache[Dict]) -> Optional[List[Dict]]:
+        """Retrieves every entity from `cache`, counting hits only when all are
+        found, since a partial miss is looked up again off the event loop"""
+        ids = list(dict.fromkeys(ids))
+        if not ids or any(cache.peek(entity_id) is None for entity_id in ids):
+            return None
+        found = [cache.get(entity_id) for entity_id in ids]
+        return None if None in found else found  # type: ignore
 
     def get_artist_from_spotify(self, artist_id: str) -> Dict[str, Any]:
         """
@@ -144,17 +441,32 @@ class Client(SpotifyClient):
         HTTPException(404)
             if no artist is found for the ID
         """
-        found = self.artists_collection.find_one({"id": artist_id})
+        cached = self.artist_cache.get(artist_id)
+        if cached is not None:
+            return cached
+
+        with mongo_span("find_one", self.artists_collection.name):
+            found = self.artists_collection.find_one({"id": artist_id}, ARTIST_PROJECTION)
+        self.metrics.inc(MONGO_CACHE_LOOKUPS, entity="artist", result="hit" if found else "miss")
         if found:
             logger.info("Cache hit on %s", artist_id)
+            self.artist_cache.set(artist_id, found)
             return found
 
-        artist = self.client.artist(artist_id)
-        if not artist:
-            raise HTTPException(404, f"Artist {artist_id} not found")
+        def fetch() -> Dict:
+            response = self.__spotify("artist", artist_id)
+            if not response:
+                raise HTTPException(404, f"Artist {artist_id} not found")
+
+            artist = compact(response, ARTIST_FIELDS)
+            with mongo_span("update_one", self.artists_collection.name):
+                self.artists_collection.update_one(
+                    {"id": artist["id"]}, {"$set": stored(artist)}, upsert=True
+                )
+            self.artist_cache.set(artist_id, artist)
+            return artist
 
-        self.artists_collection.insert_one(artist)
-        return artist
+        return self.flight.do(("artist", artist_id), fetch)
 
     def get_song_from_spotify(self, song_id: str) -> Dict:
         """
@@ -172,16 +484,169 @@ class Client(SpotifyClient):
         HTTPException(404)
             if the song is not found
         """
-        found = self.songs_collection.find_one({"id": song_id})
+        cached = self.song_cache.get(song_id)
+        if cached is not None:
+            return cached
+
+        with mongo_span("find_one", self.songs_collection.name):
+            found = self.songs_collection.find_one({"id": song_id}, SONG_PROJECTION)
+        self.metrics.inc(MONGO_CACHE_LOOKUPS, entity="song", result="hit" if found else "miss")
         if found:
+            self.song_cache.set(song_id, found)
             return found
 
-        song = self.client.track(song_id)
-        if not song:
-            raise HTTPException(404, "Song not found")
+        def fetch() -> Dict:
+            response = self.__spotify("track", song_id)
+            if not response:
+                raise HTTPException(404, "Song not found")
+
+            song = compact(response, SONG_FIELDS)
+            with mongo_span("update_one", self.songs_collection.name):
+                self.songs_collection.update_one(
+                    {"id": song["id"]}, {"$set": stored(song)}, upsert=True
+                )
+            self.song_cache.set(song_id, song)
+            return song
+
+        return self.flight.do(("track", song_id), fetch)
+
+    def get_several_artists_from_spotify(self, artist_ids: List[str]) -> List[Dict]:
+        """
+        Retrieves several artists, fetching only uncached artists from spotify
+
+        Params
+        ------
+        artist_ids: List[str]
+            the spotify IDs of the artists
+
+        Returns
+        -------
+        artists: List[Dict]
+            the artist objects in the requested order; unknown IDs are skipped
 
-        self.songs_collection.insert_one(song)
-        return song
+        Raises
+        ------
+        HTTPException(404)
+            if none of the artists are found
+        """
+        artists = self.__get_several(
+            artist_ids,
+            self.artist_cache,
+            self.artists_collection,
+            ARTIST_FIELDS,
+            lambda chunk: self.flight.do(
+                ("artists", tuple(chunk)), lambda: self.__spotify("artists", chunk)
+            )["artists"],
+        )
+
+        if not artists:
+            raise HTTPException(404, "Artists not found")
+
+        return artists
+
+    def get_several_songs_from_spotify(self, song_ids: List[str]) -> List[Dict]:
+        """
+        Retrieves several songs, fetching only uncached songs from spotify
+
+        Params
+        ------
+        song_ids: List[str]
+            the spotify IDs of the songs
+
+        Returns
+        -------
+        songs: List[Dict]
+            the song objects in the requested order; unknown IDs are skipped
+
+        Raises
+        ------
+        HTTPException(404)
+            if none of the songs are found
+        """
+        songs = self.__get_several(
+            song_ids,
+            self.song_cache,
+            self.songs_collection,
+            SONG_FIELDS,
+            lambda chunk: self.flight.do(
+                ("tracks", tuple(chunk)), lambda: self.__spotify("tracks", chunk)
+            )["tracks"],
+        )
+
+        if not songs:
+            raise HTTPException(404, "Songs not found")
+
+        return songs
+
+    def __get_several(
+        self,
+        ids: List[str],
+        cache: TTLCache[Dict],
+        collection: "Collection",
+        fields: Sequence[str],
+        fetch: Callable[[List[str]], List[Optional[Dict]]],
+    ) -> List[Dict]:
+        """
+        Resolves IDs through the in-process cache, then a single MongoDB `$in`
+        query, then spotify in chunks of `MAX_IDS_PER_REQUEST` for whatever is
+        still missing. Only `fields` are cached and read back
+
+        Params
+        ------
+        ids: List[str]
+            the spotify IDs to resolve
+        cache: TTLCache[Dict]
+            the in-process cache for the entity
+        collection: Collection
+            the MongoDB collection caching the entity
+        fields: Sequence[str]
+            the fields of the entity that are cached and read back
+        fetch: Callable[[List[str]], List[Optional[Dict]]]
+            retrieves a chunk of entities from spotify
+
+        Returns
+        -------
+        found: List[Dict]
+            the resolved entities in the order of `ids`
+        """
+        ids = list(dict.fromkeys(ids))
+        found: Dict[str, Dict] = {}
+        for entity_id in ids:
+            cached = cache.get(entity_id)
+            if cached is not None:
+                found[entity_id] = cached
+
+        missing = [entity_id for entity_id in ids if entity_id not in found]
+        if missing:
+            with mongo_span("find", collection.name):
+                documents = list(collection.find({"id": {"$in": missing}}, projection(fields)))
+            for document in documents:
+                found[document["id"]] = document
+                cache.set(document["id"], document)
+
+        fetched = []
+        missing = [entity_id for entity_id in ids if entity_id not in found]
+        for start in range(0, len(missing), MAX_IDS_PER_REQUEST):
+            chunk = missing[start : start + MAX_IDS_PER_REQUEST]
+            fetched.extend(compact(entity, fields) for entity in fetch(chunk) if entity)
+
+        if fetched:
+            # pylint: disable=import-outside-toplevel
+            from pymongo import UpdateOne
+
+            with mongo_span("bulk_write", collection.name):
+                collection.bulk_write(
+                    [
+                        UpdateOne({"id": entity["id"]}, {"$set": stored(entity)}, upsert=True)
+                        for entity in fetched
+                    ],
+                    ordered=False,
+                )
+            for entity in fetched:
+                found[entity["id"]] = entity
+                cache.set(entity["id"], entity)
+
+        return [found[entity_id] for entity_id in ids if entity_id in found]
 
     def get_songs_from_spotify(self) -> List[Dict]:
         """
@@ -197,14 +662,16 @@ class Client(SpotifyClient):
         HTTPException(404)
             if no top songs are found
         """
-        top_songs = self.client.current_user_top_tracks(
-            limit=self.query.limit, time_range=self.query.time_range
+        top_songs = self.__top_items(
+            "current_user_top_tracks",
+            self.query.limit or DEFAULT_LIMIT,
+            self.query.time_range or DEFAULT_TIME_RANGE,
         )
 
         if not top_songs:
             raise HTTPException(404, "Top songs not found")
 
-        return top_songs["items"]
+        return top_songs
 
     def get_genres_from_spotify(self) -> List[str]:
         """
@@ -227,20 +694,62 @@ class Client(SpotifyClient):
         HTTPException(404)
             if the client is unable to retrieve any results
         """
-        top_artists = self.client.current_user_top_artists(
-            limit=50,
-            time_range=self.query.time_range,
-        )
+        top_artists = self.__top_artists(settings["genre_artists"], self.query.time_range)
 
         if not top_artists:
             raise HTTPException(404, "Top genres not found")
 
         genre_detail = []
-        for item in top_artists["items"]:
+        for item in top_artists:
             genre_detail.extend(item["genres"])
 
         return genre_detail
 
+    def get_genre_counts_from_cache(self) -> Dict[str, int]:
+        """
+        Counts the genres of the current users cached top artists with a MongoDB
+        aggregation, so only genre names and counts come back over the wire
+
+        The artists ranked within the top `GENRE_ARTISTS` for the time range are
+        counted, the same artists counted from spotify; ranks left behind by
+        longer top lists read earlier are not. When nothing has been cached for
+        the time range yet, those artists are fetched and cached first
+
+        Returns
+        -------
+        genre_detail: Dict[str, int]
+            a mapping of genre name to a count of its appearance
+
+        Raises
+        ------
+        HTTPException(404)
+            if no top artists are cached or found for the current user
+        """
+        time_range = self.query.time_range or DEFAULT_TIME_RANGE
+        pipeline = [
+            {"$match": {rank_key(time_range, self.user): {"$lt": settings["genre_artists"]}}},
+            {"$project": {"_id": 0, "genres": 1}},
+            {"$unwind": "$genres"},
+            {"$group": {"_id": "$genres", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ]
+
+        def aggregate() -> Dict[str, int]:
+            with mongo_span("aggregate", self.artists_collection.name):
+                return {
+                    group["_id"]: group["count"]
+                    for group in self.artists_collection.aggregate(pipeline)
+                }
+
+        genre_detail = self.flight.do(self.__user_key("genre_counts", time_range), aggregate)
+        if genre_detail:
+            return genre_detail
+
+        if not self.__top_artists(settings["genre_artists"], time_range):
+            raise HTTPException(404, "Top genres not found")
+
+        return self.flight.do(self.__user_key("genre_counts", time_range), aggregate)
+
     def get_recommendations_from_spotify(self) -> List[Dict]:
         """
         Retrieves recommendations from spotify
@@ -260,14 +769,175 @@ class Client(SpotifyClient):
         if not isinstance(self.query, RecQuery):
             raise TypeError("Invalid query type for recommendations")
 
-        recommendations = self.client.recommendations(
-            seed_artists=self.query.seed_artists_list,
-            seed_genres=self.query.seed_genres_list,
-            seed_tracks=self.query.seed_tracks_list,
-            limit=self.query.limit,
+        query = self.query
+        recommendations = self.flight.do(
+            (
+                "recommendations",
+                tuple(query.seed_artists_list or []),
+                tuple(query.seed_genres_list or []),
+                tuple(query.seed_tracks_list or []),
+                query.limit or DEFAULT_LIMIT,
+            ),
+            lambda: self.__spotify(
+                "recommendations",
+                seed_artists=query.seed_artists_list,
+                seed_genres=query.seed_genres_list,
+                seed_tracks=query.seed_tracks_list,
+                limit=query.limit or DEFAULT_LIMIT,
+            ),
         )
 
         if not recommendations:
             raise HTTPException(404, "Recommendations not found")
 
         return recommendations["tracks"]
+
+
+def build_executor(priority: Priority, name: str) -> Executor:
+    """Builds a bounded thread pool for the blocking calls made at `priority`"""
+    if priority is Priority.BACKGROUND:
+        return ThreadPoolExecutor(
+            max_workers=settings["background_workers"],
+            thread_name_prefix=f"{name}-background",
+        )
+    return ThreadPoolExecutor(max_workers=settings["max_workers"], thread_name_prefix=name)
+
+
+@lru_cache(maxsize=None)
+def get_executor(priority: Priority = Priority.INTERACTIVE) -> Executor:
+    """
+    Retrieves the process-wide thread pool used to run blocking client calls
+
+    The pool is created on first use and is bounded by the `SPOTIFY_MAX_WORKERS`
+    environment variable so that a burst of requests cannot spawn unbounded threads.
+    Background calls, which may wait on the rate-limit budget for a long time, run
+    on a pool of their own bounded by `SPOTIFY_BACKGROUND_WORKERS`, so they never
+    hold a thread an interactive request is waiting for
+
+    Params
+    ------
+    priority: Priority
+        the priority of the calls the pool runs
+
+    Returns
+    -------
+    executor: Executor
+        the shared, bounded thread pool
+    """
+    return build_executor(priority, "spotify")
+
+
+@lru_cache(maxsize=None)
+def get_page_executor(priority: Priority = Priority.INTERACTIVE) -> Executor:
+    """
+    Retrieves the process-wide thread pool used to fetch the pages of a top list
+    concurrently
+
+    Pages are fetched from calls already running on the `get_executor` pool, so
+    they get a pool of their own rather than waiting on a place in the pool of the
+    call that needs them
+
+    Params
+    ------
+    priority: Priority
+        the priority of the calls the pool runs
+
+    Returns
+    -------
+    executor: Executor
+        the shared, bounded thread pool
+    """
+    return build_executor(priority, "spotify-page")
+
+
+class AsyncClient:
+    """
+    Awaitable adapter over any `SpotifyClient`
+
+    The spotipy and pymongo calls made by a `SpotifyClient` are blocking, so each one
+    is offloaded to a bounded thread pool and awaited instead of being run on the
+    event loop. Lookups held entirely in memory are answered on the event loop,
+    without waiting for a thread
+    """
+
+    def __init__(self, client: SpotifyClient, executor: Optional[Executor] = None) -> None:
+        self.client = client
+        self.executor = executor
+
+    @property
+    def query(self) -> Query:
+        """The query attr of the wrapped client"""
+        return self.client.query
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Runs a blocking callable on the executor without blocking the event loop
+
+        The current context is copied into the worker so that context variables, such
+        as the active tracing span, are visible to the blocking call. Without an
+        executor of its own, the client runs the callable on the shared pool for the
+        current `call_priority`
+
+        Params
+        ------
+        func: Callable[..., T]
+            the blocking callable to run
+        args: Any
+            positional arguments passed to `func`
+
+        Returns
+        -------
+        result: T
+            the value returned by `func`
+        """
+        context = copy_context()
+        executor = self.executor or get_executor(call_priority.get())
+        return await get_running_loop().run_in_executor(executor, context.run, func, *args)
+
+    async def get_artists_from_spotify(self) -> List[Dict]:
+        """Awaitable `SpotifyClient.get_artists_from_spotify`"""
+        return await self.run(self.client.get_artists_from_spotify)
+
+    async def get_artist_from_spotify(self, artist_id: str) -> Dict[str, Any]:
+        """Awaitable `SpotifyClient.get_artist_from_spotify`"""
+        cached = self.client.get_cached_artists([artist_id])
+        if cached:
+            return cached[0]
+        return await self.run(self.client.get_artist_from_spotify, artist_id)
+
+    async def get_several_artists_from_spotify(self, artist_ids: List[str]) -> List[Dict]:
+        """Awaitable `SpotifyClient.get_several_artists_from_spotify`"""
+        cached = self.client.get_cached_artists(artist_ids)
+        if cached:
+            return cached
+        return await self.run(self.client.get_several_artists_from_spotify, artist_ids)
+
+    async def get_song_from_spotify(self, song_id: str) -> Dict:
+        """Awaitable `SpotifyClient.get_song_from_spotify`"""
+        cached = self.client.get_cached_songs([song_id])
+        if cached:
+            return cached[0]
+        return await self.run(self.client.get_song_from_spotify, song_id)
+
+    async def get_several_songs_from_spotify(self, song_ids: List[str]) -> List[Dict]:
+        """Awaitable `SpotifyClient.get_several_songs_from_spotify`"""
+        cached = self.client.get_cached_songs(song_ids)
+        if cached:
+            return cached
+        return await self.run(self.client.get_several_songs_from_spotify, song_ids)
+
+    async def get_songs_from_spotify(self) -> List[Dict]:
+        """Awaitable `SpotifyClient.get_songs_from_spotify`"""
+        return await self.run(self.client.get_songs_from_spotify)
+
+    async def get_genres_from_spotify(self) -> List[str]:
+        """Awaitable `SpotifyClient.get_genres_from_spotify`"""
+        return await self.run(self.client.get_genres_from_spotify)
+
+    async def get_genre_counts_from_cache(self) -> Dict[str, int]:
+        """Awaitable `SpotifyClient.get_genre_counts_from_cache`"""
+        return await self.run(self.client.get_genre_counts_from_cache)
+
+    async def get_recommendations_from_spotify(self) -> List[Dict]:
+        """Awaitable `SpotifyClient.get_recommendations_from_spotify`"""
+        return await self.run(self.client.get_recommendations_from_spotify)
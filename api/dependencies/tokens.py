@@ -0,0 +1,215 @@
+"""Defines the process-wide manager of the spotify access token"""
+
+from logging import getLogger
+from os import getenv
+from math import inf
+from threading import Lock, Thread, Timer
+from time import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from .singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from spotipy.oauth2 import SpotifyOAuth
+
+logger = getLogger(__name__)
+
+token_settings = {
+    "refresh_margin": float(getenv("TOKEN_REFRESH_MARGIN", "300")),
+    "retry_interval": float(getenv("TOKEN_RETRY_INTERVAL", "30")),
+}
+
+
+class TokenManager:
+    """
+    Keeps the spotify access token in memory and refreshes it before it expires
+
+    `SpotifyOAuth` reads and validates the token cache file on every call, and
+    refreshes an expired token inside whichever request notices first. The manager
+    reads the file once, serves the token from memory, and refreshes it on a
+    background timer `refresh_margin` seconds before it expires, so requests do
+    not wait on a refresh. Should a request still find the token expired, every
+    concurrent request shares a single refresh. The cache file is only written
+    when the token is refreshed.
+
+    Without `timer`, no thread waits for the refresh; the first request made once
+    the token is due starts it in the background instead, which suits holding a
+    manager per user. Without `interactive`, a missing or unusable stored token is
+    answered with a 401 rather than by starting the interactive authorization
+    flow, which a request made for another user must never wait on
+
+    It can be passed to `Spotify` as its `auth_manager`
+    """
+
+    def __init__(
+        self,
+        oauth: "SpotifyOAuth",
+        refresh_margin: Optional[float] = None,
+        retry_interval: Optional[float] = None,
+        clock: Callable[[], float] = time,
+        timer: bool = True,
+        interactive: bool = True,
+    ) -> None:
+        self.oauth = oauth
+        self.refresh_margin = (
+            token_settings["refresh_margin"] if refresh_margin is None else refresh_margin
+        )
+        self.retry_interval = (
+            token_settings["retry_interval"] if retry_interval is None else retry_interval
+        )
+        self.clock = clock
+        self.timer = timer
+        self.interactive = interactive
+        self.refreshes = 0
+        self.failures = 0
+        self.__token: Optional[Dict] = None
+        self.__timer: Optional[Timer] = None
+        self.__refresh_at = inf
+        self.__closed = False
+        self.__lock = Lock()
+        self.__flight = SingleFlight()
+
+    def get_access_token(self, as_dict: bool = False):
+        """
+        Retrieves the current access token, loading or refreshing it first only if
+        there is no unexpired token in memory
+
+        Params
+        ------
+        as_dict: bool
+            whether to return the whole token info rather than the access token
+
+        Returns
+        -------
+        token: Union[str, Dict]
+            the access token, or the token info if `as_dict` is set
+        """
+        token = self.__token
+        if token is None or self.__expires_in(token) <= 0:
+            token = self.__flight.do("token", self.__renew)
+        elif not self.timer and self.clock() >= self.__refresh_at:
+            self.__refresh_in_background()
+        return token if as_dict else token["access_token"]
+
+    def __expires_in(self, token: Dict) -> float:
+        return token["expires_at"] - self.clock()
+
+    def __renew(self) -> Dict:
+        """Loads the token, or refreshes it if it has expired, unless a concurrent
+        caller already has"""
+        token = self.__token
+        if token is not None and self.__expires_in(token) > 0:
+            return token
+
+        if token is None:
+            token = self.__load()
+        else:
+            token = self.__refresh(token)
+
+        self.__store(token)
+        return token
+
+    def __load(self) -> Dict:
+        """Loads the stored token, refreshing it if it has expired, or runs the
+        authorization flow if there is no usable token and the manager is
+        interactive
+
+        Raises
+        ------
+        HTTPException(401)
+            if the manager is not interactive and there is no usable token
+        """
+        if self.interactive:
+            token = self.oauth.validate_token(self.oauth.cache_handler.get_cached_token())
+            if token is None:
+                self.oauth.get_access_token(as_dict=False)
+                token = self.oauth.cache_handler.get_cached_token()
+            return token
+
+        # pylint: disable=import-outside-toplevel
+        from spotipy.oauth2 import SpotifyOauthError
+
+        try:
+            token = self.oauth.validate_token(self.oauth.cache_handler.get_cached_token())
+        except SpotifyOauthError as ex:
+            raise HTTPException(401, "Spotify authorization was revoked") from ex
+        if token is None:
+            raise HTTPException(401, "No usable spotify token")
+        return token
+
+    def __refresh(self, token: Dict) -> Dict:
+        refreshed = self.oauth.refresh_access_token(token["refresh_token"])
+        self.refreshes += 1
+        logger.info("Refreshed the spotify access token")
+        return refreshed
+
+    def __store(self, token: Dict) -> None:
+        """Keeps the token and schedules its refresh ahead of its expiry"""
+        self.__token = token
+        self.__schedule(self.__expires_in(token) - self.refresh_margin)
+
+    def __schedule(self, delay: float) -> None:
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__refresh_at = self.clock() + max(0.0, delay)
+            if not self.timer:
+                return
+            if self.__timer is not None:
+                self.__timer.cancel()
+            self.__timer = Timer(max(0.0, delay), self.refresh)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def __refresh_in_background(self) -> None:
+        """Starts the refresh that is due, unless it has already been started"""
+        with self.__lock:
+            if self.__closed or self.clock() < self.__refresh_at:
+                return
+            self.__refresh_at = inf
+        Thread(target=self.refresh, name="token-refresh", daemon=True).start()
+
+    def refresh(self) -> None:
+        """
+        Refreshes the token in the background, retrying every `retry_interval`
+        seconds if the refresh fails
+        """
+        token = self.__token
+        if token is None:
+            return
+
+        try:
+            refreshed = self.__flight.do("token", lambda: self.__refresh(token))
+        except Exception:  # pylint: disable=broad-except
+            self.failures += 1
+            logger.exception("Could not refresh the spotify access token")
+            self.__schedule(self.retry_interval)
+            return
+
+        self.__store(refreshed)
+
+    def close(self) -> None:
+        """Cancels the scheduled refresh"""
+        with self.__lock:
+            self.__closed = True
+            if self.__timer is not None:
+                self.__timer.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the token counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the number of refreshes and failed background refreshes, and the
+            seconds until the token in memory expires
+        """
+        token = self.__token
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "expires_in": 0 if token is None else int(self.__expires_in(token)),
+        }
@@ -0,0 +1,274 @@
+"""Defines the tracing pipeline shared by the whole application"""
+
+from collections import deque
+from enum import Enum
+from os import getenv, linesep
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    ContextManager,
+    Deque,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+tracing_settings = {
+    "exporter": getenv("TRACE_EXPORTER", "none"),
+    "sample_ratio": float(getenv("TRACE_SAMPLE_RATIO", "1.0")),
+    "buffer_size": int(getenv("TRACE_BUFFER_SIZE", "1000")),
+    "file": getenv("TRACE_FILE", "spans.jsonl"),
+    "otlp_endpoint": getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4317"),
+}
+
+tracer = trace.get_tracer(__name__)
+
+
+class TraceExporter(str, Enum):
+    """The destinations finished spans can be exported to"""
+
+    NONE = "none"
+    MEMORY = "memory"
+    FILE = "file"
+    OTLP = "otlp"
+
+
+class RingBufferSpanExporter:
+    """
+    Keeps the most recent finished spans in memory, discarding the oldest once
+    `maxlen` spans are held
+
+    It implements the `SpanExporter` interface without subclassing it, so that the
+    OpenTelemetry SDK is only imported once tracing is configured
+    """
+
+    def __init__(self, maxlen: int) -> None:
+        self.__spans: Deque["ReadableSpan"] = deque(maxlen=maxlen)
+        self.__lock = Lock()
+
+    def export(self, spans: Sequence["ReadableSpan"]) -> "SpanExportResult":
+        """Adds finished spans to the buffer"""
+        # pylint: disable=import-outside-toplevel
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        with self.__lock:
+            self.__spans.extend(spans)
+        return SpanExportResult.SUCCESS
+
+    def get_finished_spans(self) -> List["ReadableSpan"]:
+        """
+        Retrieves the buffered spans
+
+        Returns
+        -------
+        spans: List[ReadableSpan]
+            the buffered spans, oldest first
+        """
+        with self.__lock:
+            return list(self.__spans)
+
+    def clear(self) -> None:
+        """Discards every buffered span"""
+        with self.__lock:
+            self.__spans.clear()
+
+    def shutdown(self) -> None:
+        """Discards every buffered span"""
+        self.clear()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:  # pylint: disable=unused-argument
+        """Does nothing, since spans are buffered as soon as they are exported"""
+        return True
+
+
+class TracingPipeline(NamedTuple):
+    """A tracer provider and the exporter its spans are sent to, if any"""
+
+    provider: "TracerProvider"
+    exporter: Optional["SpanExporter"]
+
+
+def build_exporter(exporter: str) -> Optional["SpanExporter"]:
+    """
+    Builds the span exporter for a `TraceExporter` value
+
+    Params
+    ------
+    exporter: str
+        the name of the exporter
+
+    Returns
+    -------
+    span_exporter: Optional[SpanExporter]
+        the exporter, or None when spans are not exported
+
+    Raises
+    ------
+    ValueError
+        if `exporter` is not a `TraceExporter` value
+    ImportError
+        if the OTLP exporter is requested but its package is not installed
+    """
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    match TraceExporter(exporter.lower()):
+        case TraceExporter.NONE:
+            return None
+
+        case TraceExporter.MEMORY:
+            return RingBufferSpanExporter(tracing_settings["buffer_size"])
+
+        case TraceExporter.FILE:
+            return ConsoleSpanExporter(
+                out=open(  # pylint: disable=consider-using-with
+                    tracing_settings["file"], "a", encoding="utf-8"
+                ),
+                formatter=lambda span: span.to_json(indent=None) + linesep,
+            )
+
+        case TraceExporter.OTLP:
+            try:
+                from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+                    OTLPSpanExporter,
+                )
+            except ImportError as ex:
+                raise ImportError(
+                    "TRACE_EXPORTER=otlp requires opentelemetry-exporter-otlp"
+                ) from ex
+
+            return OTLPSpanExporter(endpoint=tracing_settings["otlp_endpoint"], insecure=True)
+
+
+def build_tracing(
+    exporter: Optional[str] = None, sample_ratio: Optional[float] = None
+) -> TracingPipeline:
+    """
+    Builds a tracer provider that samples a ratio of traces and sends their spans
+    to a single exporter
+
+    Sampling follows the parent span, so a trace is kept or dropped as a whole.
+    When spans are not exported nothing is sampled, so spans cost next to nothing
+
+    Params
+    ------
+    exporter: Optional[str]
+        the name of the exporter; defaults to `TRACE_EXPORTER`
+    sample_ratio: Optional[float]
+        the ratio of traces to sample; defaults to `TRACE_SAMPLE_RATIO`
+
+    Returns
+    -------
+    tracing: TracingPipeline
+        the provider and its exporter
+    """
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import (
+        ALWAYS_OFF,
+        ParentBased,
+        TraceIdRatioBased,
+    )
+
+    exporter = tracing_settings["exporter"] if exporter is None else exporter
+    if sample_ratio is None:
+        sample_ratio = tracing_settings["sample_ratio"]
+
+    span_exporter = build_exporter(exporter)
+    if span_exporter is None:
+        return TracingPipeline(TracerProvider(sampler=ALWAYS_OFF), None)
+
+    provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(sample_ratio)))
+    if isinstance(span_exporter, RingBufferSpanExporter):
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    else:
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+
+    return TracingPipeline(provider, span_exporter)
+
+
+def configure_tracing(
+    exporter: Optional[str] = None, sample_ratio: Optional[float] = None
+) -> TracingPipeline:
+    """
+    Builds the tracing pipeline and installs it as the global tracer provider
+
+    The global provider can only be set once per process, so this should be
+    called once, when the application starts. Tracers obtained before then, such
+    as those of the route modules and the FastAPI instrumentation, start recording
+    into the pipeline as soon as it is installed
+
+    Params
+    ------
+    exporter: Optional[str]
+        the name of the exporter; defaults to `TRACE_EXPORTER`
+    sample_ratio: Optional[float]
+        the ratio of traces to sample; defaults to `TRACE_SAMPLE_RATIO`
+
+    Returns
+    -------
+    tracing: TracingPipeline
+        the installed provider and its exporter
+    """
+    tracing = build_tracing(exporter, sample_ratio)
+    trace.set_tracer_provider(tracing.provider)
+    return tracing
+
+
+def spotify_span(operation: str, **attributes: str) -> ContextManager[Span]:
+    """
+    Starts a client span around a call to the spotify api
+
+    Params
+    ------
+    operation: str
+        the spotipy method being called, e.g. `artist`
+    attributes: str
+        extra attributes describing the call
+
+    Returns
+    -------
+    span: ContextManager[Span]
+        the span, which ends when the context exits
+    """
+    return tracer.start_as_current_span(
+        f"spotify {operation}",
+        kind=SpanKind.CLIENT,
+        attributes={"peer.service": "spotify", "spotify.operation": operation} | attributes,
+    )
+
+
+def mongo_span(operation: str, collection: str) -> ContextManager[Span]:
+    """
+    Starts a client span around a call to MongoDB
+
+    Params
+    ------
+    operation: str
+        the pymongo method being called, e.g. `find_one`
+    collection: str
+        the name of the collection being queried
+
+    Returns
+    -------
+    span: ContextManager[Span]
+        the span, which ends when the context exits
+    """
+    return tracer.start_as_current_span(
+        f"mongodb {operation} {collection}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "db.system": "mongodb",
+            "db.operation": operation,
+            "db.mongodb.collection": collection,
+        },
+    )
@@ -0,0 +1,95 @@
+"""Defines the spotipy parts of the per-user clients, imported when the first user
+client is created"""
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Optional
+
+from fastapi import HTTPException
+from requests import Session
+from spotipy.cache_handler import CacheHandler
+
+from .tracing import mongo_span
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+
+class MongoCacheHandler(CacheHandler):
+    """
+    Stores the token of a single user in the `tokens` collection, shared by every
+    instance of the API
+
+    The token is read from MongoDB the first time it is needed and then kept in
+    memory; it is only written back when it is refreshed. Documents hold the user
+    ID, the spotipy token info and the time it was last written
+    """
+
+    def __init__(
+        self, collection: "Collection", user_id: str, token: Optional[Dict] = None
+    ) -> None:
+        self.collection = collection
+        self.user_id = user_id
+        self.token = token
+
+    def get_cached_token(self) -> Dict:
+        """
+        Retrieves the token info of the user
+
+        Returns
+        -------
+        token: Dict
+            the spotipy token info
+
+        Raises
+        ------
+        HTTPException(401)
+            if no token is stored for the user
+        """
+        if self.token is None:
+            with mongo_span("find_one", self.collection.name):
+                document = self.collection.find_one(
+                    {"user_id": self.user_id}, {"_id": 0, "token": 1}
+                )
+            if document is None:
+                raise HTTPException(401, "Unknown user")
+            self.token = document["token"]
+        return self.token
+
+    def save_token_to_cache(self, token_info: Dict) -> None:
+        """
+        Stores new token info for the user
+
+        Params
+        ------
+        token_info: Dict
+            the spotipy token info
+        """
+        self.token = token_info
+        with mongo_span("update_one", self.collection.name):
+            self.collection.update_one(
+                {"user_id": self.user_id},
+                {
+                    "$set": {
+                        "token": token_info,
+                        "updated_at": datetime.now(timezone.utc),
+                    }
+                },
+                upsert=True,
+            )
+
+
+class SharedSession(Session):
+    """
+    An HTTP session shared by every per-user client
+
+    A spotipy client closes its session when it is garbage collected, which would
+    drop the pooled connections of every other user whenever one is evicted, so
+    `close` does nothing and the session is only closed by `release`
+    """
+
+    def close(self) -> None:
+        """Keeps the session open for the other clients"""
+
+    def release(self) -> None:
+        """Closes the session once no client uses it"""
+        super().close()
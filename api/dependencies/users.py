@@ -0,0 +1,318 @@
+"""
+Defines the pool of per-user spotify clients and how a request proves its user
+
+API keys are managed from the command line, with the MongoDB named by
+`CONNECTIONSTRING`
+
+Usage
+-----
+python -m dependencies.users issue <user_id>
+python -m dependencies.users revoke <user_id>
+"""
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+from hashlib import sha256
+from os import getenv
+from secrets import token_urlsafe
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+from fastapi import Header, HTTPException, Request
+
+from .cache import TTLCache
+from .spotify import settings
+from .tokens import TokenManager
+from .tracing import mongo_span
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+    from spotipy import Spotify
+
+    from .user_clients import SharedSession
+
+user_settings = {
+    "header": getenv("USER_KEY_HEADER", "X-Api-Key"),
+    "pool_size": int(getenv("USER_POOL_SIZE", "1000")),
+    "key_ttl": float(getenv("USER_KEY_TTL", "300")),
+}
+
+
+def hash_api_key(api_key: str) -> str:
+    """
+    Hashes an API key into the form it is stored and looked up by
+
+    Params
+    ------
+    api_key: str
+        the API key
+
+    Returns
+    -------
+    digest: str
+        the hex SHA-256 digest of the key
+    """
+    return sha256(api_key.encode()).hexdigest()
+
+
+def issue_api_key(tokens: "Collection", user_id: str) -> str:
+    """
+    Issues a new API key for a user, replacing any key they held before
+
+    Only the hash of the key is stored, so the key itself must be handed to the
+    user now; it cannot be read back later
+
+    Params
+    ------
+    tokens: Collection
+        the `tokens` collection
+    user_id: str
+        the spotify user ID
+
+    Returns
+    -------
+    api_key: str
+        the new API key
+    """
+    api_key = token_urlsafe(32)
+    with mongo_span("update_one", tokens.name):
+        tokens.update_one(
+            {"user_id": user_id},
+            {"$set": {"api_key": hash_api_key(api_key)}},
+            upsert=True,
+        )
+    return api_key
+
+
+def revoke_api_key(tokens: "Collection", user_id: str) -> bool:
+    """
+    Revokes the API key of a user; instances that have already resolved it keep
+    accepting it for up to `USER_KEY_TTL` seconds
+
+    Params
+    ------
+    tokens: Collection
+        the `tokens` collection
+    user_id: str
+        the spotify user ID
+
+    Returns
+    -------
+    revoked: bool
+        whether the user held a key
+    """
+    with mongo_span("update_one", tokens.name):
+        result = tokens.update_one(
+            {"user_id": user_id, "api_key": {"$exists": True}},
+            {"$unset": {"api_key": ""}},
+        )
+    return result.modified_count > 0
+
+
+def get_user(
+    request: Request,
+    api_key: Optional[str] = Header(default=None, alias=user_settings["header"]),
+) -> Optional[str]:
+    """
+    FastAPI dependency that retrieves the user a request is made for from the API
+    key it is sent with
+
+    Params
+    ------
+    request: Request
+        the incoming request
+    api_key: Optional[str]
+        the value of the `USER_KEY_HEADER` header
+
+    Returns
+    -------
+    user: Optional[str]
+        the spotify user ID the key was issued to, or None to use the API's own
+        spotify identity when no key is sent
+
+    Raises
+    ------
+    HTTPException(401)
+        if the key was not issued to any user
+    """
+    if not api_key:
+        return None
+
+    users: Optional[UserPool] = request.app.state.registry.users
+    if users is None:
+        raise HTTPException(401, "Unknown API key")
+    return users.authenticate(api_key)
+
+
+class UserPool:
+    """
+    Holds a spotify client for each recently active user, and the users their
+    API keys were issued to
+
+    Each client has its own in-memory token, loaded from the `tokens` collection
+    the first time the user makes a request and refreshed independently of every
+    other user's, so a user's requests never wait on another user's refresh. Every
+    client shares one HTTP session, and so one connection pool. Once `maxsize`
+    users are held, the least recently active user is evicted and their token
+    dropped from memory; it stays stored in MongoDB. The user a key was issued to
+    is looked up in the same collection and kept for `key_ttl` seconds, so a
+    revoked key stops working within that time
+    """
+
+    def __init__(
+        self,
+        tokens: "Collection",
+        session: "SharedSession",
+        maxsize: Optional[int] = None,
+        key_ttl: Optional[float] = None,
+    ) -> None:
+        self.tokens = tokens
+        self.session = session
+        self.maxsize = user_settings["pool_size"] if maxsize is None else maxsize
+        self.keys: TTLCache[str] = TTLCache(
+            self.maxsize, user_settings["key_ttl"] if key_ttl is None else key_ttl
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__clients: OrderedDict[str, "Spotify"] = OrderedDict()
+        self.__lock = Lock()
+
+    def authenticate(self, api_key: str) -> str:
+        """
+        Retrieves the user an API key was issued to
+
+        Params
+        ------
+        api_key: str
+            the API key sent with a request
+
+        Returns
+        -------
+        user_id: str
+            the spotify user ID
+
+        Raises
+        ------
+        HTTPException(401)
+            if the key was not issued to any user
+        """
+        digest = hash_api_key(api_key)
+        user_id = self.keys.get(digest)
+        if user_id is None:
+            with mongo_span("find_one", self.tokens.name):
+                document = self.tokens.find_one({"api_key": digest}, {"_id": 0, "user_id": 1})
+            if document is None:
+                raise HTTPException(401, "Unknown API key")
+            user_id = document["user_id"]
+            self.keys.set(digest, user_id)
+        return user_id
+
+    def spotify(self, user_id: str) -> "Spotify":
+        """
+        Retrieves the spotify client of a user, creating it if the user is not held
+
+        Creating a client does no I/O; the user's token is read from MongoDB by
+        the first spotify call made with it, which fails with a 401 if the user
+        has no stored token
+
+        Params
+        ------
+        user_id: str
+            the spotify user ID
+
+        Returns
+        -------
+        client: Spotify
+            a client authenticated as the user
+        """
+        with self.__lock:
+            client = self.__clients.get(user_id)
+            if client is not None:
+                self.__clients.move_to_end(user_id)
+                self.hits += 1
+                return client
+
+            self.misses += 1
+            client = self.__clients[user_id] = self.__create(user_id)
+            while len(self.__clients) > self.maxsize:
+                _, evicted = self.__clients.popitem(last=False)
+                evicted.auth_manager.close()
+                self.evictions += 1
+            return client
+
+    def __create(self, user_id: str) -> "Spotify":
+        # pylint: disable=import-outside-toplevel
+        from spotipy import Spotify
+        from spotipy.oauth2 import SpotifyOAuth
+
+        from .user_clients import MongoCacheHandler
+
+        return Spotify(
+            auth_manager=TokenManager(
+                SpotifyOAuth(
+                    client_id=settings["client_id"],
+                    client_secret=settings["client_secret"],
+                    redirect_uri="http://localhost:8080",
+                    scope=settings["scopes"],
+                    cache_handler=MongoCacheHandler(self.tokens, user_id),
+                ),
+                timer=False,
+                interactive=False,
+            ),
+            requests_session=self.session,
+        )
+
+    def close(self) -> None:
+        """Drops every held client and closes their session"""
+        with self.__lock:
+            for client in self.__clients.values():
+                client.auth_manager.close()
+            self.__clients.clear()
+        self.session.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the pool counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the number of held users, and of lookups that found, created or
+            evicted a client
+        """
+        with self.__lock:
+            return {
+                "size": len(self.__clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def main(argv: Optional[Sequence[str]] = None, tokens: Optional["Collection"] = None):
+    """Issues or revokes the API key of a user"""
+    parser = ArgumentParser(description="Issues or revokes the API key of a user")
+    parser.add_argument("action", choices=["issue", "revoke"])
+    parser.add_argument("user_id")
+    args = parser.parse_args(argv)
+
+    if tokens is None:
+        # pylint: disable=import-outside-toplevel
+        from pymongo import MongoClient
+
+        from .documents import DATABASE, TOKENS
+
+        mongo = MongoClient(getenv("CONNECTIONSTRING"))
+        tokens = mongo.get_database(DATABASE).get_collection(TOKENS)
+
+    if args.action == "issue":
+        print(issue_api_key(tokens, args.user_id))
+    elif revoke_api_key(tokens, args.user_id):
+        print(f"Revoked the API key of {args.user_id}")
+    else:
+        print(f"{args.user_id} holds no API key")
+
+
+if __name__ == "__main__":
+    main()
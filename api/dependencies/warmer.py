@@ -0,0 +1,135 @@
+"""Defines the background warmer that refreshes cached top lists before they expire"""
+
+from asyncio import CancelledError, Task, create_task, sleep
+from heapq import heapify, heappop, heappush
+from logging import getLogger
+from os import getenv
+from random import Random
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import ResponseLoader, StaleWhileRevalidateCache
+
+logger = getLogger(__name__)
+
+warm_settings = {
+    "enabled": getenv("WARM_ENABLED", "false").lower() in ("1", "true", "yes"),
+    "users": [user for user in getenv("WARM_USERS", "").split(",") if user],
+    "jitter": float(getenv("WARM_JITTER", "0.2")),
+    "rate_share": float(getenv("WARM_RATE_SHARE", "0.5")),
+}
+
+
+class CacheWarmer:
+    """
+    Refreshes a fixed set of cached responses in the background so that requests
+    for them are always served from the cache
+
+    Each response is refreshed once per `fresh_for` of the cache, shortened by a
+    random fraction of up to `jitter` so that refreshes spread out instead of
+    landing together. First refreshes are spread over the first `fresh_for`
+    seconds. Refreshes start at most `max_rate` times a second, and run through
+    `StaleWhileRevalidateCache.refresh`, so their spotify calls are scheduled behind
+    those of interactive requests and a response is never refreshed twice at once
+
+    A target is built again every time it is due, so the client it loads with is
+    always the current one for its user
+    """
+
+    def __init__(
+        self,
+        cache: StaleWhileRevalidateCache,
+        targets: Sequence[Callable[[], ResponseLoader]],
+        max_rate: float,
+        jitter: Optional[float] = None,
+        rng: Optional[Random] = None,
+        clock: Callable[[], float] = monotonic,
+        wait: Callable[[float], Awaitable[None]] = sleep,
+    ) -> None:
+        self.cache = cache
+        self.targets = list(targets)
+        self.max_rate = max_rate
+        self.jitter = warm_settings["jitter"] if jitter is None else jitter
+        self.rng = Random() if rng is None else rng
+        self.clock = clock
+        self.wait = wait
+        self.warmed = 0
+        self.errors = 0
+        self.__task: Optional[Task] = None
+
+    def __interval(self) -> float:
+        """The seconds until a target is due again, shortened by the jitter"""
+        return self.cache.fresh_for * (1 - self.rng.uniform(0, self.jitter))
+
+    async def run(self) -> None:
+        """Refreshes every target as it comes due, until cancelled"""
+        now = self.clock()
+        due: List[Tuple[float, int]] = [
+            (now + self.rng.uniform(0, self.cache.fresh_for), index)
+            for index in range(len(self.targets))
+        ]
+        heapify(due)
+        spacing = 1 / self.max_rate if self.max_rate > 0 else 0.0
+        next_start = now
+        while due:
+            at, index = heappop(due)
+            start = max(at, next_start)
+            delay = start - self.clock()
+            if delay > 0:
+                await self.wait(delay)
+
+            self.warm(index)
+            next_start = self.clock() + spacing
+            heappush(due, (self.clock() + self.__interval(), index))
+
+    def warm(self, index: int) -> None:
+        """
+        Starts the background refresh of a target
+
+        Params
+        ------
+        index: int
+            the position of the target in `targets`
+        """
+        try:
+            key, load = self.targets[index]()
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            logger.exception("Failed to build cache warming target %d", index)
+            return
+
+        self.warmed += 1
+        self.cache.refresh(key, load)
+
+    def start(self) -> None:
+        """Starts warming on the running event loop"""
+        if self.__task is None and self.targets:
+            self.__task = create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops warming; refreshes already started are left to finish"""
+        if self.__task is None:
+            return
+
+        self.__task.cancel()
+        try:
+            await self.__task
+        except CancelledError:
+            pass
+        self.__task = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the warmer counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            the number of targets, of refreshes started, and of targets that could
+            not be built
+        """
+        return {
+            "targets": len(self.targets),
+            "warmed": self.warmed,
+            "errors": self.errors,
+        }
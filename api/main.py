@@ -1,21 +1,90 @@
 """Main server driver"""
+from logging import INFO, basicConfig
+from os.path import exists
+from threading import Thread
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from uvicorn import run
 
-from routes import ROUTE_REGISTRY
+from dependencies.documents import ensure_indexes
+from dependencies.metrics import MetricsMiddleware
+from dependencies.registry import ClientRegistry, rate_limit_settings
+from dependencies.tracing import configure_tracing
+from dependencies.warmer import CacheWarmer, warm_settings
+from routes import ROUTE_REGISTRY, top_list_targets
 
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
 )
+app.add_middleware(MetricsMiddleware)
 
 
 for router in ROUTE_REGISTRY:
     app.include_router(router)
 
+# spans are recorded through the global tracer provider, installed at startup
 FastAPIInstrumentor.instrument_app(app)
 
+
+@app.on_event("startup")
+def open_clients():
+    """
+    Configures logging and tracing and creates the upstream clients shared by every
+    request
+
+    The indexes their lookups rely on are created in the background, so that
+    startup does not wait on MongoDB
+    """
+    basicConfig(level=INFO)
+    app.state.tracing = configure_tracing()
+    app.state.registry = ClientRegistry.from_env()
+    Thread(
+        target=ensure_indexes,
+        args=(app.state.registry.mongo,),
+        name="ensure-indexes",
+        daemon=True,
+    ).start()
+
+
+@app.on_event("startup")
+async def start_warmer():
+    """
+    Starts refreshing the cached top lists of the API's own identity, when
+    `WARM_ENABLED` is set, and of every user in `WARM_USERS` in the background
+    """
+    users = ([None] if warm_settings["enabled"] else []) + warm_settings["users"]
+    app.state.warmer = CacheWarmer(
+        app.state.registry.response_cache,
+        top_list_targets(app.state.registry, users),
+        max_rate=warm_settings["rate_share"] * rate_limit_settings["spotify_rate_limit"],
+    )
+    app.state.warmer.start()
+
+
+@app.on_event("shutdown")
+async def stop_warmer():
+    """Stops refreshing the cached top lists"""
+    await app.state.warmer.stop()
+
+
+@app.on_event("shutdown")
+def close_clients():
+    """Releases the connection pools held by the shared clients and flushes spans"""
+    app.state.registry.close()
+    app.state.tracing.provider.shutdown()
+
+
 if __name__ == "__main__":
-    run("main:app", host="0.0.0.0", port=8000, log_level="info", reload=True)
+    # pylint: disable=import-outside-toplevel
+    from uvicorn import run
+
+    run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        log_level="info",
+        reload=True,
+        env_file=".env" if exists(".env") else None,
+    )
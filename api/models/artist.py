@@ -3,10 +3,10 @@ from typing import Dict, List
 
 from pydantic import BaseModel
 
-from .common import Query
+from .common import LookupQuery
 
 
-class ArtistQuery(Query):
+class ArtistQuery(LookupQuery):
     """The query model for the `/artists` route"""
 
 
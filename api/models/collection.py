@@ -1,9 +1,10 @@
 """Defines the Collection data model"""
 
-from typing import Dict, Generic, List, TypeVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Generic, List, Tuple, Type, TypeVar
 
-from pydantic import BaseModel
-from yaml import safe_load
+from pydantic import BaseModel, PrivateAttr
 
 from .artist import Artist
 from .genre import Genre
@@ -12,22 +13,73 @@ from .song import Song
 
 T = TypeVar("T")  # pylint: disable=invalid-name
 
+ITEM_HEADERS_FILE = Path(__file__).parent / "item_headers.yaml"
 
-def load_headers() -> Dict[str, str]:
+ITEM_MODELS: Dict[str, Type[BaseModel]] = {
+    "artist": Artist,
+    "song": Song,
+    "genre": Genre,
+    "rec": Rec,
+}
+"""The model of the items of each kind of collection"""
+
+RANK = "rank"
+"""The column field that holds an item's position in the collection"""
+
+
+@lru_cache(maxsize=1)
+def load_item_config() -> Dict[str, Dict]:
+    """
+    Loads the `item_headers.yaml` config file, the first time it is needed
+
+    Returns
+    -------
+    content: Dict[str, Dict]
+        the `collections` and `columns` sections of the file
+    """
+    # pylint: disable=import-outside-toplevel
+    from yaml import safe_load
+
+    with open(ITEM_HEADERS_FILE, encoding="utf-8") as handler:
+        return safe_load(handler)
+
+
+def load_headers() -> Dict[str, List[str]]:
     """
     Loads item headers from the `item_headers.yaml` config file
 
     Returns
     -------
-    content.collections: Dict[str, str]
+    content.collections: Dict[str, List[str]]
         a mapping of content to the respective item headers
     """
-    with open("./models/item_headers.yaml", encoding="utf-8") as handler:
-        content = safe_load(handler)
-        return content.get("collections", {})
+    return load_item_config().get("collections", {})
+
 
+def item_columns(item_headers: List[str]) -> Tuple[Type[BaseModel], Dict[str, str]]:
+    """
+    Retrieves the columns of the collection whose items have `item_headers`
+
+    Params
+    ------
+    item_headers: List[str]
+        the item headers of the collection
 
-COLLECTION_HEADERS = load_headers()
+    Returns
+    -------
+    columns: Tuple[Type[BaseModel], Dict[str, str]]
+        the model of the items, and a mapping of column name to the item field it
+        holds, in column order; `RANK` stands for the item's position
+
+    Raises
+    ------
+    TypeError
+        if no kind of collection has `item_headers`
+    """
+    for kind, headers in load_headers().items():
+        if headers == item_headers:
+            return ITEM_MODELS[kind], load_item_config()["columns"][kind]
+    raise TypeError(f"Unsupported item headers {item_headers}")
 
 
 class Collection(BaseModel, Generic[T]):
@@ -48,6 +100,16 @@ class Collection(BaseModel, Generic[T]):
     count: int
     """The number of items in the collection"""
 
+    _rendered: Dict[str, Tuple[bytes, str]] = PrivateAttr(default_factory=dict)
+    """The body and ETag of the collection in each format it has been sent in"""
+
+    def copy(self, **kwargs) -> "Collection[T]":
+        """Copies the collection, leaving out its rendered bodies since they may
+        change"""
+        copied = super().copy(**kwargs)
+        copied._rendered = {}  # pylint: disable=protected-access
+        return copied
+
     @classmethod
     def from_list(cls, items: List[T]):
         """
@@ -65,22 +127,23 @@ class Collection(BaseModel, Generic[T]):
         """
         item_type = ""
         headers = []
+        collection_headers = load_headers()
         match items:
             case [Artist(content=content), *_]:
                 item_type = content
-                headers = COLLECTION_HEADERS["artist"]
+                headers = collection_headers["artist"]
 
             case [Song(content=content), *_]:
                 item_type = content
-                headers = COLLECTION_HEADERS["song"]
+                headers = collection_headers["song"]
 
             case [Genre(content=content), *_]:
                 item_type = content
-                headers = COLLECTION_HEADERS["genre"]
+                headers = collection_headers["genre"]
 
             case [Rec(content=content), *_]:
                 item_type = content
-                headers = COLLECTION_HEADERS["rec"]
+                headers = collection_headers["rec"]
 
             case _:
                 raise TypeError(f"Unsupported item type {type(items[0])}")
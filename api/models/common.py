@@ -1,7 +1,7 @@
 """Common model definitions across API query models"""
 
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel, validator
 
@@ -39,3 +39,17 @@ class Query(BaseModel):
         """Defines the configuration for the query model"""
 
         use_enum_values = True
+
+
+class LookupQuery(Query):
+    """Query model for routes that can also look up several items by ID"""
+
+    ids: Optional[str]
+    """A comma separated list of Spotify IDs to look up instead of top items"""
+
+    ids_list: Optional[list[str]]
+    """A Python list of Spotify IDs - derived from `ids`"""
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        self.ids_list = [item for item in self.ids.split(",") if item] if self.ids else []
@@ -1,5 +1,6 @@
 """Defines the structures of the data models used for interacting with the `/genres` route"""
 
+from enum import Enum
 from typing import Optional, Tuple
 
 from pydantic import BaseModel
@@ -41,8 +42,22 @@ class Genre(BaseModel):
         )
 
 
+class GenreSource(Enum):
+    """Where genre counts are computed
+
+    spotify = Count the genres of the top artists fetched live from Spotify
+    cache = Count the genres of the cached top artists inside MongoDB
+    """
+
+    SPOTIFY = "spotify"
+    CACHE = "cache"
+
+
 class GenreQuery(Query):
     """The query model for the `/genres` route"""
 
     aggregate: Optional[bool] = False
     """Whether to group genres by bin"""
+
+    source: Optional[GenreSource] = GenreSource.SPOTIFY
+    """Where genre counts are computed"""
@@ -1,5 +1,6 @@
 """Query models for Spotify recommendations"""
 
+from enum import Enum
 from typing import Any, Dict, Optional
 
 from pydantic import BaseModel
@@ -7,6 +8,17 @@ from pydantic import BaseModel
 from .common import Query
 
 
+class RecSource(Enum):
+    """Where recommendations come from
+
+    spotify = Spotify's recommendations endpoint
+    local = The stored tracks whose audio features are most similar to the seeds
+    """
+
+    SPOTIFY = "spotify"
+    LOCAL = "local"
+
+
 class RecQuery(Query):
     """
     The query model for the `/recs` route
@@ -25,6 +37,9 @@ class RecQuery(Query):
 
     - seed tracks of Fade and Waves
     curl {base}/recs?seed_tracks=3cCxoOgfi6hgt8MNteuiiD,3nAq2hCr1oWsIU54tS98pL&limit=5
+
+    - stored tracks that sound like Fade
+    curl {base}/recs?seed_tracks=3cCxoOgfi6hgt8MNteuiiD&limit=5&source=local
     """
 
     # just the required fields for now, want to add in things like target sounds and whatnot
@@ -48,11 +63,12 @@ class RecQuery(Query):
     seed_tracks_list: Optional[list[str]]
     """A Python list of seed tracks - derived from `seed_tracks`"""
 
+    source: Optional[RecSource] = RecSource.SPOTIFY
+    """Where recommendations come from"""
+
     def __init__(self, **data: Any):
         super().__init__(**data)
-        self.seed_artists_list = (
-            self.seed_artists.split(",") if self.seed_artists else []
-        )
+        self.seed_artists_list = self.seed_artists.split(",") if self.seed_artists else []
         self.seed_genres_list = self.seed_genres.split(",") if self.seed_genres else []
         self.seed_tracks_list = self.seed_tracks.split(",") if self.seed_tracks else []
 
@@ -4,10 +4,10 @@ from typing import Dict
 
 from pydantic import BaseModel
 
-from models.common import Query
+from models.common import LookupQuery
 
 
-class SongQuery(Query):
+class SongQuery(LookupQuery):
     """The query model for the `/songs` route"""
 
 
@@ -1,14 +1,73 @@
 """Route related resources"""
+from functools import partial
+from typing import Callable, List, Optional, Sequence
+
+from dependencies.cache import ResponseLoader
+from dependencies.registry import ClientRegistry
 from fastapi import APIRouter
+from models.artist import ArtistQuery
+from models.common import TimeRange
+from models.genre import GenreQuery
+from models.song import SongQuery
 
 from .artists import router as artists_router
+from .artists import top_artists_loader
 from .genres import router as genres_router
+from .genres import top_genres_loader
+from .metrics import router as metrics_router
 from .recs import router as recs_router
 from .songs import router as songs_router
+from .songs import top_songs_loader
 
 ROUTE_REGISTRY: list[APIRouter] = [
     artists_router,
     genres_router,
+    metrics_router,
     recs_router,
     songs_router,
 ]
+
+
+def top_list_targets(
+    registry: ClientRegistry, users: Sequence[Optional[str]]
+) -> List[Callable[[], ResponseLoader]]:
+    """
+    Builds the cache warming targets of the default top artists, songs and genres
+    of every user, for every time range
+
+    Params
+    ------
+    registry: ClientRegistry
+        the shared upstream clients
+    users: Sequence[Optional[str]]
+        the users to warm, where None is the API's own spotify identity
+
+    Returns
+    -------
+    targets: List[Callable[[], ResponseLoader]]
+        builders of the key and loader of each response, as the routes cache them
+    """
+    targets: List[Callable[[], ResponseLoader]] = []
+    for user in users:
+        for time_range in TimeRange:
+            targets += [
+                partial(
+                    top_artists_loader,
+                    registry,
+                    ArtistQuery(time_range=time_range.value),
+                    user,
+                ),
+                partial(
+                    top_songs_loader,
+                    registry,
+                    SongQuery(time_range=time_range.value),
+                    user,
+                ),
+                partial(
+                    top_genres_loader,
+                    registry,
+                    GenreQuery(time_range=time_range.value),
+                    user,
+                ),
+            ]
+    return targets
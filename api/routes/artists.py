@@ -1,16 +1,17 @@
 """Defines the logic for handling requests to the `/artists` route"""
-from dependencies.spotify import Client, SpotifyClient
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from dependencies.cache import ResponseLoader
+from dependencies.registry import ClientRegistry, get_registry
+from dependencies.spotify import DEFAULT_LIMIT, DEFAULT_TIME_RANGE, AsyncClient
+from dependencies.users import get_user
+from fastapi import APIRouter, Depends, Request, Response
 from models.artist import Artist, ArtistQuery
 from models.collection import Collection
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
-trace.set_tracer_provider(TracerProvider())
-trace.get_tracer_provider().add_span_processor(  # type: ignore
-    BatchSpanProcessor(ConsoleSpanExporter())
-)
+from .responses import ModelResponse, collection_response
+
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(
@@ -19,7 +20,7 @@ router = APIRouter(
 )
 
 
-def get_artist(artist_id: str, client: SpotifyClient) -> Artist:
+async def get_artist(artist_id: str, client: AsyncClient) -> Artist:
     """
     Retrieves an individual artist from Spotify formatted as an `Artist`
 
@@ -27,7 +28,7 @@ def get_artist(artist_id: str, client: SpotifyClient) -> Artist:
     ------
     artist_id: str
         the Spotify artist ID, URI, or URL used to identify the artist
-    client: SpotifyClient
+    client: AsyncClient
         a api client object used to connect to Spotify
 
     Returns
@@ -35,16 +36,16 @@ def get_artist(artist_id: str, client: SpotifyClient) -> Artist:
     artist: Artist
         an object containing data about an artist
     """
-    return Artist.from_dict(client.get_artist_from_spotify(artist_id))
+    return Artist.from_dict(await client.get_artist_from_spotify(artist_id))
 
 
-def get_artists(client: SpotifyClient) -> Collection[Artist]:
+async def get_artists(client: AsyncClient) -> Collection[Artist]:
     """
     Retrieves a list of artists from Spotify formatted as an `ArtistResponse`
 
     Params
     ------
-    client: SpotifyClient
+    client: AsyncClient
         a api client object used to connect to Spotify
 
     Returns
@@ -52,34 +53,118 @@ def get_artists(client: SpotifyClient) -> Collection[Artist]:
     artists: Collection[Artist]
         a collection of `Artist` objects
     """
-    artists = [Artist.from_dict(item) for item in client.get_artists_from_spotify()]
+    items = await client.get_artists_from_spotify()
+    artists = [Artist.from_dict(item) for item in items]
     return Collection.from_list(artists)
 
 
+async def get_several_artists(artist_ids: List[str], client: AsyncClient) -> Collection[Artist]:
+    """
+    Retrieves several artists by ID formatted as a `Collection[Artist]`
+
+    Params
+    ------
+    artist_ids: List[str]
+        the Spotify artist IDs to look up
+    client: AsyncClient
+        a api client object used to connect to Spotify
+
+    Returns
+    -------
+    artists: Collection[Artist]
+        a collection of `Artist` objects in the requested order
+    """
+    items = await client.get_several_artists_from_spotify(artist_ids)
+    return Collection.from_list([Artist.from_dict(item) for item in items])
+
+
+def top_artists_loader(
+    registry: ClientRegistry, query: ArtistQuery, user: Optional[str]
+) -> ResponseLoader:
+    """
+    Builds the cache key and loader of a user's top artists
+
+    Requests that leave out the limit or time range share the entry of those that
+    give spotify's defaults
+
+    Params
+    ------
+    registry: ClientRegistry
+        the shared upstream clients
+    query: ArtistQuery
+        the query params of the request
+    user: Optional[str]
+        the user the request is made for
+
+    Returns
+    -------
+    loader: ResponseLoader
+        the key and loader of the response
+    """
+    client = AsyncClient(registry.client(query, user))
+    return ResponseLoader(
+        (
+            "artists",
+            user,
+            query.limit or DEFAULT_LIMIT,
+            query.time_range or DEFAULT_TIME_RANGE,
+        ),
+        lambda: get_artists(client),
+    )
+
+
 @router.get("", response_model=Collection[Artist])
-async def get_top_artists(query: ArtistQuery = Depends()) -> Collection[Artist]:
+async def get_top_artists(
+    request: Request,
+    query: ArtistQuery = Depends(),
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> Response:
     """
-    Retrieves the current users top artists from the spotify api
+    Retrieves the current users top artists from the spotify api, or the artists
+    listed in `ids` when it is given
 
     Params
     ------
+    request: Request
+        the incoming request
     query: ArtistQuery
         the query params included in the endpoint URL
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
     artists: Collection[Artist]
         a collection of `Artist` objects
     """
+    if query.ids_list:
+        with tracer.start_as_current_span(
+            name="Retrieving several artists",
+            attributes={"count": str(len(query.ids_list))},
+        ):
+            client = AsyncClient(registry.client(query, user))
+            return collection_response(request, await get_several_artists(query.ids_list, client))
+
     with tracer.start_as_current_span(
         name="Retrieving top artists",
         attributes={"limit": str(query.limit), "time_range": str(query.time_range)},
     ):
-        return get_artists(Client(query))
+        return collection_response(
+            request,
+            await registry.response_cache.get_or_load(*top_artists_loader(registry, query, user)),
+        )
 
 
 @router.get("/{artist_id}", response_model=Artist)
-async def get_one_artist(artist_id: str) -> Artist:
+async def get_one_artist(
+    artist_id: str,
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> ModelResponse:
     """
     Retrieves a single artist from spotify
 
@@ -87,6 +172,11 @@ async def get_one_artist(artist_id: str) -> Artist:
     ------
     artist_id: str
         the artist ID, URI, or URL
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
@@ -99,4 +189,6 @@ async def get_one_artist(artist_id: str) -> Artist:
             "artist_id": artist_id,
         },
     ):
-        return get_artist(artist_id, Client(ArtistQuery()))
+        return ModelResponse(
+            await get_artist(artist_id, AsyncClient(registry.client(ArtistQuery(), user)))
+        )
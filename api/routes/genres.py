@@ -1,23 +1,25 @@
 """Defines the logic for handling requests to the `/genres` route"""
 
-from operator import contains
-from typing import Any, Callable, Dict, List, TypeAlias, TypeVar
-
-from dependencies.spotify import Client, SpotifyClient
-from fastapi import APIRouter, Depends
+from functools import lru_cache
+from os import getenv
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TypeAlias
+
+from dependencies.cache import ResponseLoader
+from dependencies.registry import ClientRegistry, get_registry
+from dependencies.spotify import DEFAULT_TIME_RANGE, AsyncClient
+from dependencies.users import get_user
+from fastapi import APIRouter, Depends, Request, Response
 from models.collection import Collection
-from models.genre import Genre, GenreQuery
+from models.genre import Genre, GenreQuery, GenreSource
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
-T = TypeVar("T")  # pylint: disable=invalid-name
+from .responses import collection_response
+
 GenreCount: TypeAlias = Dict[str, int]
 
-trace.set_tracer_provider(TracerProvider())
-trace.get_tracer_provider().add_span_processor(  # type: ignore
-    BatchSpanProcessor(ConsoleSpanExporter())
-)
+DEFAULT_GENRE_BINS_FILE = Path(__file__).parent.parent / "models" / "genre_bins.yaml"
+
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(
@@ -25,45 +27,100 @@ router = APIRouter(
     tags=["generes"],
 )
 
-GENRE_BINS = [
-    "hip hop",
-    "rap",
-    "r&b",
-    "metal",
-    "rock",
-    "pop",
-    "indie",
-    "soul",
-    "folk",
-    "electronic",
-    "country",
-    "jazz",
-    "classical",
-]
-
-
-def filter_dict(
-    obj: Dict[str, T], opr: Callable[[str, Any], bool], query: Any
-) -> List[T]:
-    """
-    Uses an operator to compare dictionary keys against a query value to filter
-    the dictionary and retrieve the values for the matching keys
+
+def load_genre_bins(path: Optional[str] = None) -> List[str]:
+    """
+    Loads the broad genre bins from a YAML config file
 
     Params
     ------
-    obj: dict[str, T]
-        the dictionary to filter on
-    opr: Callable[[str, Any], bool]
-        an operator function that takes any two arguments and returns a boolean
-    query: Any
-        the value used to filter keys
+    path: Optional[str]
+        the config file to read; defaults to `GENRE_BINS_FILE` or the bundled
+        `models/genre_bins.yaml`
+
+    Returns
+    -------
+    bins: List[str]
+        the names of the broad genres, in display order
+    """
+    # pylint: disable=import-outside-toplevel
+    from yaml import safe_load
+
+    path = path or getenv("GENRE_BINS_FILE") or str(DEFAULT_GENRE_BINS_FILE)
+    with open(path, encoding="utf-8") as handler:
+        return safe_load(handler).get("bins", [])
+
+
+class GenreMatcher:
+    """
+    Classifies detailed genres into broad genre bins
+
+    A genre belongs to every bin whose name it contains. The bins a genre belongs to
+    are computed once and memoized, so aggregating counts costs one dictionary
+    lookup per distinct genre instead of a substring scan per bin
+    """
+
+    def __init__(self, bins: List[str], maxsize: int = 65536) -> None:
+        self.bins = list(bins)
+        self.maxsize = maxsize
+        self.__table: Dict[str, Tuple[str, ...]] = {}
+
+    def match(self, genre: str) -> Tuple[str, ...]:
+        """
+        Retrieves the bins that a genre belongs to
+
+        Params
+        ------
+        genre: str
+            a detailed genre name, e.g. "underground hip hop"
+
+        Returns
+        -------
+        bins: Tuple[str, ...]
+            the names of the matching bins, in bin order
+        """
+        matched = self.__table.get(genre)
+        if matched is None:
+            if len(self.__table) >= self.maxsize:
+                self.__table.clear()
+            matched = self.__table[genre] = tuple([name for name in self.bins if name in genre])
+        return matched
+
+    def aggregate(self, genre_detail: GenreCount) -> GenreCount:
+        """
+        Sums detailed genre counts into their bins in a single pass
+
+        Params
+        ------
+        genre_detail: Dict[str, int]
+            a mapping of detailed genre name to a count of its appearances
+
+        Returns
+        -------
+        genre_aggregate: Dict[str, int]
+            a mapping of every bin, in bin order, to its total count
+        """
+        totals = dict.fromkeys(self.bins, 0)
+        table = self.__table
+        for genre, count in genre_detail.items():
+            matched = table.get(genre)
+            for name in self.match(genre) if matched is None else matched:
+                totals[name] += count
+        return totals
+
+
+@lru_cache(maxsize=1)
+def genre_matcher() -> GenreMatcher:
+    """
+    Retrieves the matcher for the configured genre bins, loading them the first
+    time they are needed
 
     Returns
     -------
-    values: list[T]
-        a list of all the values for the keys that matched the given query
+    matcher: GenreMatcher
+        the matcher shared by every request
     """
-    return [value for (key, value) in obj.items() if opr(key, query)]
+    return GenreMatcher(load_genre_bins())
 
 
 def count_genres(genres: List[str]) -> GenreCount:
@@ -94,18 +151,18 @@ def get_genre_aggregate(genre_detail: GenreCount) -> GenreCount:
 
     Params
     ------
-    time_range: Optional[TimeRange]
-        the time range from which to retrieve results
+    genre_detail: Dict[str, int]
+        a mapping of detailed genre name to a count of its appearances
 
     Returns
     -------
     genre_aggregate: Dict[str, int]
         an object mapping a broad genre name to a count of its appearances
     """
-    return {key: sum(filter_dict(genre_detail, contains, key)) for key in GENRE_BINS}
+    return genre_matcher().aggregate(genre_detail)
 
 
-def get_genres(client: SpotifyClient) -> Collection[Genre]:
+async def get_genres(client: AsyncClient) -> Collection[Genre]:
     """
     Retrieves a sorted list of Genre objects
 
@@ -121,19 +178,20 @@ def get_genres(client: SpotifyClient) -> Collection[Genre]:
     genre_list: Collection[Genre]
         a collection of `Genre` objects
     """
-    genre_object = count_genres(client.get_genres_from_spotify())
-
     if not isinstance(client.query, GenreQuery):
         raise TypeError("Invalid query type for genres")
 
+    if client.query.source == GenreSource.CACHE.value:
+        genre_object = await client.get_genre_counts_from_cache()
+    else:
+        genre_object = count_genres(await client.get_genres_from_spotify())
+
     if client.query.aggregate:
         genre_object = get_genre_aggregate(genre_object)
 
     genre_list = [
         Genre.from_tuple(genre_tuple=(name, count))
-        for name, count in sorted(
-            genre_object.items(), key=lambda genre: genre[1], reverse=True
-        )
+        for name, count in sorted(genre_object.items(), key=lambda genre: genre[1], reverse=True)
     ]
 
     items = (
@@ -145,15 +203,64 @@ def get_genres(client: SpotifyClient) -> Collection[Genre]:
     return Collection.from_list(items)
 
 
+def top_genres_loader(
+    registry: ClientRegistry, query: GenreQuery, user: Optional[str]
+) -> ResponseLoader:
+    """
+    Builds the cache key and loader of a user's top genres
+
+    Requests that leave out the time range share the entry of those that give
+    spotify's default
+
+    Params
+    ------
+    registry: ClientRegistry
+        the shared upstream clients
+    query: GenreQuery
+        the query params of the request
+    user: Optional[str]
+        the user the request is made for
+
+    Returns
+    -------
+    loader: ResponseLoader
+        the key and loader of the response
+    """
+    client = AsyncClient(registry.client(query, user))
+    return ResponseLoader(
+        (
+            "genres",
+            user,
+            query.limit,
+            query.time_range or DEFAULT_TIME_RANGE,
+            query.aggregate,
+            query.source,
+        ),
+        lambda: get_genres(client),
+    )
+
+
 @router.get("", response_model=Collection[Genre])
-async def get_top_genres(query: GenreQuery = Depends()) -> Collection[Genre]:
+async def get_top_genres(
+    request: Request,
+    query: GenreQuery = Depends(),
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> Response:
     """
     Retrieves the current users top genres
 
     Params
     ------
+    request: Request
+        the incoming request
     query: GenreQuery
         the query params passed via the request
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
@@ -166,6 +273,10 @@ async def get_top_genres(query: GenreQuery = Depends()) -> Collection[Genre]:
             "limit": str(query.limit),
             "time_range": str(query.time_range),
             "aggregate": str(query.aggregate),
+            "source": str(query.source),
         },
     ):
-        return get_genres(Client(query))
+        return collection_response(
+            request,
+            await registry.response_cache.get_or_load(*top_genres_loader(registry, query, user)),
+        )
@@ -0,0 +1,29 @@
+"""Defines the logic for handling requests to the `/metrics` route"""
+
+from dependencies.metrics import CONTENT_TYPE, METRICS
+from dependencies.registry import ClientRegistry, get_registry
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics(
+    registry: ClientRegistry = Depends(get_registry),
+) -> PlainTextResponse:
+    """
+    Retrieves the runtime metrics of the API in the Prometheus text format
+
+    Params
+    ------
+    registry: ClientRegistry
+        the shared upstream clients, whose cache and coalescing counters are read
+        at scrape time
+
+    Returns
+    -------
+    metrics: PlainTextResponse
+        every recorded series, merged at scrape time
+    """
+    return PlainTextResponse(METRICS.render(registry.series()), media_type=CONTENT_TYPE)
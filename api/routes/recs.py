@@ -1,23 +1,23 @@
 """Defines the logic for handling requests to the `/recs` route"""
 
-from dependencies.spotify import Client, SpotifyClient
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from dependencies.registry import ClientRegistry, get_registry
+from dependencies.spotify import DEFAULT_LIMIT, AsyncClient
+from dependencies.users import get_user
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from models.collection import Collection
-from models.rec import Rec, RecQuery
+from models.rec import Rec, RecQuery, RecSource
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
-trace.set_tracer_provider(TracerProvider())
-trace.get_tracer_provider().add_span_processor(  # type: ignore
-    BatchSpanProcessor(ConsoleSpanExporter())
-)
+from .responses import collection_response
+
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(prefix="/recs", tags=["recommendations", "recs"])
 
 
-def get_recs(client: SpotifyClient) -> Collection[Rec]:
+async def get_recs(client: AsyncClient) -> Collection[Rec]:
     """
     Parses recommendations into a list of `Rec`s
 
@@ -34,19 +34,85 @@ def get_recs(client: SpotifyClient) -> Collection[Rec]:
     recs: Collection[Rec]
        a collection of `Rec` objects
     """
-    items = [Rec.from_dict(item) for item in client.get_recommendations_from_spotify()]
+    recommendations = await client.get_recommendations_from_spotify()
+    items = [Rec.from_dict(item) for item in recommendations]
     return Collection.from_list(items)
 
 
+async def get_local_recs(
+    query: RecQuery, registry: ClientRegistry, client: AsyncClient
+) -> Collection[Rec]:
+    """
+    Recommends stored tracks whose audio features are similar to the seeds
+
+    Params
+    ------
+    query: RecQuery
+        the query object containing the seed tracks and artists
+    registry: ClientRegistry
+        the shared upstream clients, holding the local recommender
+    client: AsyncClient
+        a api client object used to run the blocking lookup off the event loop
+
+    Returns
+    -------
+    recs: Collection[Rec]
+       a collection of `Rec` objects
+
+    Raises
+    ------
+    HTTPException
+        422 if seed genres are given, which stored tracks are not matched on, 404
+        if none of the seeds are in the local catalog, 501 if the packages local
+        recommendations need are not installed
+    """
+    if query.seed_genres_list:
+        raise HTTPException(
+            status_code=422,
+            detail="Local recommendations are seeded by tracks and artists only, not genres",
+        )
+
+    try:
+        recommendations = await client.run(
+            lambda: registry.local_recommender().recommend(
+                query.seed_tracks_list,
+                query.seed_artists_list,
+                query.limit or DEFAULT_LIMIT,
+            )
+        )
+    except ValueError as ex:
+        raise HTTPException(status_code=404, detail=str(ex)) from ex
+    except ImportError as ex:
+        raise HTTPException(
+            status_code=501,
+            detail=f"Local recommendations require the `recs` extra: {ex.name} is not installed",
+        ) from ex
+
+    return Collection.from_list([Rec.from_dict(item) for item in recommendations])
+
+
 @router.get("", response_model=Collection[Rec])
-async def get_recommendations(query: RecQuery = Depends()) -> Collection[Rec]:
+async def get_recommendations(
+    request: Request,
+    query: RecQuery = Depends(),
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> Response:
     """
-    Retrieves recommendations for the user based on their input parameters
+    Retrieves recommendations for the user based on their input parameters, from
+    spotify or, with `source=local`, from the audio features of stored tracks
 
     Params
     ------
+    request: Request
+        the incoming request
     query: RecQuery
         the query object with seed data from the request url
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
@@ -60,6 +126,22 @@ async def get_recommendations(query: RecQuery = Depends()) -> Collection[Rec]:
             "seed_artists": str(query.seed_artists),
             "seed_genres": str(query.seed_genres),
             "seed_tracks": str(query.seed_tracks),
+            "source": str(query.source),
         },
     ):
-        return get_recs(Client(query))
+        client = AsyncClient(registry.client(query, user))
+        if query.source == RecSource.LOCAL.value:
+            return collection_response(
+                request,
+                await registry.response_cache.get_or_load(
+                    (
+                        "recs",
+                        query.seed_tracks,
+                        query.seed_artists,
+                        query.limit,
+                    ),
+                    lambda: get_local_recs(query, registry, client),
+                ),
+            )
+
+        return collection_response(request, await get_recs(client))
@@ -0,0 +1,387 @@
+"""Defines the response classes used to send models back from the routes"""
+
+from functools import lru_cache
+from hashlib import blake2b
+from importlib.util import find_spec
+from json import dumps as json_dumps
+from typing import TYPE_CHECKING, Any, AsyncIterator, Tuple, get_args, get_origin
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from models.collection import RANK, Collection, item_columns
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from pyarrow import DataType
+
+try:
+    from orjson import dumps as orjson_dumps
+except ImportError:  # orjson is an optional speedup
+    orjson_dumps = None
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+ALTERNATIVE_FORMATS = {
+    NDJSON_MEDIA_TYPE: None,
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    ARROW_MEDIA_TYPE: "pyarrow",
+}
+"""The formats a collection can be sent in besides JSON, and the optional package
+each one requires"""
+
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE}
+"""Media types that clients may ask for a format by instead of its own"""
+
+WILDCARD_MEDIA_RANGES = ("*/*", "application/*")
+"""Media ranges that any format satisfies, answered with JSON"""
+
+CACHE_CONTROL = "private, no-cache"
+"""Lets clients keep a collection, provided they revalidate it with its ETag"""
+
+
+def model_fields(obj: Any) -> Any:
+    """
+    Retrieves the fields of a pydantic model for the JSON encoder
+
+    Models reaching the encoder have already been validated when they were built,
+    so their field values are used as-is instead of being re-validated
+
+    Params
+    ------
+    obj: Any
+        an object the encoder could not serialize natively
+
+    Returns
+    -------
+    fields: Dict[str, Any]
+        the field values of the model
+
+    Raises
+    ------
+    TypeError
+        if `obj` is not a pydantic model
+    """
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes models straight to JSON bytes, using orjson when it is installed
+
+    Params
+    ------
+    content: Any
+        a model, or JSON-compatible data containing models
+
+    Returns
+    -------
+    body: bytes
+        the UTF-8 encoded JSON document
+    """
+    if orjson_dumps is not None:
+        return orjson_dumps(content, default=model_fields)
+
+    return json_dumps(
+        content, default=model_fields, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """
+    Serializes models straight to MessagePack, with the same structure as their
+    JSON document
+
+    Params
+    ------
+    content: Any
+        a model, or MessagePack-compatible data containing models
+
+    Returns
+    -------
+    body: bytes
+        the MessagePack document
+    """
+    # pylint: disable=import-outside-toplevel
+    from msgpack import packb
+
+    return packb(content, default=model_fields)
+
+
+def arrow_type(annotation: Any) -> "DataType":
+    """
+    Retrieves the Arrow type of the values of a model field
+
+    Params
+    ------
+    annotation: Any
+        the type of the field, e.g. `int` or `List[str]`
+
+    Returns
+    -------
+    type: DataType
+        the matching Arrow type
+    """
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+
+    if get_origin(annotation) is list:
+        return pa.list_(arrow_type(get_args(annotation)[0]))
+    scalar_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+    }
+    return scalar_types[annotation]
+
+
+def dumps_arrow(collection: Collection) -> bytes:
+    """
+    Serializes a collection as an Arrow IPC stream holding a single record batch
+
+    Each column is named by an item header and typed from the item field it maps
+    to; fields the headers leave out follow under their own column names. The
+    collection's `item_type` is kept in the schema metadata
+
+    Params
+    ------
+    collection: Collection
+        the collection to serialize
+
+    Returns
+    -------
+    body: bytes
+        the Arrow IPC stream
+    """
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+
+    model, columns = item_columns(collection.item_headers)
+    fields, arrays = [], []
+    for column, field in columns.items():
+        if field == RANK:
+            data_type = pa.int64()
+            values = list(range(1, len(collection.items) + 1))
+        else:
+            data_type = arrow_type(model.__fields__[field].outer_type_)
+            values = [item.__dict__[field] for item in collection.items]
+        fields.append(pa.field(column, data_type))
+        arrays.append(pa.array(values, type=data_type))
+
+    schema = pa.schema(fields, metadata={"item_type": collection.item_type})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    return sink.getvalue().to_pybytes()
+
+
+def render_collection(
+    collection: Collection, media_type: str = JSON_MEDIA_TYPE
+) -> Tuple[bytes, str]:
+    """
+    Serializes a collection and computes its ETag, or retrieves both if the
+    collection has already been sent in the same format
+
+    Collections served from the response cache are the same objects from one
+    request to the next, so repeated polls reuse the body and ETag computed for the
+    first one rather than serializing the collection again
+
+    Params
+    ------
+    collection: Collection
+        the collection to serialize
+    media_type: str
+        the format to serialize to; JSON, MessagePack or an Arrow stream
+
+    Returns
+    -------
+    rendered: Tuple[bytes, str]
+        the body and a strong ETag derived from its content
+    """
+    rendered = collection._rendered  # pylint: disable=protected-access
+    if media_type not in rendered:
+        if media_type == ARROW_MEDIA_TYPE:
+            body = dumps_arrow(collection)
+        elif media_type == MSGPACK_MEDIA_TYPE:
+            body = dumps_msgpack(collection)
+        else:
+            body = dumps(collection)
+        rendered[media_type] = (body, f'"{blake2b(body, digest_size=16).hexdigest()}"')
+    return rendered[media_type]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks whether the client already holds the representation tagged `etag`
+
+    Params
+    ------
+    request: Request
+        the incoming request
+    etag: str
+        the quoted ETag of the current representation
+
+    Returns
+    -------
+    matches: bool
+        True if `If-None-Match` is `*` or lists `etag`, compared weakly
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    return any(
+        tag.strip() == "*" or tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+class ModelResponse(JSONResponse):
+    """
+    A JSON response for models that were validated when they were built
+
+    Returning a response directly from a route skips the validation and encoding
+    FastAPI otherwise applies through `response_model`, so each model is validated
+    once and serialized once
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, Collection):
+            return render_collection(content)[0]
+        return dumps(content)
+
+
+async def iter_ndjson(collection: Collection) -> AsyncIterator[bytes]:
+    """
+    Serializes a collection as newline-delimited JSON, one record at a time
+
+    The first record holds the collection's `item_type`, `item_headers` and
+    `count`; every following record is a single item
+
+    Params
+    ------
+    collection: Collection
+        the collection to serialize
+
+    Returns
+    -------
+    lines: AsyncIterator[bytes]
+        the header record followed by one record per item, each ending in a newline
+    """
+    yield dumps(
+        {
+            "item_type": collection.item_type,
+            "item_headers": collection.item_headers,
+            "count": collection.count,
+        }
+    ) + b"\n"
+    for item in collection.items:
+        yield dumps(item) + b"\n"
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    A newline-delimited JSON response for a collection
+
+    The collection is built and held in memory in full before the response
+    starts, as for every other format; only its encoding is spread over the
+    send, one record at a time, so the serialized body is never held whole
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self, collection: Collection, **kwargs) -> None:
+        super().__init__(iter_ndjson(collection), **kwargs)
+
+
+@lru_cache(maxsize=None)
+def installed(package: str) -> bool:
+    """Checks whether an optional package can be imported, without importing it"""
+    return find_spec(package) is not None
+
+
+def negotiate(request: Request) -> str:
+    """
+    Picks the format to send a collection in from the `Accept` header
+
+    JSON and every alternative format are candidates, and the one the client
+    gives the highest quality wins. A format named outright beats a wildcard of
+    the same quality, which is answered with JSON; otherwise ties go to the
+    format listed first. Formats whose package is not installed, and formats
+    with a quality of 0, are passed over
+
+    Params
+    ------
+    request: Request
+        the incoming request
+
+    Returns
+    -------
+    media_type: str
+        the media type of the chosen format, `application/json` if the header is
+        missing or lists no other format that can be produced
+    """
+    chosen, chosen_rank = JSON_MEDIA_TYPE, (0.0, False)
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        named = media_type not in WILDCARD_MEDIA_RANGES
+        if not named:
+            media_type = JSON_MEDIA_TYPE
+        elif media_type != JSON_MEDIA_TYPE:
+            if media_type not in ALTERNATIVE_FORMATS:
+                continue
+            package = ALTERNATIVE_FORMATS[media_type]
+            if package is not None and not installed(package):
+                continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and (quality, named) > chosen_rank:
+            chosen, chosen_rank = media_type, (quality, named)
+    return chosen
+
+
+def collection_response(request: Request, collection: Collection) -> Response:
+    """
+    Builds the response for a collection in the format the client asked for
+
+    JSON, MessagePack and Arrow responses carry an `ETag`, and a request whose
+    `If-None-Match` lists it is answered with an empty `304 Not Modified`. NDJSON
+    responses are not tagged, since their body is only encoded as it is sent
+
+    Params
+    ------
+    request: Request
+        the incoming request
+    collection: Collection
+        the collection to send
+
+    Returns
+    -------
+    response: Response
+        an `NDJSONResponse` if the client accepts `application/x-ndjson`, a
+        `304 Not Modified` if the client's copy is current, a MessagePack or Arrow
+        response if the client accepts one, otherwise a `ModelResponse`
+    """
+    media_type = negotiate(request)
+    if media_type == NDJSON_MEDIA_TYPE:
+        return NDJSONResponse(collection, headers={"Vary": "Accept"})
+
+    body, etag = render_collection(collection, media_type)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if media_type == JSON_MEDIA_TYPE:
+        return ModelResponse(collection, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
@@ -1,23 +1,24 @@
 """Defines the logic for handling requests to the `/songs` route"""
 
-from dependencies.spotify import Client, SpotifyClient
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from dependencies.cache import ResponseLoader
+from dependencies.registry import ClientRegistry, get_registry
+from dependencies.spotify import DEFAULT_LIMIT, DEFAULT_TIME_RANGE, AsyncClient
+from dependencies.users import get_user
+from fastapi import APIRouter, Depends, Request, Response
 from models.collection import Collection
 from models.song import Song, SongQuery
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
-trace.set_tracer_provider(TracerProvider())
-trace.get_tracer_provider().add_span_processor(  # type: ignore
-    BatchSpanProcessor(ConsoleSpanExporter())
-)
+from .responses import ModelResponse, collection_response
+
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(prefix="/songs", tags=["songs"])
 
 
-def get_song(song_id: str, client: SpotifyClient) -> Song:
+async def get_song(song_id: str, client: AsyncClient) -> Song:
     """
     Retrieves an individual song from Spotify formatted as a `Song`
 
@@ -25,7 +26,7 @@ def get_song(song_id: str, client: SpotifyClient) -> Song:
     ------
     artist_id: str
         the Spotify artist ID, URI, or URL used to identify the song
-    client: SpotifyClient
+    client: AsyncClient
         a api client object used to connect to Spotify
 
     Returns
@@ -33,16 +34,16 @@ def get_song(song_id: str, client: SpotifyClient) -> Song:
     artist: Song
         an object containing data about a song
     """
-    return Song.from_dict(client.get_song_from_spotify(song_id))
+    return Song.from_dict(await client.get_song_from_spotify(song_id))
 
 
-def get_songs(client: SpotifyClient) -> Collection[Song]:
+async def get_songs(client: AsyncClient) -> Collection[Song]:
     """
     Retrieves a list of songs from Spotify formatted as an `SongCollection`
 
     Params
     ------
-    client: SpotifyClient
+    client: AsyncClient
         a api client object used to connect to Spotify
 
     Returns
@@ -50,25 +51,101 @@ def get_songs(client: SpotifyClient) -> Collection[Song]:
     artists: Collection[Song]
         a collection of `Song` objects
     """
-    songs = [Song.from_dict(song) for song in client.get_songs_from_spotify()]
+    songs = [Song.from_dict(song) for song in await client.get_songs_from_spotify()]
     return Collection.from_list(songs)
 
 
+async def get_several_songs(song_ids: List[str], client: AsyncClient) -> Collection[Song]:
+    """
+    Retrieves several songs by ID formatted as a `Collection[Song]`
+
+    Params
+    ------
+    song_ids: List[str]
+        the Spotify song IDs to look up
+    client: AsyncClient
+        a api client object used to connect to Spotify
+
+    Returns
+    -------
+    songs: Collection[Song]
+        a collection of `Song` objects in the requested order
+    """
+    items = await client.get_several_songs_from_spotify(song_ids)
+    return Collection.from_list([Song.from_dict(item) for item in items])
+
+
+def top_songs_loader(
+    registry: ClientRegistry, query: SongQuery, user: Optional[str]
+) -> ResponseLoader:
+    """
+    Builds the cache key and loader of a user's top songs
+
+    Requests that leave out the limit or time range share the entry of those that
+    give spotify's defaults
+
+    Params
+    ------
+    registry: ClientRegistry
+        the shared upstream clients
+    query: SongQuery
+        the query params of the request
+    user: Optional[str]
+        the user the request is made for
+
+    Returns
+    -------
+    loader: ResponseLoader
+        the key and loader of the response
+    """
+    client = AsyncClient(registry.client(query, user))
+    return ResponseLoader(
+        (
+            "songs",
+            user,
+            query.limit or DEFAULT_LIMIT,
+            query.time_range or DEFAULT_TIME_RANGE,
+        ),
+        lambda: get_songs(client),
+    )
+
+
 @router.get("", response_model=Collection[Song])
-async def get_top_songs(query: SongQuery = Depends()) -> Collection[Song]:
+async def get_top_songs(
+    request: Request,
+    query: SongQuery = Depends(),
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> Response:
     """
-    Retrieves the current users top songs from the spotify api
+    Retrieves the current users top songs from the spotify api, or the songs listed
+    in `ids` when it is given
 
     Params
     ------
+    request: Request
+        the incoming request
     query: SongQuery
         the query params included in the endpoint URL
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
     songs: Collection[Song]
         a collection of `Song` objects
     """
+    if query.ids_list:
+        with tracer.start_as_current_span(
+            name="Retrieving several songs",
+            attributes={"count": str(len(query.ids_list))},
+        ):
+            client = AsyncClient(registry.client(query, user))
+            return collection_response(request, await get_several_songs(query.ids_list, client))
+
     with tracer.start_as_current_span(
         name="Retrieving top songs",
         attributes={
@@ -76,11 +153,18 @@ async def get_top_songs(query: SongQuery = Depends()) -> Collection[Song]:
             "time_range": str(query.time_range),
         },
     ):
-        return get_songs(Client(query))
+        return collection_response(
+            request,
+            await registry.response_cache.get_or_load(*top_songs_loader(registry, query, user)),
+        )
 
 
 @router.get("/{song_id}", response_model=Song)
-async def get_one_song(song_id: str) -> Song:
+async def get_one_song(
+    song_id: str,
+    registry: ClientRegistry = Depends(get_registry),
+    user: Optional[str] = Depends(get_user),
+) -> ModelResponse:
     """
     Retrieves a single song from spotify
 
@@ -88,6 +172,11 @@ async def get_one_song(song_id: str) -> Song:
     ------
     song_id: str
         the song ID, URI, or URL
+    registry: ClientRegistry
+        the shared upstream clients
+    user: Optional[str]
+        the user the request is made for, resolved from the API key sent in the
+        `USER_KEY_HEADER` header
 
     Returns
     -------
@@ -100,4 +189,6 @@ async def get_one_song(song_id: str) -> Song:
             "song_id": song_id,
         },
     ):
-        return get_song(song_id, Client(SongQuery()))
+        return ModelResponse(
+            await get_song(song_id, AsyncClient(registry.client(SongQuery(), user)))
+        )
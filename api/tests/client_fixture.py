@@ -55,6 +55,10 @@ class FakeClient(SpotifyClient):
             "other_field": "not_parsed",
         }
 
+    def get_several_artists_from_spotify(self, artist_ids: List[str]) -> List[Dict]:
+        artists = {artist["id"]: artist for artist in self.get_artists_from_spotify()}
+        return [artists[artist_id] for artist_id in artist_ids if artist_id in artists]
+
     def get_songs_from_spotify(self) -> List[Dict]:
         return [
             {
@@ -91,6 +95,10 @@ class FakeClient(SpotifyClient):
             "other_field": "not_parsed",
         }
 
+    def get_several_songs_from_spotify(self, song_ids: List[str]) -> List[Dict]:
+        songs = {song["id"]: song for song in self.get_songs_from_spotify()}
+        return [songs[song_id] for song_id in song_ids if song_id in songs]
+
     def get_genres_from_spotify(self) -> List[str]:
         return [
             "rap",
@@ -115,6 +123,12 @@ class FakeClient(SpotifyClient):
             "pop",
         ]
 
+    def get_genre_counts_from_cache(self) -> Dict[str, int]:
+        genre_detail: Dict[str, int] = {}
+        for genre in self.get_genres_from_spotify():
+            genre_detail[genre] = genre_detail.get(genre, 0) + 1
+        return genre_detail
+
     def get_recommendations_from_spotify(self) -> List[Dict]:
         return [
             {"name": "Erase Your Social", "artists": [{"name": "Lil Uzi Vert"}]},
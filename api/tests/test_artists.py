@@ -1,7 +1,8 @@
 """Test Suite for the `/artists` route"""
 
-from unittest import TestCase
+from unittest import IsolatedAsyncioTestCase
 
+from dependencies.spotify import AsyncClient
 from models.artist import Artist, ArtistQuery
 from models.collection import Collection
 from routes import artists
@@ -9,10 +10,10 @@ from routes import artists
 from .client_fixture import FakeClient
 
 
-class ArtistsTest(TestCase):
+class ArtistsTest(IsolatedAsyncioTestCase):
     """Unit tests for the artists logic"""
 
-    def test_get_artists(self):
+    async def test_get_artists(self):
         """
         Tests that the `get_artists` function properly parses objects from
         the spotify api into `Artist` models
@@ -48,10 +49,21 @@ class ArtistsTest(TestCase):
                 ],
                 count=2,
             ),
-            artists.get_artists(FakeClient(ArtistQuery())),
+            await artists.get_artists(AsyncClient(FakeClient(ArtistQuery()))),
         )
 
-    def test_get_artist(self):
+    async def test_get_several_artists(self):
+        """
+        Tests that `get_several_artists` returns the requested artists in order
+        """
+        collection = await artists.get_several_artists(
+            ["DEF456", "ABC123"], AsyncClient(FakeClient(ArtistQuery()))
+        )
+
+        self.assertEqual(["DEF456", "ABC123"], [item.id for item in collection.items])
+        self.assertEqual(2, collection.count)
+
+    async def test_get_artist(self):
         """
         Tests that `get_artist_from_spotify` retrieves one artist
         """
@@ -64,5 +76,5 @@ class ArtistsTest(TestCase):
                 followers=1234567,
                 genres=["folk"],
             ),
-            artists.get_artist("ABC123", FakeClient(None)),
+            await artists.get_artist("ABC123", AsyncClient(FakeClient(None))),
         )
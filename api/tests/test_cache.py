@@ -0,0 +1,118 @@
+"""Test Suite for the in-process caches"""
+
+from asyncio import sleep
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from dependencies.cache import StaleWhileRevalidateCache, TTLCache
+from dependencies.scheduler import Priority, call_priority
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TTLCacheTest(TestCase):
+    """Unit tests for `TTLCache`"""
+
+    def test_evicts_least_recently_used(self):
+        """Tests that the least recently used entry is evicted once full"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual(
+            {"hits": 3, "misses": 1, "evictions": 1, "expirations": 0, "size": 2},
+            cache.stats(),
+        )
+
+    def test_expires_entries(self):
+        """Tests that entries are dropped once their time to live has passed"""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 9.9
+        self.assertEqual(1, cache.get("a"))
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(1, cache.stats()["expirations"])
+        self.assertEqual(0, len(cache))
+
+    def test_disabled_cache(self):
+        """Tests that a cache with no capacity never stores anything"""
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class StaleWhileRevalidateCacheTest(IsolatedAsyncioTestCase):
+    """Unit tests for `StaleWhileRevalidateCache`"""
+
+    async def asyncSetUp(self):
+        self.clock = FakeClock()
+        self.cache = StaleWhileRevalidateCache(
+            maxsize=2, fresh_for=10, max_stale=100, clock=self.clock
+        )
+        self.loads = 0
+
+    async def load(self) -> int:
+        """Counts and returns the number of times it has been called"""
+        self.loads += 1
+        await sleep(0)
+        return self.loads
+
+    async def test_fresh_entry_served_without_loading(self):
+        """Tests that a fresh entry is served from the cache"""
+        self.assertEqual(1, await self.cache.get_or_load("key", self.load))
+        self.assertEqual(1, await self.cache.get_or_load("key", self.load))
+        self.assertEqual(1, self.loads)
+
+    async def test_stale_entry_served_while_one_refresh_runs(self):
+        """
+        Tests that stale entries are returned immediately while a single background
+        refresh replaces them
+        """
+        await self.cache.get_or_load("key", self.load)
+        self.clock.now = 11
+
+        stale = [await self.cache.get_or_load("key", self.load) for _ in range(3)]
+        self.assertEqual([1, 1, 1], stale)
+        self.assertEqual(1, self.cache.stats()["refreshes"])
+
+        await sleep(0.01)
+        self.assertEqual(2, await self.cache.get_or_load("key", self.load))
+        self.assertEqual(2, self.loads)
+
+    async def test_refresh_runs_at_background_priority(self):
+        """Tests that spotify calls made by a refresh are scheduled as background"""
+        priorities = []
+
+        async def load() -> int:
+            priorities.append(call_priority.get())
+            return await self.load()
+
+        await self.cache.get_or_load("key", load)
+        self.clock.now = 11
+        await self.cache.get_or_load("key", load)
+        await sleep(0.01)
+
+        self.assertEqual([Priority.INTERACTIVE, Priority.BACKGROUND], priorities)
+        self.assertEqual(Priority.INTERACTIVE, call_priority.get())
+
+    async def test_expired_entry_loaded_inline(self):
+        """Tests that an entry past its stale window is reloaded before returning"""
+        await self.cache.get_or_load("key", self.load)
+        self.clock.now = 111
+        self.assertEqual(2, await self.cache.get_or_load("key", self.load))
+        self.assertEqual(2, self.cache.stats()["misses"])
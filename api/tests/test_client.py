@@ -0,0 +1,347 @@
+"""Test Suite for the concrete Spotify `Client`"""
+
+from asyncio import wait_for
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, current_thread
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import ANY, MagicMock
+
+from dependencies.cache import TTLCache
+from dependencies.documents import (
+    ARTIST_FIELDS,
+    ARTIST_PROJECTION,
+    SONG_FIELDS,
+    SONG_PROJECTION,
+    compact,
+)
+from dependencies.metrics import Metrics
+from dependencies.scheduler import Priority, Scheduler, call_priority
+from dependencies.spotify import AsyncClient, Client, settings
+from models.artist import ArtistQuery
+from models.genre import GenreQuery
+from models.song import SongQuery
+from spotipy.exceptions import SpotifyException
+
+from .client_fixture import FakeClient
+
+
+class ClientTest(TestCase):
+    """Unit tests for the MongoDB caching done by `Client`"""
+
+    def test_top_artists_cached_in_one_round_trip(self):
+        """Tests that top artists are upserted with a single unordered bulk write"""
+        artists = FakeClient(None).get_artists_from_spotify()
+        spotify, mongo = MagicMock(), MagicMock()
+        spotify.current_user_top_artists.return_value = {"items": artists}
+        client = Client(ArtistQuery(limit=2), spotify, mongo)
+
+        self.assertEqual(artists, client.get_artists_from_spotify())
+
+        client.artists_collection.update_one.assert_not_called()
+        client.artists_collection.bulk_write.assert_called_once()
+        requests = client.artists_collection.bulk_write.call_args.args[0]
+        self.assertEqual(
+            ["UpdateOne", "UpdateOne", "UpdateMany"],
+            [type(request).__name__ for request in requests],
+        )
+        self.assertFalse(client.artists_collection.bulk_write.call_args.kwargs["ordered"])
+
+    def test_hot_artist_served_from_memory(self):
+        """Tests that a repeated artist lookup does not go back to MongoDB"""
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        mongo = MagicMock()
+        client = Client(ArtistQuery(), MagicMock(), mongo, TTLCache(10, 60))
+        client.artists_collection.find_one.return_value = artist
+
+        self.assertEqual(artist, client.get_artist_from_spotify("ABC123"))
+        self.assertEqual(artist, client.get_artist_from_spotify("ABC123"))
+
+        client.artists_collection.find_one.assert_called_once()
+        client.client.artist.assert_not_called()
+        self.assertEqual(1, client.artist_cache.stats()["hits"])
+
+    def test_fetched_song_cached_in_memory(self):
+        """Tests that a song fetched from Spotify is kept in the in-process cache"""
+        song = FakeClient(None).get_song_from_spotify("ABC123")
+        spotify = MagicMock()
+        spotify.track.return_value = song
+        client = Client(ArtistQuery(), spotify, MagicMock(), song_cache=TTLCache(10, 60))
+        client.songs_collection.find_one.return_value = None
+
+        client.get_song_from_spotify("ABC123")
+        client.get_song_from_spotify("ABC123")
+
+        spotify.track.assert_called_once_with("ABC123")
+        client.songs_collection.update_one.assert_called_once()
+
+    def test_several_artists_fetch_only_misses(self):
+        """
+        Tests that several artists are resolved with one MongoDB query and only the
+        misses are fetched from Spotify, in chunks of 50
+        """
+        ids = [f"artist{index}" for index in range(60)]
+        spotify, mongo = MagicMock(), MagicMock()
+        spotify.artists.side_effect = lambda chunk: {
+            "artists": [{"id": artist_id} for artist_id in chunk]
+        }
+        client = Client(ArtistQuery(), spotify, mongo, TTLCache(100, 60))
+        client.artist_cache.set("artist0", {"id": "artist0", "source": "memory"})
+        client.artists_collection.find.return_value = [{"id": "artist1"}]
+
+        found = client.get_several_artists_from_spotify(list(reversed(ids)))
+
+        self.assertEqual(list(reversed(ids)), [artist["id"] for artist in found])
+        self.assertEqual("memory", found[-1]["source"])
+        client.artists_collection.find.assert_called_once_with(
+            {"id": {"$in": list(reversed(ids[1:]))}}, ARTIST_PROJECTION
+        )
+        self.assertEqual([50, 8], [len(c.args[0]) for c in spotify.artists.call_args_list])
+        client.artists_collection.bulk_write.assert_called_once()
+
+    def test_genre_counts_aggregated_in_mongo(self):
+        """
+        Tests that cached genre counts come from a MongoDB aggregation over the
+        top `GENRE_ARTISTS` ranked artists, without calling Spotify
+        """
+        spotify, mongo = MagicMock(), MagicMock()
+        client = Client(GenreQuery(time_range="short_term"), spotify, mongo)
+        client.artists_collection.aggregate.return_value = [
+            {"_id": "rap", "count": 4},
+            {"_id": "pop", "count": 1},
+        ]
+
+        self.assertEqual({"rap": 4, "pop": 1}, client.get_genre_counts_from_cache())
+
+        pipeline = client.artists_collection.aggregate.call_args.args[0]
+        self.assertEqual(
+            {"top_ranks.short_term": {"$lt": settings["genre_artists"]}}, pipeline[0]["$match"]
+        )
+        self.assertEqual({"$unwind": "$genres"}, pipeline[2])
+        spotify.current_user_top_artists.assert_not_called()
+
+    def test_spotify_calls_scheduled(self):
+        """Tests that spotify calls go through the scheduler, which retries a 429"""
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        spotify = MagicMock()
+        spotify.artist.side_effect = [
+            SpotifyException(429, -1, "slow down", headers={"Retry-After": "0"}),
+            artist,
+        ]
+        scheduler = Scheduler(0, 0, metrics=Metrics())
+        client = Client(ArtistQuery(), spotify, MagicMock(), scheduler=scheduler)
+        client.artists_collection.find_one.return_value = None
+
+        self.assertEqual(compact(artist, ARTIST_FIELDS), client.get_artist_from_spotify("ABC123"))
+        self.assertEqual(2, spotify.artist.call_count)
+        self.assertEqual(1, scheduler.stats()["throttled"])
+
+    def test_fetched_song_stored_compact(self):
+        """
+        Tests that only the fields `Song` reads are stored, with a fetched-at time,
+        and that lookups read them back through a projection
+        """
+        song = {
+            **FakeClient(None).get_song_from_spotify("ABC123"),
+            "available_markets": ["US", "GB"],
+        }
+        spotify = MagicMock()
+        spotify.track.return_value = song
+        client = Client(ArtistQuery(), spotify, MagicMock())
+        client.songs_collection.find_one.return_value = None
+
+        found = client.get_song_from_spotify("ABC123")
+
+        self.assertEqual(
+            {
+                "id": "ABC123",
+                "name": "Love Song",
+                "artists": [{"name": "Wesley"}],
+                "popularity": 99,
+                "album": {"name": "The Princess Bride", "release_date": "1987-09-07"},
+            },
+            found,
+        )
+        self.assertEqual(compact(song, SONG_FIELDS), found)
+        client.songs_collection.find_one.assert_called_once_with({"id": "ABC123"}, SONG_PROJECTION)
+        query, update = client.songs_collection.update_one.call_args.args
+        self.assertEqual({"id": "ABC123"}, query)
+        self.assertEqual({**found, "fetched_at": ANY}, update["$set"])
+        self.assertTrue(client.songs_collection.update_one.call_args.kwargs["upsert"])
+
+    def test_user_calls_charged_to_user_budget(self):
+        """Tests that calls made for a user are charged to that user's budget"""
+        scheduler = MagicMock()
+        client = Client(ArtistQuery(), MagicMock(), MagicMock(), scheduler=scheduler, user="alice")
+        client.artists_collection.find_one.return_value = None
+
+        client.get_artist_from_spotify("ABC123")
+
+        self.assertEqual("user:alice", scheduler.run.call_args.args[1])
+
+
+class AsyncClientTest(IsolatedAsyncioTestCase):
+    """Unit tests for offloading `Client` calls from the event loop"""
+
+    async def test_memory_hits_skip_the_executor(self):
+        """Tests that lookups held in memory are answered even while every worker
+        is busy, e.g. waiting on the rate-limit budget"""
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        client = Client(ArtistQuery(), MagicMock(), MagicMock(), TTLCache(10, 60))
+        client.artist_cache.set("ABC123", artist)
+        release = Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        executor.submit(release.wait)
+        try:
+            async_client = AsyncClient(client, executor)
+            self.assertEqual(
+                artist,
+                await wait_for(async_client.get_artist_from_spotify("ABC123"), 1),
+            )
+            self.assertEqual(
+                [artist],
+                await wait_for(async_client.get_several_artists_from_spotify(["ABC123"] * 2), 1),
+            )
+        finally:
+            release.set()
+            executor.shutdown()
+
+        self.assertEqual(
+            {"hits": 2, "misses": 0, "evictions": 0, "expirations": 0, "size": 1},
+            client.artist_cache.stats(),
+        )
+
+    async def test_partial_hits_offloaded(self):
+        """Tests that a lookup only partly held in memory is offloaded whole"""
+        client = MagicMock()
+        client.get_cached_artists.return_value = None
+        client.get_several_artists_from_spotify.return_value = ["found"]
+
+        self.assertEqual(
+            ["found"],
+            await AsyncClient(client).get_several_artists_from_spotify(["a", "b"]),
+        )
+
+    async def test_background_calls_use_their_own_pool(self):
+        """Tests that background calls never take an interactive worker"""
+        client = AsyncClient(FakeClient(None))
+        self.assertNotIn("background", (await client.run(current_thread)).name)
+
+        token = call_priority.set(Priority.BACKGROUND)
+        try:
+            thread = await client.run(current_thread)
+        finally:
+            call_priority.reset(token)
+        self.assertTrue(thread.name.startswith("spotify-background"))
+
+
+def top_list(total: int):
+    """Builds a fake spotify top-list endpoint holding `total` items"""
+
+    def top(limit: int, offset: int, time_range: str):
+        return {
+            "items": [
+                {"id": f"item{index}", "name": time_range, "genres": ["rap"]}
+                for index in range(offset, min(offset + limit, total))
+            ],
+            "total": total,
+        }
+
+    return top
+
+
+class PaginationTest(TestCase):
+    """Unit tests for reading top lists longer than one spotify page"""
+
+    def test_pages_merged_in_rank_order(self):
+        """Tests that a large limit is read in full pages, merged in rank order"""
+        spotify = MagicMock()
+        spotify.current_user_top_tracks.side_effect = top_list(200)
+        client = Client(SongQuery(limit=110), spotify, MagicMock())
+
+        songs = client.get_songs_from_spotify()
+
+        self.assertEqual([f"item{index}" for index in range(110)], [s["id"] for s in songs])
+        self.assertEqual(
+            [0, 50, 100],
+            sorted(
+                call.kwargs["offset"] for call in spotify.current_user_top_tracks.call_args_list
+            ),
+        )
+        self.assertTrue(
+            all(
+                call.kwargs["limit"] == 50
+                for call in spotify.current_user_top_tracks.call_args_list
+            )
+        )
+
+    def test_pages_beyond_total_not_fetched(self):
+        """Tests that no page is requested past the end of the list"""
+        spotify = MagicMock()
+        spotify.current_user_top_tracks.side_effect = top_list(70)
+        client = Client(SongQuery(limit=500), spotify, MagicMock())
+
+        self.assertEqual(70, len(client.get_songs_from_spotify()))
+        self.assertEqual(2, spotify.current_user_top_tracks.call_count)
+
+    def test_pages_reused_across_limits(self):
+        """Tests that requests for overlapping limits share cached pages"""
+        spotify = MagicMock()
+        spotify.current_user_top_artists.side_effect = top_list(200)
+        page_cache = TTLCache(10, 60)
+        for limit in [60, 90, 20, 120]:
+            client = Client(ArtistQuery(limit=limit), spotify, MagicMock(), page_cache=page_cache)
+            self.assertEqual(limit, len(client.get_artists_from_spotify()))
+
+        self.assertEqual(3, spotify.current_user_top_artists.call_count)
+        self.assertEqual(3, page_cache.stats()["size"])
+
+    def test_page_ranks_offset(self):
+        """Tests that artists are ranked by their place in the whole list, and that
+        the last page clears every later rank"""
+        # pylint: disable=import-outside-toplevel
+        from pymongo import UpdateMany, UpdateOne
+
+        spotify = MagicMock()
+        spotify.current_user_top_artists.side_effect = top_list(60)
+        client = Client(ArtistQuery(limit=100, time_range="short_term"), spotify, MagicMock())
+
+        client.get_artists_from_spotify()
+
+        writes = [call.args[0] for call in client.artists_collection.bulk_write.call_args_list]
+        writes.sort(key=len, reverse=True)
+        ranks = "top_ranks.short_term"
+        self.assertEqual(
+            UpdateOne(
+                {"id": "item50"},
+                {
+                    "$set": {
+                        "id": "item50",
+                        "name": "short_term",
+                        "genres": ["rap"],
+                        "fetched_at": ANY,
+                        ranks: 50,
+                    }
+                },
+                upsert=True,
+            ),
+            writes[1][0],
+        )
+        self.assertEqual(
+            [
+                UpdateMany(
+                    {
+                        ranks: {"$gte": 0, "$lt": 50},
+                        "id": {"$nin": [f"item{index}" for index in range(50)]},
+                    },
+                    {"$unset": {ranks: ""}},
+                ),
+                UpdateMany(
+                    {
+                        ranks: {"$gte": 50},
+                        "id": {"$nin": [f"item{index}" for index in range(50, 60)]},
+                    },
+                    {"$unset": {ranks: ""}},
+                ),
+            ],
+            [write[-1] for write in writes],
+        )
@@ -0,0 +1,80 @@
+"""Test Suite for the documents cached in MongoDB"""
+
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from dependencies.documents import (
+    ARTIST_FIELDS,
+    ARTIST_PROJECTION,
+    compact,
+    ensure_indexes,
+    stored,
+)
+from models.artist import Artist
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+from .client_fixture import FakeClient
+
+
+class DocumentsTest(TestCase):
+    """Unit tests for compact documents and their indexes"""
+
+    def test_compact_matches_projection(self):
+        """Tests that a compact artist keeps the projected fields and still parses"""
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        document = compact(artist, ARTIST_FIELDS)
+
+        self.assertNotIn("other_field", document)
+        self.assertEqual({"total": 1234567}, document["followers"])
+        self.assertEqual(Artist.from_dict(artist), Artist.from_dict(document))
+        self.assertEqual({"_id": 0, **{field: 1 for field in ARTIST_FIELDS}}, ARTIST_PROJECTION)
+
+    def test_compact_arrays(self):
+        """Tests that paths into arrays keep the field of every element"""
+        self.assertEqual(
+            {"artists": [{"name": "A"}, {"name": "B"}]},
+            compact(
+                {"artists": [{"name": "A", "uri": "a"}, {"name": "B"}], "uri": "t"},
+                ["artists.name", "album.name"],
+            ),
+        )
+
+    def test_stored_is_stamped(self):
+        """Tests that stored documents carry a fetched-at time"""
+        document = stored({"id": "ABC123"})
+        self.assertEqual("ABC123", document["id"])
+        self.assertIsNotNone(document["fetched_at"].tzinfo)
+
+    def test_ensure_indexes(self):
+        """Tests that unique indexes are created on every looked up collection"""
+        mongo = MagicMock()
+        ensure_indexes(mongo)
+
+        collection = mongo.get_database.return_value.get_collection.return_value
+        self.assertEqual(4, collection.create_index.call_count)
+        self.assertTrue(collection.create_index.call_args.kwargs["unique"])
+        self.assertTrue(collection.create_index.call_args.kwargs["sparse"])
+
+    def test_ensure_indexes_with_duplicates(self):
+        """Tests that duplicate ids fall back to a non-unique index"""
+        mongo = MagicMock()
+        collection = mongo.get_database.return_value.get_collection.return_value
+        collection.create_index.side_effect = [
+            OperationFailure("duplicate key", code=11000),
+            "id",
+            "id",
+            "user_id",
+            "api_key",
+        ]
+        ensure_indexes(mongo)
+
+        self.assertNotIn("unique", collection.create_index.call_args_list[1].kwargs)
+
+    def test_ensure_indexes_without_mongo(self):
+        """Tests that an unreachable MongoDB does not stop the API from starting"""
+        mongo = MagicMock()
+        collection = mongo.get_database.return_value.get_collection.return_value
+        collection.create_index.side_effect = ServerSelectionTimeoutError("down")
+
+        with self.assertLogs("dependencies.documents", "WARNING"):
+            ensure_indexes(mongo)
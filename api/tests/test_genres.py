@@ -1,6 +1,8 @@
 """Test Suite for the `/genres` route"""
-from unittest import TestCase
+from tempfile import NamedTemporaryFile
+from unittest import IsolatedAsyncioTestCase
 
+from dependencies.spotify import AsyncClient
 from models.collection import Collection
 from models.genre import Genre, GenreQuery
 from routes import genres
@@ -8,10 +10,10 @@ from routes import genres
 from .client_fixture import FakeClient
 
 
-class GenresTest(TestCase):
+class GenresTest(IsolatedAsyncioTestCase):
     """Unit tests for the genres logic"""
 
-    def test_get_genre_agg(self):
+    async def test_get_genre_agg(self):
         """Tests get_genres with aggregation"""
         self.assertEqual(
             Collection(
@@ -34,10 +36,10 @@ class GenresTest(TestCase):
                 item_headers=["Rank", "Genre", "Count"],
                 count=13,
             ),
-            genres.get_genres(FakeClient(GenreQuery(aggregate=True))),
+            await genres.get_genres(AsyncClient(FakeClient(GenreQuery(aggregate=True)))),
         )
 
-    def test_get_genre_detail(self):
+    async def test_get_genre_detail(self):
         """Tests get_genres without aggregation"""
         self.assertEqual(
             Collection(
@@ -53,5 +55,35 @@ class GenresTest(TestCase):
                 item_headers=["Rank", "Genre", "Count"],
                 count=6,
             ),
-            genres.get_genres(FakeClient(GenreQuery(aggregate=False))),
+            await genres.get_genres(AsyncClient(FakeClient(GenreQuery(aggregate=False)))),
+        )
+
+    async def test_genre_matcher(self):
+        """Tests that a genre counts toward every bin whose name it contains"""
+        matcher = genres.GenreMatcher(["hip hop", "rap", "pop"])
+
+        self.assertEqual(("rap", "pop"), matcher.match("pop rap"))
+        self.assertEqual(
+            {"hip hop": 3, "rap": 4, "pop": 2},
+            matcher.aggregate({"hip hop": 3, "pop rap": 2, "rap": 2, "jazz": 1}),
+        )
+
+    async def test_load_genre_bins(self):
+        """Tests that genre bins are read from a config file"""
+        with NamedTemporaryFile("w", suffix=".yaml") as handler:
+            handler.write("bins:\n  - lofi\n  - drill\n")
+            handler.flush()
+            self.assertEqual(["lofi", "drill"], genres.load_genre_bins(handler.name))
+
+    async def test_get_genre_detail_from_cache(self):
+        """Tests get_genres with counts computed from the cache"""
+        collection = await genres.get_genres(
+            AsyncClient(FakeClient(GenreQuery(source="cache", limit=2)))
+        )
+        self.assertEqual(
+            [
+                Genre(content="Genre", name="rap", count=5),
+                Genre(content="Genre", name="hip hop", count=5),
+            ],
+            collection.items,
         )
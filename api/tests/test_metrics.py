@@ -0,0 +1,153 @@
+"""Test Suite for the runtime metrics"""
+
+from threading import Thread
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import MagicMock
+
+from dependencies.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    MONGO_CACHE_LOOKUPS,
+    SPOTIFY_ERRORS,
+    SPOTIFY_REQUEST_DURATION,
+    Metrics,
+    MetricsMiddleware,
+    format_labels,
+)
+from dependencies.registry import ClientRegistry
+from dependencies.spotify import Client
+from models.artist import ArtistQuery
+from routes.metrics import get_metrics
+
+from .client_fixture import FakeClient
+
+
+class MetricsTest(TestCase):
+    """Unit tests for recording and rendering metrics"""
+
+    def test_counters_merged_across_threads(self):
+        """Tests that counts recorded by several threads are summed at scrape time"""
+        metrics = Metrics()
+
+        def record():
+            for _ in range(1000):
+                metrics.inc(SPOTIFY_ERRORS, method="artist")
+
+        threads = [Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counters, _ = metrics.collect()
+        self.assertEqual(4000, counters[(SPOTIFY_ERRORS, (("method", "artist"),))])
+        self.assertIn('datafy_spotify_errors_total{method="artist"} 4000', metrics.render())
+
+    def test_histogram(self):
+        """Tests that histogram buckets are rendered cumulatively"""
+        metrics = Metrics(buckets=(0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            metrics.observe(SPOTIFY_REQUEST_DURATION, value, method="track")
+
+        rendered = metrics.render()
+        name = SPOTIFY_REQUEST_DURATION
+        for line in [
+            f'{name}_bucket{{method="track",le="0.1"}} 2',
+            f'{name}_bucket{{method="track",le="1"}} 3',
+            f'{name}_bucket{{method="track",le="+Inf"}} 4',
+            f'{name}_sum{{method="track"}} 2.65',
+            f'{name}_count{{method="track"}} 4',
+        ]:
+            self.assertIn(line, rendered)
+
+    def test_format_labels(self):
+        """Tests that label values are escaped"""
+        self.assertEqual("", format_labels(()))
+        self.assertEqual('{route="a\\"b\\\\c\\nd"}', format_labels((("route", 'a"b\\c\nd'),)))
+
+    def test_client_metrics(self):
+        """Tests that the client records cache lookups and spotify calls"""
+        metrics = Metrics()
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        spotify = MagicMock()
+        spotify.artist.return_value = artist
+        spotify.track.side_effect = RuntimeError("upstream failure")
+        client = Client(ArtistQuery(), spotify, MagicMock(), metrics=metrics)
+        client.artists_collection.find_one.return_value = None
+        client.songs_collection.find_one.return_value = None
+
+        client.get_artist_from_spotify("ABC123")
+        with self.assertRaises(RuntimeError):
+            client.get_song_from_spotify("ABC123")
+
+        counters, histograms = metrics.collect()
+        self.assertEqual(
+            1,
+            counters[(MONGO_CACHE_LOOKUPS, (("entity", "artist"), ("result", "miss")))],
+        )
+        self.assertEqual(1, counters[(SPOTIFY_ERRORS, (("method", "track"),))])
+        self.assertEqual(1, histograms[(SPOTIFY_REQUEST_DURATION, (("method", "artist"),))][-1])
+
+
+class MetricsMiddlewareTest(IsolatedAsyncioTestCase):
+    """Unit tests for the request metrics middleware"""
+
+    async def test_request_recorded_by_route(self):
+        """Tests that a request is timed under its route template"""
+        metrics = Metrics()
+        in_flight = []
+
+        async def app(scope, receive, send):
+            counters, _ = metrics.collect()
+            in_flight.append(counters[(HTTP_REQUESTS_IN_FLIGHT, ())])
+            scope["route"] = MagicMock(path="/artists/{artist_id}")
+            await send({"type": "http.response.start", "status": 200})
+            await send({"type": "http.response.body", "body": b""})
+
+        send = MagicMock()
+
+        async def record(message):
+            send(message)
+
+        middleware = MetricsMiddleware(app, metrics)
+        await middleware({"type": "http", "method": "GET"}, None, record)
+
+        counters, histograms = metrics.collect()
+        self.assertEqual([1], in_flight)
+        self.assertEqual(0, counters[(HTTP_REQUESTS_IN_FLIGHT, ())])
+        labels = (
+            ("method", "GET"),
+            ("route", "/artists/{artist_id}"),
+            ("status", "200"),
+        )
+        self.assertEqual(1, histograms[(HTTP_REQUEST_DURATION, labels)][-1])
+        self.assertEqual(2, send.call_count)
+
+
+class MetricsRouteTest(IsolatedAsyncioTestCase):
+    """Unit tests for the `/metrics` route"""
+
+    async def test_registry_counters_scraped(self):
+        """Tests that the cache and coalescing counters are read at scrape time"""
+        registry = ClientRegistry(MagicMock(), MagicMock())
+        registry.artist_cache.set("ABC123", {"id": "ABC123"})
+        registry.artist_cache.get("ABC123")
+        registry.song_cache.get("DEF456")
+        registry.flight.do("key", lambda: None)
+
+        body = (await get_metrics(registry)).body.decode()
+
+        for line in [
+            'datafy_cache_events_total{cache="artist",event="hits"} 1',
+            'datafy_cache_events_total{cache="song",event="misses"} 1',
+            'datafy_cache_events_total{cache="response",event="stale_hits"} 0',
+            'datafy_cache_entries{cache="artist"} 1',
+            'datafy_cache_entries{cache="page"} 0',
+            "datafy_single_flight_calls_total 1",
+            "datafy_single_flight_collapsed_total 0",
+        ]:
+            self.assertIn(line, body)
+
+        registry.song_cache.get("DEF456")
+        body = (await get_metrics(registry)).body.decode()
+        self.assertIn('datafy_cache_events_total{cache="song",event="misses"} 2', body)
@@ -0,0 +1,153 @@
+"""Test Suite for the local recommendation engine"""
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from dependencies import recommender
+from dependencies.recommender import (
+    FEATURES,
+    ClusterIndex,
+    LocalRecommender,
+    TrackCatalog,
+    catalog_fingerprint,
+    load_catalog,
+    normalize,
+)
+
+
+def build_catalog(features) -> TrackCatalog:
+    """Builds a catalog with one track per row of features, by artists a and b"""
+    return TrackCatalog(
+        ids=[f"track{index}" for index in range(len(features))],
+        names=[f"Song {index}" for index in range(len(features))],
+        artist_ids=["a" if index % 2 == 0 else "b" for index in range(len(features))],
+        artist_names=["A" if index % 2 == 0 else "B" for index in range(len(features))],
+        features=np.array(features, dtype=np.float64),
+    )
+
+
+class NormalizeTest(TestCase):
+    """Unit tests for `normalize`"""
+
+    def test_rows_are_unit_vectors(self):
+        """Tests that features are standardized and every track has unit length"""
+        vectors = normalize(np.array([[0.1, 120.0], [0.9, 80.0], [0.6, 90.0]]))
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-6)
+
+    def test_constant_feature(self):
+        """Tests that a feature shared by every track does not divide by zero"""
+        vectors = normalize(np.array([[1.0, 0.2], [1.0, 0.8]]))
+        self.assertFalse(np.isnan(vectors).any())
+
+
+class LocalRecommenderTest(TestCase):
+    """Unit tests for `LocalRecommender`"""
+
+    def setUp(self):
+        # tracks 0-2 are close to each other, tracks 3-5 are far from them
+        self.catalog = build_catalog(
+            [
+                [0.9, 0.9, 0.1],
+                [0.8, 0.9, 0.2],
+                [0.9, 0.8, 0.1],
+                [0.1, 0.1, 0.9],
+                [0.2, 0.1, 0.8],
+                [0.1, 0.2, 0.9],
+            ]
+        )
+        self.recommender = LocalRecommender(self.catalog)
+
+    def test_recommend_similar_tracks(self):
+        """Tests that the most similar tracks come first and seeds are excluded"""
+        recommendations = self.recommender.recommend(["track0"], [], 2)
+
+        self.assertEqual({"track1", "track2"}, {item["id"] for item in recommendations})
+        self.assertEqual(
+            {"id": "b", "name": "B"},
+            next(item for item in recommendations if item["id"] == "track1")["artists"][0],
+        )
+
+    def test_recommend_ordered_by_similarity(self):
+        """Tests that recommendations are sorted by descending similarity"""
+        recommendations = self.recommender.recommend(["track3"], [], 5)
+        vectors = self.recommender.vectors
+        scores = [
+            float(vectors[self.recommender.positions[item["id"]]] @ vectors[3])
+            for item in recommendations
+        ]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+        self.assertEqual(5, len(recommendations))
+
+    def test_recommend_from_artist(self):
+        """Tests that every stored track of a seed artist is used as a seed"""
+        recommendations = self.recommender.recommend([], ["a"], 10)
+        self.assertEqual({"track1", "track3", "track5"}, {item["id"] for item in recommendations})
+
+    def test_unknown_seeds(self):
+        """Tests that seeds missing from the catalog are rejected"""
+        with self.assertRaises(ValueError):
+            self.recommender.recommend(["missing"], ["nobody"], 5)
+
+
+class ClusterIndexTest(TestCase):
+    """Unit tests for `ClusterIndex`"""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.catalog = build_catalog(rng.random((400, len(FEATURES))))
+
+    def test_index_finds_nearest_tracks(self):
+        """Tests that probing every cluster gives the same results as a full scan"""
+        exact = LocalRecommender(self.catalog)
+        vectors = exact.vectors
+        index = ClusterIndex.build(vectors, catalog_fingerprint(self.catalog))
+        indexed = LocalRecommender(self.catalog, index, probes=len(index.centroids))
+
+        self.assertEqual(exact.recommend(["track7"], [], 10), indexed.recommend(["track7"], [], 10))
+
+    def test_index_is_persisted(self):
+        """Tests that a saved index is reused for the same catalog only"""
+        with TemporaryDirectory() as directory:
+            path = join(directory, "index.npz")
+            first = LocalRecommender.from_catalog(self.catalog, path, ann_min_tracks=1)
+
+            with patch.object(ClusterIndex, "build") as build:
+                second = LocalRecommender.from_catalog(self.catalog, path, ann_min_tracks=1)
+                build.assert_not_called()
+            np.testing.assert_array_equal(first.index.assignments, second.index.assignments)
+
+            changed = self.catalog._replace(features=self.catalog.features * 2)
+            self.assertIsNone(ClusterIndex.load(path, catalog_fingerprint(changed)))
+
+    def test_small_catalog_not_indexed(self):
+        """Tests that catalogs below the threshold are scanned in full"""
+        recommender_ = LocalRecommender.from_catalog(
+            self.catalog, "unused.npz", ann_min_tracks=1000
+        )
+        self.assertIsNone(recommender_.index)
+
+
+class LoadCatalogTest(TestCase):
+    """Unit tests for `load_catalog`"""
+
+    def test_load_catalog(self):
+        """Tests that rows of the track table are read into a feature matrix"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            ("track1", "Song 1", "artist1", "Artist 1", *[0.5] * len(FEATURES)),
+        ]
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        psycopg2 = MagicMock(connect=MagicMock(return_value=connection))
+
+        with patch.dict("sys.modules", {"psycopg2": psycopg2}):
+            catalog = load_catalog("postgresql://db/datafy")
+
+        psycopg2.connect.assert_called_once_with("postgresql://db/datafy")
+        cursor.execute.assert_called_once_with(recommender.CATALOG_QUERY)
+        connection.close.assert_called_once()
+        self.assertEqual(["track1"], catalog.ids)
+        self.assertEqual((1, len(FEATURES)), catalog.features.shape)
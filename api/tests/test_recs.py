@@ -1,7 +1,10 @@
 """Test Suite for the `/recs` route"""
 
-from unittest import TestCase
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
 
+from dependencies.spotify import AsyncClient
+from fastapi import HTTPException
 from models.collection import Collection
 from models.rec import Rec, RecQuery
 from routes import recs
@@ -9,10 +12,10 @@ from routes import recs
 from .client_fixture import FakeClient
 
 
-class RecsTest(TestCase):
+class RecsTest(IsolatedAsyncioTestCase):
     """Unit Tests for the `/recs` route"""
 
-    def test_get_recs(self):
+    async def test_get_recs(self):
         """Test get_recs as expected"""
         self.assertEqual(
             Collection(
@@ -37,5 +40,57 @@ class RecsTest(TestCase):
                 item_headers=["Song", "Artist"],
                 count=3,
             ),
-            recs.get_recs(FakeClient(RecQuery())),
+            await recs.get_recs(AsyncClient(FakeClient(RecQuery()))),
         )
+
+    async def test_get_local_recs(self):
+        """Test get_local_recs builds recs from the local recommender"""
+        recommender = MagicMock()
+        recommender.recommend.return_value = [
+            {"id": "track2", "name": "Flex", "artists": [{"name": "Playboi Carti"}]}
+        ]
+        registry = MagicMock(local_recommender=MagicMock(return_value=recommender))
+        query = RecQuery(seed_tracks="track1", limit=1, source="local")
+
+        result = await recs.get_local_recs(query, registry, AsyncClient(FakeClient(query)))
+
+        recommender.recommend.assert_called_once_with(["track1"], [], 1)
+        self.assertEqual(
+            [Rec(content="Recommendation", song="Flex", artists=["Playboi Carti"])],
+            result.items,
+        )
+
+    async def test_get_local_recs_unknown_seeds(self):
+        """Test get_local_recs answers 404 when no seed is stored locally"""
+        recommender = MagicMock()
+        recommender.recommend.side_effect = ValueError("no seeds")
+        registry = MagicMock(local_recommender=MagicMock(return_value=recommender))
+        query = RecQuery(seed_tracks="missing", source="local")
+
+        with self.assertRaises(HTTPException) as raised:
+            await recs.get_local_recs(query, registry, AsyncClient(FakeClient(query)))
+        self.assertEqual(404, raised.exception.status_code)
+
+    async def test_get_local_recs_genres(self):
+        """Test get_local_recs answers 422 when seed genres are given"""
+        registry = MagicMock()
+        query = RecQuery(seed_tracks="track1", seed_genres="rap", source="local")
+
+        with self.assertRaises(HTTPException) as raised:
+            await recs.get_local_recs(query, registry, AsyncClient(FakeClient(query)))
+        self.assertEqual(422, raised.exception.status_code)
+        registry.local_recommender.assert_not_called()
+
+    async def test_get_local_recs_missing_dependency(self):
+        """Test get_local_recs answers 501 when numpy or psycopg2 is missing"""
+        registry = MagicMock(
+            local_recommender=MagicMock(
+                side_effect=ModuleNotFoundError("No module named 'numpy'", name="numpy")
+            )
+        )
+        query = RecQuery(seed_tracks="track1", source="local")
+
+        with self.assertRaises(HTTPException) as raised:
+            await recs.get_local_recs(query, registry, AsyncClient(FakeClient(query)))
+        self.assertEqual(501, raised.exception.status_code)
+        self.assertIn("numpy", raised.exception.detail)
@@ -0,0 +1,34 @@
+"""Test Suite for the shared client registry"""
+
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from dependencies.registry import ClientRegistry, build_session
+from models.common import Query
+
+
+class RegistryTest(TestCase):
+    """Unit tests for the client registry"""
+
+    def test_clients_are_shared(self):
+        """Tests that every request-scoped `Client` reuses the same upstream clients"""
+        registry = ClientRegistry.from_env("mongodb://localhost:27017")
+        first, second = registry.client(Query()), registry.client(Query())
+
+        self.assertIs(first.client, second.client)
+        self.assertIs(first.db_client, second.db_client)
+        registry.close()
+
+    def test_session_pool_size(self):
+        """Tests that the Spotify session keeps the configured number of connections"""
+        adapter = build_session(4).get_adapter("https://api.spotify.com")
+        self.assertEqual(4, adapter._pool_maxsize)  # pylint: disable=protected-access
+
+    def test_local_recommender_loaded_once(self):
+        """Tests that the local recommender is loaded on first use, then reused"""
+        loader = MagicMock()
+        registry = ClientRegistry(MagicMock(), MagicMock(), recommender_loader=loader)
+
+        self.assertIs(loader.return_value, registry.local_recommender())
+        self.assertIs(loader.return_value, registry.local_recommender())
+        loader.assert_called_once()
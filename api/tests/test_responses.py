@@ -0,0 +1,302 @@
+"""Test Suite for the route response classes"""
+
+from json import loads
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from fastapi import Request
+from models.artist import Artist
+from models.collection import Collection
+from models.song import Song
+from routes import responses
+from routes.responses import (
+    ARROW_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    ModelResponse,
+    NDJSONResponse,
+    collection_response,
+    etag_matches,
+    iter_ndjson,
+    negotiate,
+    render_collection,
+)
+
+
+class ModelResponseTest(TestCase):
+    """Unit Tests for `ModelResponse`"""
+
+    def setUp(self):
+        self.collection = Collection.from_list(
+            [
+                Song(
+                    content="Song",
+                    id="song1",
+                    name="Señorita",
+                    artists=["Artist 1", "Artist 2"],
+                    popularity=80,
+                    album="Album",
+                    release_date="2021-01-01",
+                )
+            ]
+        )
+
+    def test_render_matches_model_dict(self):
+        """Test the rendered body is the JSON document of the model's fields"""
+        response = ModelResponse(self.collection)
+        self.assertEqual(loads(response.body), self.collection.dict())
+        self.assertEqual(response.media_type, "application/json")
+
+    def test_render_without_orjson(self):
+        """Test the stdlib fallback renders the same document"""
+        expected = ModelResponse(self.collection).body
+        with patch.object(responses, "orjson_dumps", None):
+            self.assertEqual(ModelResponse(self.collection).body, expected)
+
+    def test_render_unsupported_type(self):
+        """Test objects that are not models are rejected"""
+        with patch.object(responses, "orjson_dumps", None):
+            with self.assertRaises(TypeError):
+                ModelResponse({"value": object()})
+
+
+class NDJSONResponseTest(IsolatedAsyncioTestCase):
+    """Unit Tests for the NDJSON collection responses"""
+
+    def setUp(self):
+        self.collection = Collection.from_list(
+            [
+                Song(
+                    content="Song",
+                    id=f"song{index}",
+                    name=f"Song {index}",
+                    artists=["Artist"],
+                    popularity=index,
+                    album="Album",
+                    release_date="2021-01-01",
+                )
+                for index in range(3)
+            ]
+        )
+
+    async def test_iter_ndjson(self):
+        """Test a header record is sent first, then one record per item"""
+        lines = [line async for line in iter_ndjson(self.collection)]
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.endswith(b"\n") for line in lines))
+        self.assertEqual(
+            loads(lines[0]),
+            {
+                "item_type": "Song",
+                "item_headers": self.collection.item_headers,
+                "count": 3,
+            },
+        )
+        self.assertEqual(
+            [loads(line) for line in lines[1:]],
+            [item.dict() for item in self.collection.items],
+        )
+
+    def test_collection_response(self):
+        """Test the response format follows the Accept header"""
+        cases = [
+            ("", ModelResponse),
+            ("application/json", ModelResponse),
+            ("application/x-ndjson", NDJSONResponse),
+            ("application/json;q=0.5, application/x-ndjson", NDJSONResponse),
+            ("application/x-ndjson; q=1.0", NDJSONResponse),
+        ]
+        for accept, response_type in cases:
+            with self.subTest(accept=accept):
+                request = Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+                response = collection_response(request, self.collection)
+                self.assertIsInstance(response, response_type)
+
+        request = Request({"type": "http", "headers": [(b"accept", b"application/x-ndjson")]})
+        self.assertEqual(
+            collection_response(request, self.collection).media_type,
+            "application/x-ndjson",
+        )
+
+
+class BinaryFormatTest(TestCase):
+    """Unit Tests for the MessagePack and Arrow collection responses"""
+
+    def setUp(self):
+        self.collection = Collection.from_list(
+            [
+                Artist(
+                    content="Artist",
+                    id=f"artist{index}",
+                    name=f"Artist {index}",
+                    popularity=90 - index,
+                    followers=1000 * index,
+                    genres=["rap", "pop"][: index + 1],
+                )
+                for index in range(2)
+            ]
+        )
+
+    @staticmethod
+    def request(accept: str) -> Request:
+        """Builds a request with the given Accept header"""
+        return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+    def test_negotiate(self):
+        """Test formats, JSON included, are picked by quality, and JSON otherwise"""
+        cases = [
+            ("", "application/json"),
+            ("*/*", "application/json"),
+            ("text/html", "application/json"),
+            ("application/json", "application/json"),
+            ("application/json, application/msgpack;q=0.1", "application/json"),
+            ("application/json;q=0.1, application/msgpack", MSGPACK_MEDIA_TYPE),
+            ("application/json, application/msgpack", "application/json"),
+            ("application/msgpack, application/json", MSGPACK_MEDIA_TYPE),
+            ("*/*, application/msgpack", MSGPACK_MEDIA_TYPE),
+            ("application/msgpack;q=0.5, */*", "application/json"),
+            ("application/msgpack", MSGPACK_MEDIA_TYPE),
+            ("application/x-msgpack", MSGPACK_MEDIA_TYPE),
+            (ARROW_MEDIA_TYPE, ARROW_MEDIA_TYPE),
+            (f"application/msgpack;q=0.5, {ARROW_MEDIA_TYPE}", ARROW_MEDIA_TYPE),
+            (f"application/msgpack, {ARROW_MEDIA_TYPE};q=0.1", MSGPACK_MEDIA_TYPE),
+            ("application/json, application/msgpack;q=0", "application/json"),
+        ]
+        for accept, media_type in cases:
+            with self.subTest(accept=accept):
+                self.assertEqual(negotiate(self.request(accept)), media_type)
+
+    def test_missing_package_falls_back_to_json(self):
+        """Test a format whose package is not installed is passed over"""
+        with patch.object(responses, "installed", return_value=False):
+            response = collection_response(self.request(ARROW_MEDIA_TYPE), self.collection)
+        self.assertIsInstance(response, ModelResponse)
+
+    def test_msgpack(self):
+        """Test the MessagePack body holds the same document as the JSON one"""
+        # pylint: disable=import-outside-toplevel
+        from msgpack import unpackb
+
+        response = collection_response(self.request("application/msgpack"), self.collection)
+        self.assertEqual(response.media_type, MSGPACK_MEDIA_TYPE)
+        self.assertEqual(unpackb(response.body), self.collection.dict())
+        self.assertIn("etag", response.headers)
+
+    def test_arrow(self):
+        """Test the Arrow stream has a typed column per item header"""
+        # pylint: disable=import-outside-toplevel
+        import pyarrow as pa
+
+        response = collection_response(self.request(ARROW_MEDIA_TYPE), self.collection)
+        self.assertEqual(response.media_type, ARROW_MEDIA_TYPE)
+
+        table = pa.ipc.open_stream(response.body).read_all()
+        self.assertEqual(table.schema.names, self.collection.item_headers)
+        self.assertEqual(table.schema.field("Genres").type, pa.list_(pa.string()))
+        self.assertEqual(table.schema.field("Followers").type, pa.int64())
+        self.assertEqual(table.schema.metadata, {b"item_type": b"Artist"})
+        self.assertEqual(
+            table.to_pylist()[1],
+            {
+                "Rank": 2,
+                "Artist": "Artist 1",
+                "Popularity": 89,
+                "Followers": 1000,
+                "Genres": ["rap", "pop"],
+                "ID": "artist1",
+            },
+        )
+
+    def test_formats_tagged_separately(self):
+        """Test each format is rendered once and gets its own ETag"""
+        etags = {
+            media_type: render_collection(self.collection, media_type)[1]
+            for media_type in ("application/json", MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE)
+        }
+        self.assertEqual(len(set(etags.values())), 3)
+        with patch.object(responses, "dumps_arrow") as dumps_arrow:
+            render_collection(self.collection, ARROW_MEDIA_TYPE)
+        dumps_arrow.assert_not_called()
+
+
+class ConditionalGetTest(TestCase):
+    """Unit Tests for ETags and conditional GETs on collection responses"""
+
+    def setUp(self):
+        self.collection = Collection.from_list(
+            [
+                Song(
+                    content="Song",
+                    id="song1",
+                    name="Song 1",
+                    artists=["Artist"],
+                    popularity=50,
+                    album="Album",
+                    release_date="2021-01-01",
+                )
+            ]
+        )
+
+    @staticmethod
+    def request(*headers: tuple) -> Request:
+        """Builds a request with the given headers"""
+        return Request(
+            {
+                "type": "http",
+                "headers": [(name.encode(), value.encode()) for name, value in headers],
+            }
+        )
+
+    def test_etag_is_stable(self):
+        """Test equal collections get the same ETag and different ones do not"""
+        _, etag = render_collection(self.collection)
+        self.assertEqual(render_collection(self.collection.copy())[1], etag)
+
+        changed = self.collection.copy(update={"count": 2})
+        self.assertNotEqual(render_collection(changed)[1], etag)
+
+    def test_render_is_kept(self):
+        """Test a collection is serialized once however often it is sent"""
+        with patch.object(responses, "dumps", wraps=responses.dumps) as dumps:
+            first = collection_response(self.request(), self.collection)
+            second = collection_response(self.request(), self.collection)
+
+        dumps.assert_called_once()
+        self.assertEqual(first.body, second.body)
+        self.assertEqual(loads(first.body), self.collection.dict())
+
+    def test_not_modified(self):
+        """Test a request holding the current ETag gets an empty 304"""
+        response = collection_response(self.request(), self.collection)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], "private, no-cache")
+        etag = response.headers["etag"]
+
+        response = collection_response(self.request(("if-none-match", etag)), self.collection)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(response.headers["etag"], etag)
+
+        response = collection_response(self.request(("if-none-match", '"stale"')), self.collection)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_matches(self):
+        """Test the If-None-Match forms that match an ETag"""
+        cases = [
+            ('"abc"', True),
+            ('W/"abc"', True),
+            ('"old", "abc"', True),
+            ("*", True),
+            ('"old"', False),
+            (None, False),
+        ]
+        for if_none_match, matches in cases:
+            with self.subTest(if_none_match=if_none_match):
+                headers = [] if if_none_match is None else [("if-none-match", if_none_match)]
+                self.assertEqual(etag_matches(self.request(*headers), '"abc"'), matches)
+
+    def test_ndjson_not_tagged(self):
+        """Test NDJSON responses carry no ETag"""
+        response = collection_response(
+            self.request(("accept", "application/x-ndjson")), self.collection
+        )
+        self.assertNotIn("etag", response.headers)
@@ -0,0 +1,189 @@
+"""Test Suite for the spotify call scheduler"""
+
+from threading import Thread
+from time import sleep
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from dependencies.metrics import SPOTIFY_THROTTLED, Metrics
+from dependencies.scheduler import (
+    DEFAULT_RETRY_AFTER,
+    Priority,
+    Scheduler,
+    TokenBucket,
+    call_priority,
+    parse_retry_after,
+    user_budget,
+)
+from spotipy.exceptions import SpotifyException
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TokenBucketTest(TestCase):
+    """Unit tests for `TokenBucket`"""
+
+    def test_burst_then_rate(self):
+        """Tests that a burst is allowed, then calls are spaced out at the rate"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        for _ in range(3):
+            self.assertEqual(0, bucket.delay())
+            bucket.take()
+
+        self.assertAlmostEqual(0.5, bucket.delay())
+        clock.now += 0.5
+        self.assertEqual(0, bucket.delay())
+
+    def test_pause(self):
+        """Tests that a paused bucket hands out nothing until the pause is over"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        bucket.pause(5)
+
+        self.assertAlmostEqual(5, bucket.delay())
+        clock.now += 5
+        self.assertAlmostEqual(0.5, bucket.delay())
+
+    def test_unlimited(self):
+        """Tests that a bucket with a rate of 0 never runs out"""
+        bucket = TokenBucket(rate=0, burst=0)
+        for _ in range(100):
+            bucket.take()
+        self.assertEqual(0, bucket.delay())
+
+
+class ParseRetryAfterTest(TestCase):
+    """Unit tests for `parse_retry_after`"""
+
+    def test_parse_retry_after(self):
+        """Tests seconds, dates and missing or invalid values"""
+        self.assertEqual(3, parse_retry_after({"Retry-After": "3"}))
+        self.assertEqual(2, parse_retry_after({"retry-after": "2"}))
+        self.assertEqual(0, parse_retry_after({"Retry-After": "-1"}))
+        self.assertEqual(0, parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+        self.assertEqual(DEFAULT_RETRY_AFTER, parse_retry_after({}))
+        self.assertEqual(DEFAULT_RETRY_AFTER, parse_retry_after(None))
+        self.assertEqual(DEFAULT_RETRY_AFTER, parse_retry_after({"Retry-After": "?"}))
+
+
+class SchedulerTest(TestCase):
+    """Unit tests for `Scheduler`"""
+
+    def test_retry_after_429(self):
+        """Tests that a 429 pauses the budget for its Retry-After, then retries"""
+        metrics = Metrics()
+        scheduler = Scheduler(0, 0, metrics=metrics)
+        func = MagicMock(
+            side_effect=[
+                SpotifyException(429, -1, "slow down", headers={"Retry-After": "0.05"}),
+                "ok",
+            ]
+        )
+
+        self.assertEqual("ok", scheduler.run(func))
+        self.assertEqual(2, func.call_count)
+        self.assertEqual({"budgets": 1, "queued": 0, "throttled": 1}, scheduler.stats())
+        counters, _ = metrics.collect()
+        self.assertEqual(1, counters[(SPOTIFY_THROTTLED, (("budget", "app"),))])
+
+    def test_gives_up_after_max_retries(self):
+        """Tests that a call still rejected after `max_retries` raises"""
+        scheduler = Scheduler(0, 0, max_retries=1, metrics=Metrics())
+        func = MagicMock(side_effect=SpotifyException(429, -1, "", headers={"Retry-After": "0"}))
+
+        with self.assertRaises(SpotifyException):
+            scheduler.run(func)
+        self.assertEqual(2, func.call_count)
+
+    def test_other_errors_not_retried(self):
+        """Tests that errors other than a 429 are raised straight away"""
+        scheduler = Scheduler(0, 0, metrics=Metrics())
+        func = MagicMock(side_effect=SpotifyException(404, -1, "not found"))
+
+        with self.assertRaises(SpotifyException):
+            scheduler.run(func)
+        func.assert_called_once()
+
+    def test_interactive_ahead_of_background(self):
+        """Tests that queued interactive calls are let through before background ones"""
+        scheduler = Scheduler(0, 0, metrics=Metrics())
+        scheduler.pause("app", 0.2)
+        order = []
+
+        def queue(name: str, priority: Priority):
+            thread = Thread(
+                target=scheduler.run,
+                args=(lambda: order.append(name), "app", priority),
+            )
+            thread.start()
+            sleep(0.02)
+            return thread
+
+        threads = [
+            queue("background", Priority.BACKGROUND),
+            queue("interactive 1", Priority.INTERACTIVE),
+            queue("interactive 2", Priority.INTERACTIVE),
+        ]
+        self.assertEqual(3, scheduler.stats()["queued"])
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["interactive 1", "interactive 2", "background"], order)
+
+    def test_budgets_are_independent(self):
+        """Tests that pausing one budget does not hold up another"""
+        scheduler = Scheduler(0, 0, metrics=Metrics())
+        scheduler.pause("user", 10)
+
+        self.assertEqual("ok", scheduler.run(lambda: "ok", "app"))
+
+    def test_user_budgets(self):
+        """Tests that each user's calls are charged to a budget of their own, and
+        that a throttled user budget is counted without the user ID"""
+        self.assertEqual("app", user_budget(None))
+        self.assertNotEqual(user_budget("alice"), user_budget("bob"))
+
+        metrics = Metrics()
+        scheduler = Scheduler(0, 0, max_retries=0, metrics=metrics)
+        with self.assertRaises(SpotifyException):
+            scheduler.run(
+                MagicMock(side_effect=SpotifyException(429, -1, "slow down")),
+                user_budget("alice"),
+            )
+        counters, _ = metrics.collect()
+        self.assertEqual(1, counters[(SPOTIFY_THROTTLED, (("budget", "user"),))])
+
+    def test_idle_budgets_pruned(self):
+        """Tests that the budgets of users with no recent calls are dropped once
+        the held budgets double, and those still limited or paused are kept"""
+        clock = FakeClock()
+        scheduler = Scheduler(10, 1, metrics=Metrics(), clock=clock)
+        scheduler.pause(user_budget("paused"), 60)
+        for index in range(63):
+            scheduler.run(lambda: None, user_budget(f"user{index}"))
+        self.assertEqual(64, scheduler.stats()["budgets"])
+
+        clock.now += 1
+        scheduler.run(lambda: None, user_budget("busy"))
+        self.assertEqual(2, scheduler.stats()["budgets"])
+
+    def test_priority_from_context(self):
+        """Tests that the priority defaults to that of the calling context"""
+        self.assertEqual(Priority.INTERACTIVE, call_priority.get())
+        token = call_priority.set(Priority.BACKGROUND)
+        try:
+            scheduler = Scheduler(0, 0, metrics=Metrics())
+            scheduler.acquire = MagicMock(return_value=0.0)
+            scheduler.run(lambda: None)
+            scheduler.acquire.assert_called_once_with("app", Priority.BACKGROUND)
+        finally:
+            call_priority.reset(token)
@@ -0,0 +1,44 @@
+"""Test Suite for upstream call coalescing"""
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+from unittest import TestCase
+
+from dependencies.singleflight import SingleFlight
+
+
+class SingleFlightTest(TestCase):
+    """Unit tests for `SingleFlight`"""
+
+    def test_concurrent_calls_collapsed(self):
+        """Tests that concurrent calls with the same key share one execution"""
+        flight, release, calls = SingleFlight(), Event(), []
+
+        def upstream() -> str:
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(flight.do, "key", upstream) for _ in range(4)]
+            while flight.stats()["collapsed"] < 3:
+                sleep(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(["result"] * 4, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual({"calls": 1, "collapsed": 3}, flight.stats())
+
+    def test_errors_shared_and_key_released(self):
+        """Tests that an error reaches the caller and the key can be called again"""
+        flight = SingleFlight()
+
+        def failing() -> str:
+            raise ValueError("upstream failed")
+
+        with self.assertRaises(ValueError):
+            flight.do("key", failing)
+        self.assertEqual("ok", flight.do("key", lambda: "ok"))
+        self.assertEqual(2, flight.stats()["calls"])
@@ -1,7 +1,8 @@
 """Test Suite for the `/songs` route"""
 
-from unittest import TestCase
+from unittest import IsolatedAsyncioTestCase
 
+from dependencies.spotify import AsyncClient
 from models.collection import Collection
 from models.song import Song, SongQuery
 from routes import songs
@@ -9,10 +10,10 @@ from routes import songs
 from .client_fixture import FakeClient
 
 
-class SongsTest(TestCase):
+class SongsTest(IsolatedAsyncioTestCase):
     """Unit tests for songs logic"""
 
-    def test_get_songs(self):
+    async def test_get_songs(self):
         """Tests that `get_songs` parses objects into a list of `Song` models"""
         self.assertEqual(
             Collection(
@@ -49,10 +50,19 @@ class SongsTest(TestCase):
                 ],
                 count=2,
             ),
-            songs.get_songs(FakeClient(SongQuery())),
+            await songs.get_songs(AsyncClient(FakeClient(SongQuery()))),
         )
 
-    def test_get_song(self):
+    async def test_get_several_songs(self):
+        """Tests that `get_several_songs` returns the requested songs in order"""
+        collection = await songs.get_several_songs(
+            ["DEF456", "ABC123"], AsyncClient(FakeClient(SongQuery()))
+        )
+
+        self.assertEqual(["DEF456", "ABC123"], [item.id for item in collection.items])
+        self.assertEqual(2, collection.count)
+
+    async def test_get_song(self):
         """Tests that `get_song_from_spotify` retrieves a single song from the client"""
         self.assertEqual(
             Song(
@@ -65,5 +75,5 @@ class SongsTest(TestCase):
                 release_date="1987-09-07",
                 other_field="not_parsed",
             ),
-            songs.get_song("ABC123", FakeClient(SongQuery())),
+            await songs.get_song("ABC123", AsyncClient(FakeClient(SongQuery()))),
         )
@@ -0,0 +1,54 @@
+"""Test Suite for the side effects of importing and starting the app"""
+
+from json import loads
+from os import chdir, getcwd
+from os.path import dirname
+from subprocess import run
+from sys import executable
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from models.collection import load_headers, load_item_config
+
+DEFERRED_MODULES = [
+    "msgpack",
+    "numpy",
+    "opentelemetry.sdk.trace",
+    "pyarrow",
+    "pymongo",
+    "spotipy",
+    "yaml",
+]
+
+
+class StartupTest(TestCase):
+    """Unit tests for a side-effect-free import of the app"""
+
+    def test_import_defers_heavy_modules(self):
+        """Tests that importing the app loads none of the modules it uses lazily"""
+        process = run(
+            [
+                executable,
+                "-c",
+                "import json, sys, main; "
+                f"print(json.dumps([m for m in {DEFERRED_MODULES!r} "
+                "if m in sys.modules]))",
+            ],
+            cwd=dirname(dirname(__file__)),
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+
+        self.assertEqual([], loads(process.stdout))
+
+    def test_headers_loaded_from_any_directory(self):
+        """Tests that the item headers are found wherever the app is started from"""
+        load_item_config.cache_clear()
+        cwd = getcwd()
+        with TemporaryDirectory() as directory:
+            chdir(directory)
+            try:
+                self.assertIn("artist", load_headers())
+            finally:
+                chdir(cwd)
@@ -0,0 +1,188 @@
+"""Test Suite for the in-memory spotify token manager"""
+
+from threading import Barrier, Event, Thread
+from time import sleep
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from dependencies.tokens import TokenManager
+from fastapi import HTTPException
+from spotipy.oauth2 import SpotifyOauthError
+
+
+def make_token(access_token: str, expires_at: float):
+    return {
+        "access_token": access_token,
+        "refresh_token": "refresh",
+        "expires_at": expires_at,
+    }
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TokenManagerTest(TestCase):
+    """Unit tests for the token manager"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.oauth = MagicMock()
+        self.oauth.cache_handler.get_cached_token.return_value = make_token(
+            "cached", self.clock.now + 3600
+        )
+        self.oauth.validate_token.side_effect = lambda token: token
+        self.tokens = TokenManager(
+            self.oauth, refresh_margin=300, retry_interval=30, clock=self.clock
+        )
+
+    def tearDown(self):
+        self.tokens.close()
+
+    def test_token_served_from_memory(self):
+        """Tests that the cache file is read once and the token then kept in memory"""
+        for _ in range(5):
+            self.assertEqual("cached", self.tokens.get_access_token())
+
+        self.oauth.cache_handler.get_cached_token.assert_called_once()
+        self.oauth.refresh_access_token.assert_not_called()
+        self.assertEqual(3600, self.tokens.stats()["expires_in"])
+
+    def test_token_as_dict(self):
+        """Tests that the whole token info is returned when asked for"""
+        token = self.tokens.get_access_token(as_dict=True)
+        self.assertEqual("refresh", token["refresh_token"])
+
+    def test_expired_token_refreshed_once(self):
+        """Tests that concurrent requests finding the token expired share a refresh"""
+        self.tokens.get_access_token()
+        self.clock.now += 3600
+
+        def refresh(_):
+            sleep(0.05)
+            return make_token("refreshed", self.clock.now + 3600)
+
+        self.oauth.refresh_access_token.side_effect = refresh
+        barrier = Barrier(8)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(self.tokens.get_access_token())
+
+        threads = [Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["refreshed"] * 8, results)
+        self.oauth.refresh_access_token.assert_called_once_with("refresh")
+        self.assertEqual(1, self.tokens.stats()["refreshes"])
+
+    def test_background_refresh(self):
+        """Tests that a background refresh replaces the token in memory"""
+        self.tokens.get_access_token()
+        self.oauth.refresh_access_token.return_value = make_token(
+            "refreshed", self.clock.now + 7200
+        )
+
+        self.tokens.refresh()
+
+        self.assertEqual("refreshed", self.tokens.get_access_token())
+        self.assertEqual(7200, self.tokens.stats()["expires_in"])
+
+    def test_failed_refresh_keeps_token(self):
+        """Tests that a failed background refresh keeps serving the current token"""
+        self.tokens.get_access_token()
+        self.oauth.refresh_access_token.side_effect = Exception("boom")
+
+        self.tokens.refresh()
+
+        self.assertEqual("cached", self.tokens.get_access_token())
+        self.assertEqual(1, self.tokens.stats()["failures"])
+
+    def test_refresh_scheduled_before_expiry(self):
+        """Tests that the refresh runs on its own `refresh_margin` before expiry"""
+        self.oauth.cache_handler.get_cached_token.return_value = make_token(
+            "cached", self.clock.now + 300.05
+        )
+        self.oauth.refresh_access_token.return_value = make_token(
+            "refreshed", self.clock.now + 3600
+        )
+
+        self.tokens.get_access_token()
+        sleep(0.3)
+
+        self.oauth.refresh_access_token.assert_called_once_with("refresh")
+        self.assertEqual("refreshed", self.tokens.get_access_token())
+
+    def test_token_loaded_through_oauth(self):
+        """Tests that the oauth flow runs when there is no usable cached token"""
+        self.oauth.validate_token.side_effect = None
+        self.oauth.validate_token.return_value = None
+        self.oauth.get_access_token.side_effect = lambda as_dict: None
+
+        self.assertEqual("cached", self.tokens.get_access_token())
+        self.oauth.get_access_token.assert_called_once_with(as_dict=False)
+
+    def test_missing_token_rejected(self):
+        """Tests that without `interactive`, a missing or revoked token is answered
+        with a 401 instead of starting the oauth flow"""
+        tokens = TokenManager(self.oauth, clock=self.clock, interactive=False)
+        self.oauth.validate_token.side_effect = None
+        self.oauth.validate_token.return_value = None
+
+        with self.assertRaises(HTTPException) as ctx:
+            tokens.get_access_token()
+        self.assertEqual(401, ctx.exception.status_code)
+
+        self.oauth.validate_token.side_effect = SpotifyOauthError("revoked")
+        with self.assertRaises(HTTPException) as ctx:
+            tokens.get_access_token()
+        self.assertEqual(401, ctx.exception.status_code)
+        self.oauth.get_access_token.assert_not_called()
+
+    def test_close_cancels_refresh(self):
+        """Tests that no refresh runs once the manager is closed"""
+        self.oauth.cache_handler.get_cached_token.return_value = make_token(
+            "cached", self.clock.now + 300.05
+        )
+        self.tokens.get_access_token()
+        self.tokens.close()
+        sleep(0.2)
+
+        self.oauth.refresh_access_token.assert_not_called()
+
+    def test_refresh_started_by_request(self):
+        """Tests that without a timer, a request finding the token due starts one
+        background refresh and is answered with the current token"""
+        tokens = TokenManager(self.oauth, refresh_margin=300, clock=self.clock, timer=False)
+        tokens.get_access_token()
+        started, release = Event(), Event()
+
+        def refresh(_):
+            started.set()
+            release.wait(1)
+            return make_token("refreshed", self.clock.now + 3600)
+
+        self.oauth.refresh_access_token.side_effect = refresh
+        self.clock.now += 3400
+
+        self.assertEqual("cached", tokens.get_access_token())
+        self.assertTrue(started.wait(1))
+        self.assertEqual("cached", tokens.get_access_token())
+        release.set()
+        for _ in range(100):
+            if tokens.get_access_token() == "refreshed":
+                break
+            sleep(0.01)
+
+        self.assertEqual("refreshed", tokens.get_access_token())
+        self.oauth.refresh_access_token.assert_called_once_with("refresh")
@@ -0,0 +1,115 @@
+"""Test Suite for the tracing pipeline"""
+
+from json import loads
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from dependencies import tracing
+from dependencies.spotify import Client
+from dependencies.tracing import RingBufferSpanExporter, build_exporter, build_tracing
+from models.artist import ArtistQuery
+from opentelemetry.trace import SpanKind
+
+from .client_fixture import FakeClient
+
+
+class TracingTest(TestCase):
+    """Unit tests for building the tracing pipeline"""
+
+    def test_memory_exporter(self):
+        """Tests that sampled spans are kept in the ring buffer"""
+        provider, exporter = build_tracing("memory", 1.0)
+        with provider.get_tracer(__name__).start_as_current_span("request"):
+            pass
+
+        self.assertIsInstance(exporter, RingBufferSpanExporter)
+        self.assertEqual(["request"], [s.name for s in exporter.get_finished_spans()])
+
+    def test_ring_buffer_bounded(self):
+        """Tests that the ring buffer keeps only the most recent spans"""
+        exporter = RingBufferSpanExporter(2)
+        exporter.export([MagicMock(name=str(index)) for index in range(3)])
+
+        self.assertEqual(2, len(exporter.get_finished_spans()))
+        exporter.clear()
+        self.assertEqual([], exporter.get_finished_spans())
+
+    def test_no_exporter_records_nothing(self):
+        """Tests that spans are not recorded when they are not exported"""
+        provider, exporter = build_tracing("none", 1.0)
+        with provider.get_tracer(__name__).start_as_current_span("request") as span:
+            self.assertFalse(span.is_recording())
+
+        self.assertIsNone(exporter)
+
+    def test_sample_ratio(self):
+        """Tests that a ratio of 0 drops every trace, children included"""
+        provider, exporter = build_tracing("memory", 0.0)
+        tracer = provider.get_tracer(__name__)
+        with tracer.start_as_current_span("request"):
+            with tracer.start_as_current_span("child"):
+                pass
+
+        self.assertEqual([], exporter.get_finished_spans())
+
+    def test_file_exporter(self):
+        """Tests that the file exporter writes one JSON document per span"""
+        with TemporaryDirectory() as directory:
+            file = path.join(directory, "spans.jsonl")
+            with patch.dict(tracing.tracing_settings, {"file": file}):
+                provider, _ = build_tracing("file", 1.0)
+            with provider.get_tracer(__name__).start_as_current_span("request"):
+                pass
+            provider.shutdown()
+
+            with open(file, encoding="utf-8") as handler:
+                lines = handler.read().splitlines()
+
+        self.assertEqual(1, len(lines))
+        self.assertEqual("request", loads(lines[0])["name"])
+
+    def test_unknown_exporter(self):
+        """Tests that an unknown exporter name is rejected"""
+        with self.assertRaises(ValueError):
+            build_exporter("console")
+
+
+class UpstreamSpanTest(TestCase):
+    """Unit tests for the spans around spotify and MongoDB calls"""
+
+    def setUp(self):
+        self.provider, self.exporter = build_tracing("memory", 1.0)
+        patcher = patch.object(tracing, "tracer", self.provider.get_tracer(tracing.__name__))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_artist_lookup_spans(self):
+        """Tests that each upstream call of a lookup gets its own child span"""
+        artist = FakeClient(None).get_artist_from_spotify("ABC123")
+        spotify = MagicMock()
+        spotify.artist.return_value = artist
+        client = Client(ArtistQuery(), spotify, MagicMock())
+        client.artists_collection.name = "artists"
+        client.artists_collection.find_one.return_value = None
+
+        tracer = self.provider.get_tracer(__name__)
+        with tracer.start_as_current_span("request") as request:
+            client.get_artist_from_spotify("ABC123")
+
+        spans = self.exporter.get_finished_spans()
+        self.assertEqual(
+            [
+                "mongodb find_one artists",
+                "spotify artist",
+                "mongodb update_one artists",
+                "request",
+            ],
+            [span.name for span in spans],
+        )
+        for span in spans[:-1]:
+            self.assertEqual(SpanKind.CLIENT, span.kind)
+            self.assertEqual(request.get_span_context().span_id, span.parent.span_id)
+        self.assertEqual("artists", spans[0].attributes["db.mongodb.collection"])
+        self.assertEqual("spotify", spans[1].attributes["peer.service"])
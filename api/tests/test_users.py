@@ -0,0 +1,215 @@
+"""Test Suite for the per-user spotify clients"""
+
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from dependencies.documents import rank_key
+from dependencies.registry import ClientRegistry
+from dependencies.user_clients import MongoCacheHandler, SharedSession
+from dependencies.users import (
+    UserPool,
+    get_user,
+    hash_api_key,
+    issue_api_key,
+    main,
+    revoke_api_key,
+)
+from fastapi import HTTPException
+from models.common import Query
+
+from .client_fixture import FakeClient
+
+
+class UserPoolTest(TestCase):
+    """Unit tests for the pool of per-user clients"""
+
+    def setUp(self):
+        self.session = SharedSession()
+        self.session.release = MagicMock()
+        self.pool = UserPool(MagicMock(), self.session, maxsize=2)
+
+    def test_client_reused(self):
+        """Tests that a user's requests share one client and one token"""
+        first, second = self.pool.spotify("alice"), self.pool.spotify("alice")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, self.pool.spotify("bob"))
+        self.assertEqual(1, self.pool.stats()["hits"])
+
+    def test_least_recent_user_evicted(self):
+        """Tests that the least recently active user is evicted once the pool is
+        full"""
+        alice = self.pool.spotify("alice")
+        self.pool.spotify("bob")
+        self.pool.spotify("alice")
+        self.pool.spotify("carol")
+
+        self.assertIs(alice, self.pool.spotify("alice"))
+        self.assertEqual(1, self.pool.stats()["evictions"])
+        self.assertEqual(2, self.pool.stats()["size"])
+
+    def test_clients_share_session(self):
+        """Tests that every user's client sends requests through one session"""
+        # pylint: disable=protected-access
+        self.assertIs(self.session, self.pool.spotify("alice")._session)
+        self.assertIs(self.session, self.pool.spotify("bob")._session)
+
+        self.pool.close()
+        self.session.release.assert_called_once()
+
+
+class ApiKeyTest(TestCase):
+    """Unit tests for naming a request's user by API key"""
+
+    def setUp(self):
+        self.tokens = MagicMock()
+        self.tokens.find_one.side_effect = lambda query, _: (
+            {"user_id": "alice"} if query == {"api_key": hash_api_key("key")} else None
+        )
+        self.pool = UserPool(self.tokens, MagicMock(), maxsize=2)
+
+    def request(self, users):
+        """Builds a request whose app holds a registry with `users`"""
+        registry = SimpleNamespace(users=users)
+        return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(registry=registry)))
+
+    def test_key_names_user(self):
+        """Tests that a key resolves to the user it was issued to, read once"""
+        self.assertEqual("alice", get_user(self.request(self.pool), "key"))
+        self.assertEqual("alice", get_user(self.request(self.pool), "key"))
+        self.tokens.find_one.assert_called_once()
+
+    def test_unknown_key(self):
+        """Tests that a key issued to no user is rejected"""
+        with self.assertRaises(HTTPException) as ctx:
+            get_user(self.request(self.pool), "guess")
+        self.assertEqual(401, ctx.exception.status_code)
+
+        with self.assertRaises(HTTPException) as ctx:
+            get_user(self.request(None), "key")
+        self.assertEqual(401, ctx.exception.status_code)
+
+    def test_no_key(self):
+        """Tests that a request without a key uses the API's own identity"""
+        self.assertIsNone(get_user(self.request(self.pool), None))
+        self.tokens.find_one.assert_not_called()
+
+    def test_issue_api_key(self):
+        """Tests that only the hash of an issued key is stored"""
+        api_key = issue_api_key(self.tokens, "bob")
+
+        update = self.tokens.update_one.call_args
+        self.assertEqual({"user_id": "bob"}, update.args[0])
+        self.assertEqual({"$set": {"api_key": hash_api_key(api_key)}}, update.args[1])
+        self.assertNotEqual(api_key, issue_api_key(self.tokens, "bob"))
+
+    def test_revoke_api_key(self):
+        """Tests that revoking a key removes its hash from the user's document"""
+        self.tokens.update_one.return_value.modified_count = 1
+
+        self.assertTrue(revoke_api_key(self.tokens, "alice"))
+        update = self.tokens.update_one.call_args
+        self.assertEqual("alice", update.args[0]["user_id"])
+        self.assertEqual({"$unset": {"api_key": ""}}, update.args[1])
+
+    def test_command_line(self):
+        """Tests that keys are issued and revoked from the command line"""
+        with patch("builtins.print") as printed:
+            main(["issue", "bob"], self.tokens)
+        api_key = printed.call_args.args[0]
+        update = self.tokens.update_one.call_args
+        self.assertEqual({"$set": {"api_key": hash_api_key(api_key)}}, update.args[1])
+
+        self.tokens.update_one.return_value.modified_count = 0
+        with patch("builtins.print") as printed:
+            main(["revoke", "bob"], self.tokens)
+        printed.assert_called_once_with("bob holds no API key")
+
+
+class MongoCacheHandlerTest(TestCase):
+    """Unit tests for the MongoDB token store"""
+
+    def test_token_read_once(self):
+        """Tests that a stored token is read from MongoDB once, then from memory"""
+        collection = MagicMock()
+        collection.find_one.return_value = {"token": {"access_token": "a"}}
+        handler = MongoCacheHandler(collection, "alice")
+
+        self.assertEqual("a", handler.get_cached_token()["access_token"])
+        self.assertEqual("a", handler.get_cached_token()["access_token"])
+        collection.find_one.assert_called_once()
+
+    def test_unknown_user(self):
+        """Tests that a user without a stored token is rejected"""
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        with self.assertRaises(HTTPException) as ctx:
+            MongoCacheHandler(collection, "mallory").get_cached_token()
+        self.assertEqual(401, ctx.exception.status_code)
+
+    def test_refreshed_token_stored(self):
+        """Tests that a refreshed token is written back for every instance"""
+        collection = MagicMock()
+        handler = MongoCacheHandler(collection, "alice")
+        handler.save_token_to_cache({"access_token": "b"})
+
+        self.assertEqual("b", handler.get_cached_token()["access_token"])
+        update = collection.update_one.call_args
+        self.assertEqual({"user_id": "alice"}, update.args[0])
+        self.assertTrue(update.kwargs["upsert"])
+        collection.find_one.assert_not_called()
+
+    def test_shared_session_stays_open(self):
+        """Tests that a client closing the shared session leaves it open"""
+        session = SharedSession()
+        adapter = session.get_adapter("https://api.spotify.com")
+        adapter.close = MagicMock()
+
+        session.close()
+        adapter.close.assert_not_called()
+        session.release()
+        adapter.close.assert_called_once()
+
+
+class UserScopeTest(TestCase):
+    """Unit tests for keeping users' data apart"""
+
+    def test_registry_client_for_user(self):
+        """Tests that a request made for a user goes through that user's client"""
+        users = MagicMock()
+        registry = ClientRegistry(MagicMock(), MagicMock(), users=users)
+
+        client = registry.client(Query(), "alice")
+
+        users.spotify.assert_called_once_with("alice")
+        self.assertIs(users.spotify.return_value, client.client)
+        self.assertIs(registry.spotify, registry.client(Query()).client)
+
+    def test_registry_without_users(self):
+        """Tests that a user is rejected when the registry serves no users"""
+        registry = ClientRegistry(MagicMock(), MagicMock())
+
+        with self.assertRaises(HTTPException) as ctx:
+            registry.client(Query(), "alice")
+        self.assertEqual(401, ctx.exception.status_code)
+
+    def test_top_artists_scoped_by_user(self):
+        """Tests that identical top-artist calls for different users are not shared"""
+        spotify, users = MagicMock(), MagicMock()
+        spotify.current_user_top_artists.return_value = {
+            "items": FakeClient(None).get_artists_from_spotify()
+        }
+        users.spotify.return_value = spotify
+        registry = ClientRegistry(spotify, MagicMock(), users=users)
+        for user in ["alice", "bob", None]:
+            registry.client(Query(), user).get_artists_from_spotify()
+
+        self.assertEqual(3, registry.flight.stats()["calls"])
+
+    def test_rank_key(self):
+        """Tests that each user's top ranks are kept under their own path"""
+        self.assertEqual("top_ranks.short_term", rank_key("short_term"))
+        self.assertNotEqual(rank_key("short_term", "alice"), rank_key("short_term", "bob"))
+        self.assertNotIn("a.b", rank_key("short_term", "a.b"))
@@ -0,0 +1,122 @@
+"""Test Suite for the background cache warmer"""
+
+from asyncio import sleep
+from random import Random
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+
+from dependencies.cache import ResponseLoader, StaleWhileRevalidateCache
+from dependencies.scheduler import Priority, call_priority
+from dependencies.warmer import CacheWarmer
+
+from .test_cache import FakeClock
+
+
+class Horizon(Exception):
+    """Raised by `FakeWait` once the fake clock passes its horizon"""
+
+
+class FakeWait:
+    """Advances a fake clock instead of sleeping, until a horizon is reached"""
+
+    def __init__(self, clock: FakeClock, horizon: float) -> None:
+        self.clock = clock
+        self.horizon = horizon
+
+    async def __call__(self, delay: float) -> None:
+        self.clock.now += delay
+        await sleep(0)
+        if self.clock.now > self.horizon:
+            raise Horizon
+
+
+class CacheWarmerTest(IsolatedAsyncioTestCase):
+    """Unit tests for `CacheWarmer`"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = StaleWhileRevalidateCache(
+            maxsize=16, fresh_for=100, max_stale=1000, clock=self.clock
+        )
+        self.loads: Dict[str, List[float]] = {}
+        self.priorities: List[Priority] = []
+
+    def target(self, key: str):
+        """Builds a target that records when it is warmed and at which priority it
+        loads"""
+
+        async def load():
+            self.priorities.append(call_priority.get())
+            return key
+
+        def build():
+            self.loads.setdefault(key, []).append(self.clock.now)
+            return ResponseLoader(key, load)
+
+        return build
+
+    def warmer(self, targets, max_rate: float = 10.0) -> CacheWarmer:
+        """Builds a warmer driven by the fake clock"""
+        return CacheWarmer(
+            self.cache,
+            targets,
+            max_rate=max_rate,
+            jitter=0.2,
+            rng=Random(0),
+            clock=self.clock,
+            wait=FakeWait(self.clock, horizon=1000),
+        )
+
+    async def test_refreshes_before_entries_go_stale(self):
+        """Tests that every target is refreshed within its first `fresh_for`, then
+        again before it goes stale, at background priority"""
+        keys = [f"key-{index}" for index in range(6)]
+        warmer = self.warmer([self.target(key) for key in keys])
+
+        with self.assertRaises(Horizon):
+            await warmer.run()
+
+        self.assertEqual(set(keys), set(self.loads))
+        for times in self.loads.values():
+            self.assertLessEqual(times[0], 100)
+            gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+            self.assertTrue(all(80 <= gap <= 100 for gap in gaps), gaps)
+        self.assertEqual({Priority.BACKGROUND}, set(self.priorities))
+        self.assertEqual("key-0", await self.cache.get_or_load("key-0", None))
+
+    async def test_paces_refreshes(self):
+        """Tests that refreshes start at most `max_rate` times a second"""
+        warmer = self.warmer([self.target(str(index)) for index in range(20)], 0.5)
+
+        with self.assertRaises(Horizon):
+            await warmer.run()
+
+        starts = sorted(time for times in self.loads.values() for time in times)
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        self.assertGreaterEqual(min(gaps), 2 - 1e-9)
+
+    async def test_failing_target_does_not_stop_warming(self):
+        """Tests that a target that cannot be built is counted and skipped"""
+
+        def broken():
+            raise RuntimeError("unknown user")
+
+        warmer = self.warmer([broken, self.target("key")])
+
+        with self.assertRaises(Horizon):
+            await warmer.run()
+
+        self.assertGreater(len(self.loads["key"]), 1)
+        stats = warmer.stats()
+        self.assertEqual(2, stats["targets"])
+        self.assertGreater(stats["errors"], 1)
+        self.assertEqual(len(self.loads["key"]), stats["warmed"])
+
+    async def test_stop_cancels_warming(self):
+        """Tests that stopping the warmer cancels its task"""
+        warmer = CacheWarmer(self.cache, [self.target("key")], max_rate=1)
+        warmer.start()
+        await sleep(0)
+        await warmer.stop()
+
+        self.assertEqual({}, self.loads)
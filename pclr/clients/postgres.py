@@ -1,8 +1,9 @@
 """Code for connection to Postgresql"""
 
 import os
-from typing import Any, List, Type, TypeAlias
+from typing import Any, Dict, List, Sequence, Type, TypeAlias
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, SQLModel, create_engine, select
 from sqlmodel.sql.expression import Select, SelectOfScalar
 
@@ -58,3 +59,31 @@ class PostgresClient:
     def check_exists(self, table: Table, key: str, value: Any) -> bool:
         """Checks if a row exists on a table where the given key matches the value"""
         return bool(self.get_row(table=table, key=key, value=value))
+
+    def select(self, stmt: Any) -> List:
+        """Retrieves every row returned by a select statement"""
+        with Session(self.__engine) as session:
+            return session.exec(stmt).all()
+
+    def upsert(self, table: Table, rows: Sequence[Dict[str, Any]], key: str) -> int:
+        """
+        Inserts many rows in a single statement, updating the rows whose key
+        already exists
+
+        Returns
+        -------
+        int
+            the number of rows written
+        """
+        if not rows:
+            return 0
+
+        stmt = insert(table).values(list(rows))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != key},
+        )
+        with Session(self.__engine) as session:
+            session.execute(stmt)
+            session.commit()
+        return len(rows)
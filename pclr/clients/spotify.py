@@ -1,7 +1,8 @@
 """Code for interacting with Spotify"""
 
 import os
-
+from threading import Lock
+from time import monotonic, sleep
 
 from dotenv import load_dotenv
 from spotipy import Spotify, SpotifyOAuth
@@ -19,3 +20,32 @@ def init_spotify_client() -> Spotify:
             scope="user-read-currently-playing",
         )
     )
+
+
+class RateBudget:
+    """
+    Spaces out Spotify calls so that no more than `rate` are made per second
+
+    A `rate` of 0 or less does not limit calls. Calls rejected with a 429 are still
+    retried by spotipy after the `Retry-After` Spotify sends
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.__next_call = 0.0
+        self.__lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Creates a budget of `SPOTIFY_RATE_LIMIT` calls per second"""
+        return cls(float(os.getenv("SPOTIFY_RATE_LIMIT", "5")))
+
+    def spend(self) -> None:
+        """Waits until the next call fits within the budget"""
+        with self.__lock:
+            now = monotonic()
+            wait = self.__next_call - now
+            self.__next_call = max(now, self.__next_call) + self.interval
+
+        if wait > 0:
+            sleep(wait)
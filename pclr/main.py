@@ -1,14 +1,16 @@
 """Main flow"""
+import sys
 from time import sleep
 from typing import Tuple
 
 from spotipy import Spotify
 
 from clients.postgres import PostgresClient
-from clients.spotify import init_spotify_client
+from clients.spotify import RateBudget, init_spotify_client
 from models.ops import Status, PipelineStatus
 from models.db import is_playcount_list
 from tasks.db import check_counted, count_new_track, update_track_count
+from tasks.enrich import enrich_flow
 from tasks.spotify import spotify_flow
 from telemetry.logging import logger, bind_pipeline
 
@@ -54,12 +56,27 @@ def main_flow() -> PipelineStatus:
 
 
 def main():
-    """Runs the flow"""
+    """Runs the flow, enriching one batch of new tracks after each run"""
+    budget = RateBudget.from_env()
     while True:
         pls = main_flow()
         pls.log_status(logger=logger)
+        enrich_flow(*init_clients(), budget=budget, max_batches=1).log_status(
+            logger=logger
+        )
         sleep(30)
 
 
+def enrich():
+    """Enriches every played track that has no track row yet, then exits"""
+    bind_pipeline()
+    logger.info("BEGINNING ENRICHMENT")
+    pls = enrich_flow(*init_clients(), budget=RateBudget.from_env())
+    pls.log_status(logger=logger)
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:] == ["enrich"]:
+        enrich()
+    else:
+        main()
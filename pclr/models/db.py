@@ -1,4 +1,4 @@
-from typing import List, TypeGuard
+from typing import List, Optional, TypeGuard
 
 from sqlalchemy import BigInteger, Column
 from sqlmodel import Field, SQLModel
@@ -12,5 +12,38 @@ class PlayCount(SQLModel, table=True, inherit_cache=True):
     total_play_count: int
 
 
+class Album(SQLModel, table=True, inherit_cache=True):
+    """The Album table schema"""
+
+    id: str = Field(primary_key=True)
+    name: Optional[str] = None
+
+
+class Artist(SQLModel, table=True, inherit_cache=True):
+    """The Artist table schema"""
+
+    id: str = Field(primary_key=True)
+    name: Optional[str] = None
+
+
+class Track(SQLModel, table=True, inherit_cache=True):
+    """The Track table schema, holding the metadata and audio features of a track"""
+
+    id: str = Field(primary_key=True, foreign_key="playcount.track_id")
+    name: Optional[str] = None
+    artist_id: Optional[str] = Field(default=None, foreign_key="artist.id")
+    album_id: Optional[str] = Field(default=None, foreign_key="album.id")
+    popularity: Optional[int] = None
+    acousticness: Optional[float] = None
+    danceability: Optional[float] = None
+    duration_ms: Optional[int] = None
+    energy: Optional[float] = None
+    instrumentalness: Optional[float] = None
+    loudness: Optional[float] = None
+    speechiness: Optional[float] = None
+    tempo: Optional[float] = None
+    valence: Optional[float] = None
+
+
 def is_playcount_list(val: List) -> TypeGuard[List[PlayCount]]:
     return all(isinstance(item, PlayCount) for item in val)
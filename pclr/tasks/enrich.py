@@ -0,0 +1,254 @@
+"""Tasks that fill the track table with the metadata and audio features of played
+tracks"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from spotipy import Spotify, SpotifyException
+from sqlmodel import select
+
+from clients.postgres import PostgresClient
+from clients.spotify import RateBudget
+from models.db import Album, Artist, PlayCount, Track
+from models.ops import PipelineStatus, Status, Task
+from telemetry.logging import logger
+
+AUDIO_FEATURES_BATCH = 100
+"""The most track IDs Spotify's audio-features endpoint accepts in one call"""
+
+TRACKS_BATCH = 50
+"""The most track IDs Spotify's tracks endpoint accepts in one call"""
+
+FEATURES = (
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "loudness",
+    "speechiness",
+    "tempo",
+    "valence",
+)
+
+
+class EnrichedBatch(NamedTuple):
+    """The rows to upsert for a batch of tracks, in foreign key order"""
+
+    artists: List[Dict[str, Any]]
+    albums: List[Dict[str, Any]]
+    tracks: List[Dict[str, Any]]
+
+
+def build_rows(
+    track_ids: Sequence[str],
+    tracks: Sequence[Optional[Dict]],
+    features: Sequence[Optional[Dict]],
+) -> EnrichedBatch:
+    """Builds the rows for a batch of tracks from Spotify's responses
+
+    Every track ID gets a row, with empty columns for whatever Spotify did not return,
+    so that a track is never fetched twice
+
+    Params
+    ------
+    track_ids: Sequence[str]
+        the IDs of the tracks in the batch
+    tracks: Sequence[Optional[Dict]]
+        the tracks endpoint's response for each ID, or None if it is unknown
+    features: Sequence[Optional[Dict]]
+        the audio-features endpoint's response for each ID, or None if it has none
+
+    Returns
+    -------
+    EnrichedBatch
+        the artist, album and track rows for the batch
+    """
+    artists: Dict[str, Dict[str, Any]] = {}
+    albums: Dict[str, Dict[str, Any]] = {}
+    rows = []
+    for track_id, track, feature in zip(track_ids, tracks, features):
+        track = track or {}
+        feature = feature or {}
+        artist = (track.get("artists") or [{}])[0]
+        album = track.get("album") or {}
+
+        if artist.get("id"):
+            artists[artist["id"]] = {"id": artist["id"], "name": artist.get("name")}
+        if album.get("id"):
+            albums[album["id"]] = {"id": album["id"], "name": album.get("name")}
+
+        rows.append(
+            {
+                "id": track_id,
+                "name": track.get("name"),
+                "artist_id": artist.get("id"),
+                "album_id": album.get("id"),
+                "popularity": track.get("popularity"),
+                "duration_ms": track.get("duration_ms", feature.get("duration_ms")),
+                **{name: feature.get(name) for name in FEATURES},
+            }
+        )
+
+    return EnrichedBatch(list(artists.values()), list(albums.values()), rows)
+
+
+def find_unenriched_tracks(
+    client: PostgresClient, after: str, limit: int
+) -> Task[List[str]]:
+    """Finds played tracks with no track row, in ID order after `after`"""
+    task = Task(status=Status.NONE, name="find_unenriched_tracks")
+    stmt = (
+        select(PlayCount.track_id)
+        .join(Track, Track.id == PlayCount.track_id, isouter=True)
+        .where(Track.id == None)  # pylint: disable=singleton-comparison
+        .where(PlayCount.track_id > after)
+        .order_by(PlayCount.track_id)
+        .limit(limit)
+    )
+
+    try:
+        return task.with_status(Status.COMPLETED).with_data(client.select(stmt))
+    except Exception as ex:
+        logger.error("Failed to find unenriched tracks", error=str(ex).strip())
+        return task.with_status(Status.FAILED).with_error(ex)
+
+
+def fetch_responses(
+    client: Spotify, budget: RateBudget, track_ids: List[str]
+) -> Tuple[List[Optional[Dict]], List[Optional[Dict]]]:
+    """Retrieves the tracks and audio-features responses for up to 100 tracks
+
+    Spotify rejects a whole request with a 400 for a single malformed ID, so a
+    rejected batch is split in halves that are fetched on their own. Only the IDs
+    rejected on their own go without a response, and get empty rows like tracks
+    Spotify does not know, so they are never fetched again and every other track
+    of the batch is still enriched
+
+    Params
+    ------
+    client: Spotify
+        the Spotify client
+    budget: RateBudget
+        the rate budget every Spotify call is made within
+    track_ids: List[str]
+        the IDs of the tracks
+
+    Returns
+    -------
+    Tuple[List[Optional[Dict]], List[Optional[Dict]]]
+        the tracks and the audio-features responses for each ID, or None
+    """
+    try:
+        tracks: List[Optional[Dict]] = []
+        for start in range(0, len(track_ids), TRACKS_BATCH):
+            budget.spend()
+            response = client.tracks(track_ids[start : start + TRACKS_BATCH])
+            tracks.extend(response["tracks"])
+
+        budget.spend()
+        features = client.audio_features(track_ids) or [None] * len(track_ids)
+        return tracks, features
+    except SpotifyException as ex:
+        if ex.http_status != 400:
+            raise
+        if len(track_ids) == 1:
+            logger.warning(
+                "Skipping track rejected by Spotify",
+                track_id=track_ids[0],
+                error=str(ex).strip(),
+            )
+            return [None], [None]
+
+    middle = len(track_ids) // 2
+    first_tracks, first_features = fetch_responses(client, budget, track_ids[:middle])
+    last_tracks, last_features = fetch_responses(client, budget, track_ids[middle:])
+    return first_tracks + last_tracks, first_features + last_features
+
+
+def fetch_tracks(
+    client: Spotify, budget: RateBudget, track_ids: List[str]
+) -> Task[EnrichedBatch]:
+    """Retrieves the metadata and audio features of up to 100 tracks
+
+    The batch costs one audio-features call and one tracks call per 50 tracks,
+    each made within the rate budget, and more if Spotify rejects it and it is
+    split
+    """
+    task = Task(status=Status.NONE, name="fetch_tracks")
+    try:
+        tracks, features = fetch_responses(client, budget, track_ids)
+    except Exception as ex:
+        logger.error(
+            "Failed to fetch tracks", track_ids=track_ids, error=str(ex).strip()
+        )
+        return task.with_status(Status.FAILED).with_error(ex)
+
+    return task.with_status(Status.COMPLETED).with_data(
+        build_rows(track_ids, tracks, features)
+    )
+
+
+def upsert_tracks(client: PostgresClient, batch: EnrichedBatch) -> Task[int]:
+    """Writes the rows of a batch with one bulk upsert per table"""
+    task = Task(status=Status.NONE, name="upsert_tracks")
+    try:
+        client.upsert(Artist, batch.artists, key="id")
+        client.upsert(Album, batch.albums, key="id")
+        written = client.upsert(Track, batch.tracks, key="id")
+        return task.with_status(Status.COMPLETED).with_data(written)
+    except Exception as ex:
+        logger.error("Failed to upsert tracks", error=str(ex).strip())
+        return task.with_status(Status.FAILED).with_error(ex)
+
+
+def enrich_flow(
+    sp_client: Spotify,
+    db_client: PostgresClient,
+    budget: RateBudget,
+    batch_size: int = AUDIO_FEATURES_BATCH,
+    max_batches: Optional[int] = None,
+) -> PipelineStatus:
+    """Fills the track table for every played track that has no row yet
+
+    Tracks are taken in ID order, `batch_size` at a time. A track has a row once its
+    batch is written, so a stopped run resumes from the first track still missing
+    one
+
+    Params
+    ------
+    sp_client: Spotify
+        the Spotify client
+    db_client: PostgresClient
+        the Postgres client
+    budget: RateBudget
+        the rate budget every Spotify call is made within
+    batch_size: int
+        the number of tracks per batch, at most 100
+    max_batches: Optional[int]
+        the most batches to process, or None to process every missing track
+    """
+    pls = PipelineStatus(status=Status.NONE, operations=[])
+    batch_size = min(batch_size, AUDIO_FEATURES_BATCH)
+    after = ""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        found = find_unenriched_tracks(client=db_client, after=after, limit=batch_size)
+        pls.operations.append(found)
+        if found.error:
+            return pls.with_status(status=found.status)
+        if not found.data:
+            break
+
+        fetched = fetch_tracks(client=sp_client, budget=budget, track_ids=found.data)
+        pls.operations.append(fetched)
+        if fetched.error or fetched.data is None:
+            return pls.with_status(status=fetched.status)
+
+        written = upsert_tracks(client=db_client, batch=fetched.data)
+        pls.operations.append(written)
+        if written.error:
+            return pls.with_status(status=written.status)
+
+        after = found.data[-1]
+        batches += 1
+        logger.info("Enriched tracks", count=written.data, last_track_id=after)
+
+    return pls.with_status(status=Status.COMPLETED)
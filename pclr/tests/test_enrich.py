@@ -0,0 +1,148 @@
+import unittest
+from time import monotonic
+from unittest.mock import MagicMock
+
+from spotipy import SpotifyException
+
+from clients.spotify import RateBudget
+from models.db import Album, Artist, Track
+from models.ops import Status
+from tasks.enrich import FEATURES, build_rows, enrich_flow
+
+
+def fake_track(track_id: str):
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "artists": [{"id": "artist1", "name": "Artist"}],
+        "album": {"id": "album1", "name": "Album"},
+        "popularity": 50,
+        "duration_ms": 1000,
+    }
+
+
+class FakeDatabase:
+    """Stands in for `PostgresClient`, with `playcount` holding `track_ids`"""
+
+    def __init__(self, track_ids):
+        self.played = sorted(track_ids)
+        self.tracks = {}
+        self.upserts = []
+
+    def select(self, stmt):
+        params = stmt.compile().params
+        after, limit = params["track_id_1"], params["param_1"]
+        missing = [
+            track_id
+            for track_id in self.played
+            if track_id not in self.tracks and track_id > after
+        ]
+        return missing[:limit]
+
+    def upsert(self, table, rows, key):
+        self.upserts.append((table, len(rows)))
+        if table is Track:
+            self.tracks.update({row[key]: row for row in rows})
+        return len(rows)
+
+
+class EnrichTests(unittest.TestCase):
+    def setUp(self):
+        self.spotify = MagicMock()
+        self.spotify.tracks.side_effect = lambda ids: {
+            "tracks": [fake_track(track_id) for track_id in ids]
+        }
+        self.spotify.audio_features.side_effect = lambda ids: [
+            {"id": track_id, **{name: 0.5 for name in FEATURES}} for track_id in ids
+        ]
+
+    def test_build_rows(self):
+        batch = build_rows(
+            ["t1", "t2"], [fake_track("t1"), None], [{"energy": 0.9}, None]
+        )
+
+        self.assertEqual([{"id": "artist1", "name": "Artist"}], batch.artists)
+        self.assertEqual([{"id": "album1", "name": "Album"}], batch.albums)
+        self.assertEqual(0.9, batch.tracks[0]["energy"])
+        self.assertIsNone(batch.tracks[0]["valence"])
+        self.assertEqual("t2", batch.tracks[1]["id"])
+        self.assertIsNone(batch.tracks[1]["name"])
+        self.assertEqual(batch.tracks[0].keys(), batch.tracks[1].keys())
+
+    def test_enrich_in_batches(self):
+        database = FakeDatabase([f"t{index:03}" for index in range(250)])
+
+        pls = enrich_flow(self.spotify, database, RateBudget(0))
+
+        self.assertEqual(Status.COMPLETED, pls.status)
+        self.assertEqual(250, len(database.tracks))
+        self.assertEqual(3, self.spotify.audio_features.call_count)
+        self.assertEqual(5, self.spotify.tracks.call_count)
+        self.assertEqual(
+            [(Artist, 1), (Album, 1), (Track, 100)] * 2
+            + [(Artist, 1), (Album, 1), (Track, 50)],
+            database.upserts,
+        )
+
+    def test_enrich_resumes(self):
+        database = FakeDatabase([f"t{index:03}" for index in range(250)])
+
+        enrich_flow(self.spotify, database, RateBudget(0), max_batches=1)
+        self.assertEqual(100, len(database.tracks))
+
+        enrich_flow(self.spotify, database, RateBudget(0))
+        self.assertEqual(250, len(database.tracks))
+        requested = [
+            track_id
+            for call in self.spotify.audio_features.call_args_list
+            for track_id in call.args[0]
+        ]
+        self.assertEqual(sorted(database.played), requested)
+
+    def test_enrich_without_features(self):
+        database = FakeDatabase(["t1", "t2"])
+        self.spotify.audio_features.side_effect = lambda ids: None
+
+        pls = enrich_flow(self.spotify, database, RateBudget(0))
+
+        self.assertEqual(Status.COMPLETED, pls.status)
+        self.assertEqual({"t1", "t2"}, set(database.tracks))
+        self.assertEqual("Song t1", database.tracks["t1"]["name"])
+        self.assertIsNone(database.tracks["t1"]["energy"])
+
+    def test_rejected_track_skipped(self):
+        database = FakeDatabase([f"t{index:03}" for index in range(8)] + ["bad"])
+
+        def tracks(ids):
+            if "bad" in ids:
+                raise SpotifyException(400, -1, "invalid id")
+            return {"tracks": [fake_track(track_id) for track_id in ids]}
+
+        self.spotify.tracks.side_effect = tracks
+
+        pls = enrich_flow(self.spotify, database, RateBudget(0))
+
+        self.assertEqual(Status.COMPLETED, pls.status)
+        self.assertEqual(9, len(database.tracks))
+        self.assertIsNone(database.tracks["bad"]["name"])
+        self.assertEqual("Song t007", database.tracks["t007"]["name"])
+
+        calls = self.spotify.tracks.call_count
+        enrich_flow(self.spotify, database, RateBudget(0))
+        self.assertEqual(calls, self.spotify.tracks.call_count)
+
+    def test_failed_fetch_stops(self):
+        database = FakeDatabase(["t1"])
+        self.spotify.audio_features.side_effect = Exception("boom")
+
+        pls = enrich_flow(self.spotify, database, RateBudget(0))
+
+        self.assertEqual(Status.FAILED, pls.status)
+        self.assertEqual({}, database.tracks)
+
+    def test_rate_budget(self):
+        budget = RateBudget(50)
+        start = monotonic()
+        for _ in range(6):
+            budget.spend()
+        self.assertGreaterEqual(monotonic() - start, 0.1)